@@ -1,2 +1,8 @@
-from .core import Matcher
 from . import solvers
+
+def __getattr__(name):
+    # the Matcher (and numpy, through the Encoder) is only imported when used.
+    if name == 'Matcher':
+        from .core import Matcher
+        return Matcher
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
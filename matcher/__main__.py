@@ -1,12 +1,17 @@
 '''
 CLI interface for the matcher
+
+`python -m matcher sweep --variants variants.json ...` solves each variant in
+variants.json (a JSON list, see sweep.py) with the same score files, and prints
+a table that compares them, instead of writing assignments. The match options
+may come before or after the command, but an option that takes a list of values
+(--scores, --weights) can't come right before it.
 '''
 
 import argparse
 import csv
 import json
-from .core import Matcher
-from .solvers import MinMaxSolver, FairFlow
+from .solvers.registry import available_solvers
 import logging
 from collections import defaultdict
 import time
@@ -23,67 +28,152 @@ logger.addHandler(consoleHandler)
 t0 = time.time()
 logger.info('Starting time={}'.format(t0))
 
+def add_match_arguments(parser):
+    '''Add the options that describe a match to `parser`, and return their actions.'''
+    actions = []
+
+    def add_argument(*args, **kwargs):
+        actions.append(parser.add_argument(*args, **kwargs))
+
+    add_argument(
+        '--scores',
+        nargs='+',
+        help='''
+            One or more score files,
+            with each row containing comma-separated paperID, userID, and score (in that order).
+            e.g. "paper1,reviewer1,0.5"
+            '''
+    )
+
+    add_argument(
+        '--constraints',
+        help='''
+            One or more constraint files,
+            with each row containing comma-separated paperID, userID, and constraint (in that order).
+            Constraint values must be -1 (conflict), 1 (forced assignment), or 0 (no effect).
+            e.g. "paper1,reviewer1,-1"
+            '''
+    )
+
+    add_argument(
+        '--max_papers',
+        help='''
+            max paper files,
+            with each row containing comma-separated userID, and max_papers that can be assigned to this user (in that order).
+            e.g. "reviewer1,2''')
+
+
+    add_argument('--weights', nargs='+', type=float)
+    add_argument('--min_papers_default', default=0, type=int)
+    add_argument('--max_papers_default', type=int)
+    add_argument('--num_reviewers', default=3, type=int)
+    add_argument('--num_alternates', default=3, type=int)
+    add_argument('--user_group', type=str)
+
+    add_argument(
+        '--user_group_file',
+        help='''Pass a csv file with each line in the form: "Group1, user_email"'''
+    )
+
+    # the solver modules are only imported once the selected solver is used.
+    add_argument(
+        '--solver',
+        choices=available_solvers(),
+        help='Choose from: {}'.format(available_solvers()),
+        default='MinMax'
+    )
+
+    add_argument(
+        '--solver_options',
+        type=json.loads,
+        default={},
+        help='''
+            A JSON object of keyword arguments passed to the solver.
+            e.g. '{"top_k": 50}' solves on a graph pruned to the top 50 candidates of each paper and reviewer.
+            '''
+    )
+
+    add_argument(
+        '--polish',
+        choices=['min', 'total'],
+        help='''
+            Polish the solution with local moves and swaps, raising either the
+            lowest paper scores ('min') or the total score ('total').
+            '''
+    )
+
+    add_argument(
+        '--skip_flow_check',
+        action='store_true',
+        help='''
+            Only check feasibility with the quick count checks before solving, not with
+            a max-flow. The max-flow catches more infeasible inputs, but is slower on very large inputs.
+            '''
+    )
+
+    add_argument(
+        '--cache_dir',
+        help='''
+            A directory of cached results. If a run has the same inputs, solver and
+            options as a cached one, its assignments and alternates are served from the cache.
+            '''
+    )
+
+    add_argument(
+        '--cache_size',
+        type=int,
+        default=256,
+        help='The maximum size of the result cache, in megabytes.'
+    )
+
+    add_argument(
+        '--checkpoint_dir',
+        help='''
+            A directory where the solver (FairFlow) periodically saves its state. Restarting
+            an interrupted run with the same inputs resumes from its latest checkpoint.
+            '''
+    )
+
+    return actions
+
 parser = argparse.ArgumentParser()
-parser.add_argument(
-    '--scores',
-    nargs='+',
-    help='''
-        One or more score files,
-        with each row containing comma-separated paperID, userID, and score (in that order).
-        e.g. "paper1,reviewer1,0.5"
+add_match_arguments(parser)
+
+commands = parser.add_subparsers(dest='command', title='commands', metavar='{sweep}')
+sweep_parser = commands.add_parser(
+    'sweep',
+    help='Solve variants of the match and print a table that compares them.',
+    description='''
+        Solve each variant in the --variants file with the same score files, and
+        print a table that compares them, instead of writing assignments.
         '''
 )
-
-parser.add_argument(
-    '--constraints',
+# the match options may also follow the command. their defaults are suppressed
+# here, so that they don't override the values given before the command.
+for action in add_match_arguments(sweep_parser):
+    action.default = argparse.SUPPRESS
+sweep_parser.add_argument(
+    '--variants',
+    required=True,
     help='''
-        One or more constraint files,
-        with each row containing comma-separated paperID, userID, and constraint (in that order).
-        Constraint values must be -1 (conflict), 1 (forced assignment), or 0 (no effect).
-        e.g. "paper1,reviewer1,-1"
+        A JSON file with a list of variants, each a JSON object that may override
+        "weight_by_type" (keyed on score file), "minimums", "maximums", "demands"
+        (lists, or one value for all), "solver", "solver_options" and "polish",
+        and may give the variant a "name".
         '''
 )
-
-parser.add_argument(
-    '--max_papers',
-    help='''
-        max paper files,
-        with each row containing comma-separated userID, and max_papers that can be assigned to this user (in that order).
-        e.g. "reviewer1,2''')
-
-
-parser.add_argument('--weights', nargs='+', type=float)
-parser.add_argument('--min_papers_default', default=0, type=int)
-parser.add_argument('--max_papers_default', type=int)
-parser.add_argument('--num_reviewers', default=3, type=int)
-parser.add_argument('--num_alternates', default=3, type=int)
-parser.add_argument('--user_group', type=str)
-
-parser.add_argument(
-    '--user_group_file',
-    help='''Pass a csv file with each line in the form: "Group1, user_email"'''
-)
-
-# TODO: dynamically populate solvers list
-# TODO: can argparse throw an error if the solver isn't in the list?
-parser.add_argument(
-    '--solver',
-    help='Choose from: {}'.format(['MinMax', 'FairFlow']),
-    default='MinMax'
-)
+sweep_parser.add_argument('--workers', type=int, help='The number of variants to solve in parallel.')
+sweep_parser.add_argument('--output', help='Also write the comparison table to this file, as JSON.')
 
 args = parser.parse_args()
+sweep_mode = args.command == 'sweep'
+
+# imported after parsing the arguments, so that --help doesn't pay for numpy.
+from .core import Matcher
+from .cache import ResultCache
 
 # Main Logic
-logger.info('Setting solver class')
-solver_class = None
-if args.solver == 'MinMax':
-    solver_class = 'MinMax'
-if args.solver == 'FairFlow':
-    solver_class = 'FairFlow'
-
-if not solver_class:
-    raise ValueError('Invalid solver class {}'.format(args.solver))
+solver_class = args.solver
 logger.info('Using solver={}'.format(solver_class))
 
 reviewer_set = set()
@@ -180,7 +270,7 @@ match_data = {
     'maximums': maximums,
     'demands': demands,
     'num_alternates': num_alternates,
-    'assignment_output': 'assignments.json',
+    'assignments_output': 'assignments.json',
     'alternates_output': 'alternates.json',
     'logger': logger
 }
@@ -188,9 +278,24 @@ match_data = {
 matcher = Matcher(
     datasource=match_data,
     solver_class=solver_class,
-    logger=logger
+    logger=logger,
+    solver_options=args.solver_options,
+    polish=args.polish,
+    cache=ResultCache(args.cache_dir, max_bytes=args.cache_size * 1024 * 1024) if args.cache_dir else None,
+    checkpoint_dir=args.checkpoint_dir,
+    check_flow=not args.skip_flow_check
 )
 
-matcher.run()
+if sweep_mode:
+    from .sweep import format_table
+    with open(args.variants) as file_handle:
+        variants = json.load(file_handle)
+    rows = matcher.sweep(variants, workers=args.workers)
+    print(format_table(rows))
+    if args.output:
+        with open(args.output, 'w') as file_handle:
+            json.dump(rows, file_handle, indent=2)
+else:
+    matcher.run()
 t1 = time.time()
 logger.info('Overall execution time: {0} seconds'.format(t1-t0))
\ No newline at end of file
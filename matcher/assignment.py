@@ -0,0 +1,108 @@
+'''
+A compact representation of a paper-reviewer assignment, shared by the solvers and the Encoder.
+
+Only #papers x demand cells of a flow matrix are nonzero, so instead of a dense
+#papers by #reviewers float matrix, an Assignment holds the paper and reviewer index
+of each assigned pair as aligned int32 arrays, sorted by paper (i.e. a CSR matrix
+without the data array).
+
+For backwards compatibility, an Assignment behaves like the dense 0/1 flow matrix
+returned by earlier versions of the solvers: it has a `shape`, supports `len()`,
+indexing, `sum()`, `any()` and `transpose()`, and can be passed to numpy functions.
+The dense matrix is only built when one of these requires it (see `to_matrix`).
+'''
+
+import numpy as np
+
+class Assignment:
+    '''
+    Arguments:
+    - `paper_indices`, `reviewer_indices`:
+        aligned arrays of indices, one entry per assigned paper-reviewer pair.
+
+    - `shape`:
+        a tuple (#papers, #reviewers).
+    '''
+    def __init__(self, paper_indices, reviewer_indices, shape):
+        paper_indices = np.asarray(paper_indices, dtype=np.int32)
+        reviewer_indices = np.asarray(reviewer_indices, dtype=np.int32)
+        order = np.lexsort((reviewer_indices, paper_indices))
+
+        self.paper_indices = paper_indices[order]
+        self.reviewer_indices = reviewer_indices[order]
+        self.shape = (int(shape[0]), int(shape[1]))
+
+    @classmethod
+    def from_matrix(cls, flow_matrix):
+        '''Build an Assignment from the nonzero cells of a dense flow matrix.'''
+        flow_matrix = np.asarray(flow_matrix)
+        paper_indices, reviewer_indices = np.nonzero(flow_matrix)
+        return cls(paper_indices, reviewer_indices, flow_matrix.shape)
+
+    @property
+    def nnz(self):
+        '''The number of assigned pairs.'''
+        return np.size(self.paper_indices)
+
+    @property
+    def indptr(self):
+        '''
+        CSR row pointers: the reviewers of paper `i` are
+        `reviewer_indices[indptr[i]:indptr[i + 1]]`.
+        '''
+        counts = np.bincount(self.paper_indices, minlength=self.shape[0])
+        return np.concatenate(([0], np.cumsum(counts)))
+
+    def reviewers_of(self, paper_index):
+        '''Return the indices of the reviewers assigned to a paper.'''
+        start, stop = np.searchsorted(self.paper_indices, [paper_index, paper_index + 1])
+        return self.reviewer_indices[start:stop]
+
+    def to_matrix(self, dtype=float):
+        '''Return the dense #papers by #reviewers flow matrix.'''
+        flow_matrix = np.zeros(self.shape, dtype=dtype)
+        flow_matrix[self.paper_indices, self.reviewer_indices] = 1
+        return flow_matrix
+
+    def transpose(self):
+        '''Return the #reviewers by #papers Assignment.'''
+        return Assignment(
+            self.reviewer_indices, self.paper_indices, (self.shape[1], self.shape[0]))
+
+    @property
+    def T(self):
+        return self.transpose()
+
+    def sum(self, axis=None, dtype=None, out=None):
+        '''Sum of the flow matrix, computed without building it.'''
+        if out is not None:
+            return np.sum(self.to_matrix(), axis=axis, dtype=dtype, out=out)
+
+        dtype = dtype if dtype is not None else float
+        if axis is None:
+            return np.array(self.nnz, dtype=dtype)[()]
+        if axis in (0, -2):
+            counts = np.bincount(self.reviewer_indices, minlength=self.shape[1])
+        elif axis in (1, -1):
+            counts = np.bincount(self.paper_indices, minlength=self.shape[0])
+        else:
+            raise ValueError('axis {} is out of bounds for an Assignment'.format(axis))
+        return counts.astype(dtype)
+
+    def any(self):
+        return self.nnz > 0
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __iter__(self):
+        return iter(self.to_matrix())
+
+    def __getitem__(self, key):
+        return self.to_matrix()[key]
+
+    def __array__(self, dtype=None, copy=None):
+        return self.to_matrix(dtype=dtype if dtype is not None else float)
+
+    def __repr__(self):
+        return 'Assignment(shape={}, nnz={})'.format(self.shape, self.nnz)
@@ -0,0 +1,132 @@
+'''
+A local cache of match results, keyed by a fingerprint of the inputs of a run.
+
+The fingerprint is a SHA-256 hash of every input that determines the result: the
+reviewer and paper IDs, constraints, score edges, weights, normalization types,
+quotas, demands, number of alternates, the solver and its options (which hold
+e.g. its tie-breaking seed) and the polishing objective.
+
+Each result is stored as a JSON file named after its fingerprint in the cache
+directory. Reading an entry marks it as recently used, and storing an entry
+evicts the least recently used ones until the cache fits in `max_bytes`.
+
+Solvers that randomize all-zero scores without a `tie_break_seed` would return
+different results for the same inputs; the cache returns the stored one.
+'''
+
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+from .assignment import Assignment
+
+# the number of score edges serialized at a time when fingerprinting.
+_CHUNK_SIZE = 100000
+
+def _default(value):
+    '''Encode numpy values (e.g. quotas read into arrays) like the Python values they hold.'''
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
+
+def _update(hasher, value):
+    hasher.update(json.dumps(value, sort_keys=True, default=_default).encode('utf-8'))
+    hasher.update(b'\n')
+
+def fingerprint(inputs):
+    '''
+    Get the fingerprint (a hex digest) of `inputs`, a dict of the inputs of a run.
+
+    The score edges in inputs['scores_by_type'] are hashed in chunks, so that they
+    are never serialized all at once. The other entries of each score type (e.g.
+    its 'default' score) are hashed as they are.
+    '''
+    hasher = hashlib.sha256()
+    for key in sorted(inputs):
+        _update(hasher, key)
+        if key != 'scores_by_type':
+            _update(hasher, inputs[key])
+            continue
+        for score_type in sorted(inputs[key]):
+            _update(hasher, score_type)
+            scores = inputs[key][score_type]
+            # e.g. the 'default' score of the pairs without an edge.
+            _update(hasher, {name: value for name, value in scores.items() if name != 'edges'})
+            edges = list(scores.get('edges', []))
+            _update(hasher, len(edges))
+            for start in range(0, len(edges), _CHUNK_SIZE):
+                _update(hasher, edges[start:start + _CHUNK_SIZE])
+    return hasher.hexdigest()
+
+class ResultCache:
+    '''
+    A size-bounded LRU cache of match results in `directory`.
+
+    A result is a dict of the 'assignments' and 'alternates' written to the
+    datasource, and the 'solution' as an Assignment.
+    '''
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, '{}.json'.format(key))
+
+    def get(self, key):
+        '''Get the result stored under `key`, or None.'''
+        path = self._path(key)
+        try:
+            with open(path) as file_handle:
+                entry = json.load(file_handle)
+            # the modification time orders the entries by their last use.
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+
+        solution = entry['solution']
+        return {
+            'assignments': entry['assignments'],
+            'alternates': entry['alternates'],
+            'solution': Assignment(
+                solution['paper_indices'], solution['reviewer_indices'], tuple(solution['shape']))
+        }
+
+    def put(self, key, assignments, alternates, solution):
+        '''Store a result under `key`, then evict the least recently used entries over the size bound.'''
+        if not isinstance(solution, Assignment):
+            solution = Assignment.from_matrix(solution)
+        entry = {
+            'assignments': assignments,
+            'alternates': alternates,
+            'solution': {
+                'paper_indices': solution.paper_indices.tolist(),
+                'reviewer_indices': solution.reviewer_indices.tolist(),
+                'shape': list(solution.shape)
+            }
+        }
+        # write to a temporary file first, so that readers never see a partial entry.
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(file_descriptor, 'w') as file_handle:
+            json.dump(entry, file_handle, default=_default)
+        os.replace(temporary_path, self._path(key))
+        self._evict(keep=os.path.basename(self._path(key)))
+
+    def _evict(self, keep):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime_ns, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            # the entry that was just stored is always kept.
+            if name == keep:
+                continue
+            os.remove(os.path.join(self.directory, name))
+            total -= size
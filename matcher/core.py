@@ -1,16 +1,20 @@
 '''Contains core matcher functions and classes.'''
+import gc
+import inspect
 import logging
+import os
 import threading
 import time
 import json
 from enum import Enum
-from .solvers import SolverException, MinMaxSolver, FairFlow
+from . import solvers
+from .solvers import SolverException, InfeasibilityException, CancellationToken, CancelledException
+# solvers are looked up by name, and their modules imported when first selected.
+from .solvers.registry import SOLVER_MAP, register_solver, available_solvers, get_solver
 from .encoder import Encoder
-
-SOLVER_MAP = {
-    'MinMax' : MinMaxSolver,
-    'FairFlow' : FairFlow
-}
+from .instrumentation import Instrumentation
+from .cache import ResultCache, fingerprint
+from . import sweep
 
 class MatcherStatus(Enum):
     INITIALIZED = 'Initialized'
@@ -18,6 +22,7 @@ class MatcherStatus(Enum):
     ERROR = 'Error'
     NO_SOLUTION = 'No Solution'
     COMPLETE = 'Complete'
+    CANCELLED = 'Cancelled'
     DEPLOYED = 'Deployed'
 
 class MatcherError(Exception):
@@ -68,6 +73,9 @@ class KeywordDatasource:
     def set_status(self, status, message):
         self.logger.info('status={0}, message={1}'.format(status.value, message))
 
+    def set_stats(self, stats):
+        self.logger.info('stats={}'.format(json.dumps(stats)))
+
 class Matcher:
     '''Main class that coordinates an Encoder and a Solver.'''
     def __init__(
@@ -75,7 +83,13 @@ class Matcher:
                 datasource,
                 solver_class,
                 on_set_status=None,
-                logger=logging.getLogger(__name__)
+                logger=logging.getLogger(__name__),
+                solver_options=None,
+                polish=None,
+                on_phase=None,
+                cache=None,
+                checkpoint_dir=None,
+                check_flow=True
             ):
 
         if isinstance(datasource, dict):
@@ -84,19 +98,43 @@ class Matcher:
             self.datasource = datasource
 
         self.logger = logger
+        # if given, called with the status and message whenever the status is set.
+        self.on_set_status = on_set_status
         self.solution = None
         self.assignments = None
         self.alternates = None
         self.status = 'Initialized'
+        self.solver_options = solver_options if solver_options else {}
+        # if given, the objective ('min' or 'total') to polish solutions with.
+        self.polish = polish
+        # if given, called with the name and the record of each phase of a run when it ends.
+        self.on_phase = on_phase
+        self.instrumentation = Instrumentation()
+        # if given, a ResultCache (or the directory of one) that results are
+        # served from when the inputs of a run match an earlier run.
+        self.cache = ResultCache(cache) if isinstance(cache, str) else cache
+        # if given, the directory where solvers that support it save checkpoints of their
+        # state, named after the fingerprint of the inputs of the run.
+        self.checkpoint_dir = checkpoint_dir
+        if checkpoint_dir is not None:
+            os.makedirs(checkpoint_dir, exist_ok=True)
+        # the CancellationToken of the current run.
+        self.cancellation = None
+        # if True, the feasibility check also solves a max-flow (see feasibility.py).
+        # It adds one arc per eligible pair, so very large inputs may skip it.
+        self.check_flow = check_flow
 
-        self.solver_class = self.__set_solver_class(solver_class)
+        self.solver_name = solver_class if solver_class in available_solvers() else 'MinMax'
+        self.solver_class = self.__set_solver_class(self.solver_name)
 
     def __set_solver_class(self, solver_class):
-        return SOLVER_MAP.get(solver_class, MinMaxSolver)
+        return get_solver(solver_class)
 
     def set_status(self, status, message=None):
         self.status = status.value
         self.datasource.set_status(status, message=message)
+        if self.on_set_status:
+            self.on_set_status(status, message)
 
     def get_status(self):
         return self.status
@@ -109,15 +147,28 @@ class Matcher:
         self.alternates = alternates
         self.datasource.set_alternates(alternates)
 
-    def run(self):
-        '''
-        Compute a match of reviewers to papers and post it to the as assignment notes.
-        The config note's status field will be set to reflect completion or errors.
-        '''
-        self.set_status(MatcherStatus.RUNNING)
+    def _describe_infeasibility(self, error, encoder, max_listed=10):
+        '''Translate the indices held by an InfeasibilityException into paper and reviewer IDs.'''
+        message = str(error)
+        for label, indices, ids in [
+                ('Papers', error.papers, encoder.papers),
+                ('Reviewers', error.reviewers, encoder.reviewers)]:
+            if indices:
+                listed = [str(ids[index]) for index in indices[:max_listed]]
+                if len(indices) > max_listed:
+                    listed.append('and {} more'.format(len(indices) - max_listed))
+                message += '. {}: {}'.format(label, ', '.join(listed))
+        return message
 
-        self.logger.debug('Start encoding')
+    def sweep(self, variants, workers=None):
+        '''
+        Solve variants of this match (with other weights, quotas, demands or
+        solver options, see sweep.py), encoding the scores only once, and return
+        the rows of a table that compares their objective, worst paper score
+        and reviewer loads.
 
+        The status, assignments and alternates of the datasource are not changed.
+        '''
         encoder = Encoder(
             reviewers=self.datasource.reviewers,
             papers=self.datasource.papers,
@@ -127,36 +178,202 @@ class Matcher:
             normalization_types=self.datasource.normalization_types,
             logger=self.logger
         )
+        base = {
+            'minimums': self.datasource.minimums,
+            'maximums': self.datasource.maximums,
+            'demands': self.datasource.demands,
+            'solver': self.solver_name,
+            'solver_options': self.solver_options,
+            'polish': self.polish,
+            'check_flow': self.check_flow
+        }
+        return sweep.sweep(encoder, base, variants, workers=workers, logger=self.logger)
+
+    def _finish(self, status, message=None):
+        '''Report the phase records of the run, then set its final status.'''
+        self.logger.debug('Matcher phases: {}'.format(self.instrumentation.summary()))
+        if hasattr(self.datasource, 'set_stats'):
+            self.datasource.set_stats(self.instrumentation.as_dict())
+        self.set_status(status, message=message)
+
+    def run(self, deadline=None, cancellation=None):
+        '''
+        Compute a match of reviewers to papers and post it to the as assignment notes.
+        The config note's status field will be set to reflect completion or errors.
+
+        The wall time, CPU time and peak memory of each phase of the run are
+        recorded in `self.instrumentation` (see instrumentation.py), passed to
+        the `on_phase` callback, and written to the datasource with its
+        `set_stats` method, if it has one, before the final status is set.
+
+        The run can be stopped with `cancellation`, a CancellationToken, or
+        by a `deadline` (a time.time() value). Both are checked before each
+        phase up to decoding the assignments, and passed to the solvers that
+        accept a `cancellation` argument, which check them between their
+        iterations. A stopped run ends with the Cancelled status.
+        '''
+        if cancellation is None:
+            cancellation = CancellationToken(deadline)
+        elif deadline is not None:
+            cancellation.deadline = deadline if cancellation.deadline is None else min(cancellation.deadline, deadline)
+        self.cancellation = cancellation
+
+        try:
+            self._run(cancellation)
+            return
+        except CancelledException as error_handle:
+            message = str(error_handle)
+
+        # the encoder and the solver were local to _run; free their memory before reporting.
+        gc.collect()
+        self.logger.debug('Cancelled={}'.format(message))
+        self._finish(MatcherStatus.CANCELLED, message=message)
+
+    def _run(self, cancellation):
+        self.instrumentation = Instrumentation(callbacks=[self.on_phase] if self.on_phase else None)
+
+        def phase(name, check=True):
+            # once assignments are written, the run is completed.
+            if check:
+                cancellation.check()
+            return self.instrumentation.phase(name)
+
+        self.set_status(MatcherStatus.RUNNING)
+
+        with phase('load'):
+            # datasources may fetch their inputs lazily.
+            minimums = self.datasource.minimums
+            maximums = self.datasource.maximums
+            demands = self.datasource.demands
+            num_alternates = self.datasource.num_alternates
+            inputs = dict(
+                reviewers=self.datasource.reviewers,
+                papers=self.datasource.papers,
+                constraints=self.datasource.constraints,
+                scores_by_type=self.datasource.scores_by_type,
+                weight_by_type=self.datasource.weight_by_type,
+                normalization_types=self.datasource.normalization_types)
+            self.instrumentation.count(
+                'load', reviewers=len(inputs['reviewers']), papers=len(inputs['papers']))
+
+        # identifies the run for the result cache and the solver checkpoints.
+        run_key = None
+        if self.cache is not None or self.checkpoint_dir is not None:
+            with phase('fingerprint'):
+                run_key = fingerprint(dict(
+                    inputs,
+                    minimums=minimums,
+                    maximums=maximums,
+                    demands=demands,
+                    num_alternates=num_alternates,
+                    solver=self.solver_name,
+                    solver_options=self.solver_options,
+                    polish=self.polish))
+
+        if self.cache is not None:
+            with phase('cache_lookup') as record:
+                cached = self.cache.get(run_key)
+                record['hit'] = cached is not None
+
+            if cached is not None:
+                self.logger.debug('Serving the result of an identical run from the cache ({})'.format(run_key))
+                self.solution = cached['solution']
+                with phase('write_assignments', check=False):
+                    self.set_assignments(cached['assignments'])
+                with phase('write_alternates', check=False):
+                    self.set_alternates(cached['alternates'])
+                self._finish(MatcherStatus.COMPLETE)
+                return
+
+        self.logger.debug('Start encoding')
+        with phase('encode'):
+            encoder = Encoder(logger=self.logger, **inputs)
+
+        try:
+            with phase('feasibility'):
+                solvers.check_feasibility(
+                    minimums,
+                    maximums,
+                    demands,
+                    encoder.constraint_matrix,
+                    check_flow=self.check_flow,
+                    logger=self.logger
+                )
+        except InfeasibilityException as error_handle:
+            message = self._describe_infeasibility(error_handle, encoder)
+            self.logger.debug('No Solution={}'.format(message))
+            self._finish(MatcherStatus.NO_SOLUTION, message=message)
+            return
 
         self.logger.debug('Preparing solver')
 
         # solver
-        solver = self.solver_class(
-            self.datasource.minimums,
-            self.datasource.maximums,
-            self.datasource.demands,
-            encoder,
-            logger=self.logger
-        )
+        solver_options = dict(self.solver_options)
+        solver_parameters = inspect.signature(self.solver_class).parameters
+        if 'cancellation' in solver_parameters:
+            solver_options['cancellation'] = cancellation
+        if 'instrumentation' in solver_parameters:
+            # the steps of the solve are recorded as phases inside the 'solve' phase.
+            solver_options['instrumentation'] = self.instrumentation
+        if self.checkpoint_dir is not None and 'checkpoint' in solver_parameters:
+            # a restarted run with the same inputs resumes from the same checkpoint.
+            solver_options['checkpoint'] = os.path.join(self.checkpoint_dir, '{}.npz'.format(run_key))
+        with phase('build_solver'):
+            solver = self.solver_class(
+                minimums,
+                maximums,
+                demands,
+                encoder,
+                logger=self.logger,
+                **solver_options
+            )
 
         solution = None
-        start_time = time.time()
+        solver_error = None
 
-        try:
-            self.logger.debug('Solving solver')
-            solution = solver.solve()
-        except SolverException as error_handle:
-            self.logger.debug('No Solution={}'.format(error_handle))
-            self.set_status(MatcherStatus.NO_SOLUTION, message=str(error_handle))
-
-        self.logger.debug('Complete solver run took {} seconds'.format(time.time() - start_time))
-
-        if solver.solved:
-            self.solution = solution
-            self.set_assignments(encoder.decode_assignments(solution))
-            self.set_alternates(
-                encoder.decode_alternates(solution, self.datasource.num_alternates))
-            self.set_status(MatcherStatus.COMPLETE)
-        elif self.get_status() != 'No Solution':
-            self.logger.debug('No Solution. Solver could not find a solution. Adjust your parameters')
-            self.set_status(MatcherStatus.NO_SOLUTION, message='Solver could not find a solution. Adjust your parameters')
+        with phase('solve') as record:
+            try:
+                self.logger.debug('Solving solver')
+                solution = solver.solve()
+            except SolverException as error_handle:
+                self.logger.debug('No Solution={}'.format(error_handle))
+                solver_error = str(error_handle)
+            # network sizes and iteration counts, for the solvers that keep them.
+            record.update(getattr(solver, 'stats', {}))
+
+        self.logger.debug('Complete solver run took {} seconds'.format(record['wall_time']))
+
+        if not solver.solved:
+            if solver_error is None:
+                self.logger.debug('No Solution. Solver could not find a solution. Adjust your parameters')
+                solver_error = 'Solver could not find a solution. Adjust your parameters'
+            self._finish(MatcherStatus.NO_SOLUTION, message=solver_error)
+            return
+
+        if self.polish:
+            self.logger.debug('Polishing solution')
+            with phase('polish'):
+                solution = solvers.polish(
+                    solution,
+                    encoder.aggregate_score_matrix,
+                    encoder.constraint_matrix,
+                    minimums,
+                    maximums,
+                    demands,
+                    objective=self.polish,
+                    logger=self.logger
+                )
+
+        self.solution = solution
+        with phase('decode_assignments'):
+            assignments = encoder.decode_assignments(solution)
+        with phase('write_assignments', check=False):
+            self.set_assignments(assignments)
+        with phase('decode_alternates', check=False):
+            alternates = encoder.decode_alternates(solution, num_alternates)
+        with phase('write_alternates', check=False):
+            self.set_alternates(alternates)
+        if self.cache is not None:
+            with phase('cache_store', check=False):
+                self.cache.put(run_key, assignments, alternates, solution)
+        self._finish(MatcherStatus.COMPLETE)
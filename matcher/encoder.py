@@ -5,10 +5,12 @@ Responsible for:
 '''
 
 from collections import defaultdict, namedtuple
+import copy
 import numpy as np
 import logging
+from .assignment import Assignment
 
-def _score_to_cost(score, scaling_factor=100):
+def score_to_cost(score, scaling_factor=100):
     '''
     Simple helper function for converting a score into a cost.
 
@@ -79,6 +81,14 @@ class Encoder:
             score_type: self._encode_scores(scores) for score_type, scores in scores_by_type.items()
         }
 
+        self.constraint_matrix = self._encode_constraints(constraints)
+        self._aggregate(weight_by_type, normalization_types)
+
+    def _aggregate(self, weight_by_type, normalization_types):
+        '''Set the aggregate score and cost matrices from the per-type score matrices.'''
+        self.weight_by_type = weight_by_type
+        self.normalization_types = normalization_types
+
         with_normalization_matrices = {}
         without_normalization_matrices = {}
 
@@ -88,8 +98,6 @@ class Encoder:
             else:
                 without_normalization_matrices[score_type] = scores
 
-        self.constraint_matrix = self._encode_constraints(constraints)
-
         # don't use numpy.sum() here. it will collapse the matrices into a single value.
         self.aggregate_score_matrix = np.full(self.matrix_shape, 0, dtype=float)
 
@@ -101,7 +109,20 @@ class Encoder:
         if with_normalization_matrices:
             self.aggregate_score_matrix += self._normalize(weight_by_type, with_normalization_matrices)
 
-        self.cost_matrix = _score_to_cost(self.aggregate_score_matrix)
+        self.cost_matrix = score_to_cost(self.aggregate_score_matrix)
+
+    def with_weights(self, weight_by_type, normalization_types=None):
+        '''
+        Return an Encoder with other weights (and normalization types), that shares
+        the per-type score matrices, the constraints and the indexes of this one.
+
+        Only the aggregate score and cost matrices are computed again.
+        '''
+        encoder = copy.copy(self)
+        encoder._aggregate(
+            weight_by_type,
+            self.normalization_types if normalization_types is None else normalization_types)
+        return encoder
 
     def _normalize(self, weight_by_type, with_normalization_matrices):
 
@@ -138,53 +159,70 @@ class Encoder:
 
         return constraint_matrix
 
-    def decode_assignments(self, flow_matrix):
+    def _as_assignment(self, solution):
+        '''Accept an Assignment or a dense #papers by #reviewers flow matrix.'''
+        if isinstance(solution, Assignment):
+            return solution
+        return Assignment.from_matrix(solution)
+
+    def decode_assignments(self, solution):
         '''
         Return a dictionary, keyed on forum IDs, with lists containing dicts
         representing assigned users.
+
+        `solution` is an Assignment (or a dense #papers by #reviewers flow matrix).
         '''
+        assignment = self._as_assignment(solution)
         assignments_by_forum = defaultdict(list)
 
-        for paper_index, paper_flows in enumerate(flow_matrix):
-            paper_id = self.papers[paper_index]
-            for reviewer_index, flow in enumerate(paper_flows):
-                reviewer = self.reviewers[reviewer_index]
-
-                if flow:
-                    coordinates = (paper_index, reviewer_index)
-                    paper_user_entry = {
-                        'aggregate_score': self.aggregate_score_matrix[coordinates],
-                        'user': reviewer
-                    }
-                    assignments_by_forum[paper_id].append(paper_user_entry)
+        scores = self.aggregate_score_matrix[assignment.paper_indices, assignment.reviewer_indices]
+        for paper_index, reviewer_index, score in zip(
+                assignment.paper_indices.tolist(), assignment.reviewer_indices.tolist(), scores):
+            assignments_by_forum[self.papers[paper_index]].append({
+                'aggregate_score': score,
+                'user': self.reviewers[reviewer_index]
+            })
 
         return dict(assignments_by_forum)
 
-    def decode_alternates(self, flow_matrix, num_alternates):
+    def decode_alternates(self, solution, num_alternates, chunk_size=1024):
         '''
         Return a dictionary, keyed on forum IDs, with lists containing dicts
         representing alternate suggested users.
 
+        `solution` is an Assignment (or a dense #papers by #reviewers flow matrix).
+        Alternates are the highest scoring unassigned users of each paper; papers are
+        processed in chunks of `chunk_size` rows to bound the size of temporary arrays.
         '''
+        assignment = self._as_assignment(solution)
+        indptr = assignment.indptr
+        num_papers, num_reviewers = self.matrix_shape
+        num_alternates = min(num_alternates, num_reviewers)
         alternates_by_forum = {}
 
-        for paper_index, paper_flows in enumerate(flow_matrix):
-            paper_id = self.papers[paper_index]
-            unassigned = []
-            for reviewer_index, flow in enumerate(paper_flows):
-                reviewer = self.reviewers[reviewer_index]
-
-                # alternates must not be assigned
-                if not flow:
-                    coordinates = (paper_index, reviewer_index)
-                    paper_user_entry = {
-                        'aggregate_score': self.aggregate_score_matrix[coordinates],
-                        'user': reviewer
-                    }
-                    unassigned.append(paper_user_entry)
-
-            unassigned.sort(key=lambda entry: entry['aggregate_score'], reverse=True)
-
-            alternates_by_forum[paper_id] = unassigned[:num_alternates]
+        for start in range(0, num_papers, chunk_size):
+            stop = min(start + chunk_size, num_papers)
+            block_scores = self.aggregate_score_matrix[start:stop]
+
+            # alternates must not be assigned
+            assigned = np.zeros(block_scores.shape, dtype=bool)
+            block_pointers = slice(indptr[start], indptr[stop])
+            assigned[
+                assignment.paper_indices[block_pointers] - start,
+                assignment.reviewer_indices[block_pointers]] = True
+
+            # stable sort, so that ties are broken by reviewer index
+            order = np.argsort(
+                np.where(assigned, np.inf, -block_scores), axis=1, kind='stable')
+            num_unassigned = num_reviewers - np.sum(assigned, axis=1)
+
+            for row, paper_index in enumerate(range(start, stop)):
+                top = order[row, :min(num_alternates, num_unassigned[row])]
+                alternates_by_forum[self.papers[paper_index]] = [
+                    {
+                        'aggregate_score': block_scores[row, reviewer_index],
+                        'user': self.reviewers[reviewer_index]
+                    } for reviewer_index in top.tolist()
+                ]
 
         return alternates_by_forum
@@ -0,0 +1,123 @@
+'''
+Per-phase instrumentation of a matcher run.
+
+A run is split into named phases (loading the inputs, encoding, solving,
+decoding, writing, ...). Each phase records its wall time, CPU time and its
+peak resident set size (RSS), plus any counts (e.g. network arcs and nodes, or
+solver iterations) added to it by the code that runs the phase. Phases may be
+nested, e.g. solvers that accept an `instrumentation` record the steps of their
+solve as phases inside the Matcher's 'solve' phase.
+
+On Linux, the peak RSS of the process is reset at the start of each phase, so
+the peak of a phase is the highest RSS reached while it ran. Elsewhere, only the
+peak of the whole process is known: a phase records it if the process reached
+it during the phase, and None otherwise. The RSS belongs to the process, so runs
+in concurrent threads of one process (e.g. in the service) see each other's memory.
+
+Callbacks are called with the name and the record of each phase when it ends.
+'''
+
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows.
+    resource = None
+
+def reset_peak_rss():
+    '''
+    Reset the peak resident set size of this process to its current RSS.
+
+    Returns False if it can't be reset (it only can on Linux).
+    '''
+    try:
+        with open('/proc/self/clear_refs', 'w') as file_handle:
+            file_handle.write('5')
+        return True
+    except OSError:
+        return False
+
+def peak_rss():
+    '''
+    Get the peak resident set size of this process in bytes (since the last
+    reset_peak_rss, on Linux), or None if it is unknown.
+    '''
+    try:
+        with open('/proc/self/status') as file_handle:
+            for line in file_handle:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+class Instrumentation:
+    '''Records the phases of a run, in the order in which they started.'''
+    def __init__(self, callbacks=None):
+        self.phases = {}
+        self.callbacks = list(callbacks) if callbacks else []
+        # the peak RSS of each open phase from before the last reset, outermost first.
+        self._open_peaks = []
+
+    def _reset_peak_rss(self):
+        '''Reset the peak RSS, keeping the peak reached so far by the open phases.'''
+        if self._open_peaks:
+            current = peak_rss()
+            self._open_peaks = [
+                peak if current is None else max(peak or 0, current) for peak in self._open_peaks]
+        return reset_peak_rss()
+
+    @contextmanager
+    def phase(self, name):
+        '''
+        Record the phase `name` while the block runs, and yield its record.
+
+        The record is a dict holding 'wall_time' and 'cpu_time' in seconds and
+        'peak_rss' in bytes (see the module docstring), and any counts added
+        with `count`.
+        '''
+        record = {}
+        self.phases[name] = record
+        reset = self._reset_peak_rss()
+        start_peak = None if reset else peak_rss()
+        depth = len(self._open_peaks)
+        self._open_peaks.append(None)
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record['wall_time'] = time.perf_counter() - start_wall
+            record['cpu_time'] = time.process_time() - start_cpu
+            peak = peak_rss()
+            if reset:
+                # nested phases reset the peak; keep the higher one reached before them.
+                folded = self._open_peaks[depth]
+                peak = folded if peak is None else max(folded or 0, peak)
+            elif peak == start_peak:
+                # the peak of the process was reached before this phase.
+                peak = None
+            del self._open_peaks[depth:]
+            record['peak_rss'] = peak
+            for callback in self.callbacks:
+                callback(name, record)
+
+    def count(self, name, **counts):
+        '''Add counts to the record of the phase `name`.'''
+        self.phases[name].update(counts)
+
+    def as_dict(self):
+        '''Get a copy of the phase records, keyed by phase name.'''
+        return {name: dict(record) for name, record in self.phases.items()}
+
+    def summary(self):
+        '''Get a one-line description of the wall time of each phase.'''
+        return ', '.join(
+            '{}={:.3f}s'.format(name, record.get('wall_time', 0.0))
+            for name, record in self.phases.items())
@@ -0,0 +1,154 @@
+'''
+Runs a Matcher in a separate worker process.
+
+The parent only hands over a picklable datasource factory and its arguments
+(e.g. the IDs and credentials that a datasource loads its inputs with), so the
+inputs themselves are never copied between processes. The worker builds the
+datasource and the Matcher, and runs it with a CancellationToken whose event
+is shared with the parent.
+
+The worker streams messages back to the parent over a queue:
+
+    - its log records, which are handled by the parent's logger,
+    - ('status', status value, message) whenever the Matcher's status is set,
+    - ('phase', name, record) whenever a phase of the run ends,
+    - ('error', message) if the run raised an exception.
+
+All the memory of a run is returned to the system when the worker exits. If
+the worker dies without a final status (e.g. it was killed for using too much
+memory), `on_exit` is called with its exit code.
+'''
+
+import logging
+import logging.handlers
+import multiprocessing
+import queue
+import threading
+from .core import Matcher, MatcherStatus
+from .solvers import CancellationToken
+
+FINAL_STATUSES = [
+    MatcherStatus.COMPLETE.value,
+    MatcherStatus.NO_SOLUTION.value,
+    MatcherStatus.CANCELLED.value,
+    MatcherStatus.ERROR.value
+]
+
+def _process_main(messages, cancel_event, deadline, datasource_factory, factory_args, matcher_options):
+    logger = logging.getLogger('matcher.process')
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    logger.addHandler(logging.handlers.QueueHandler(messages))
+
+    try:
+        matcher = Matcher(
+            datasource=datasource_factory(*factory_args, logger=logger),
+            logger=logger,
+            on_set_status=lambda status, message: messages.put(('status', status.value, message)),
+            on_phase=lambda name, record: messages.put(('phase', name, dict(record))),
+            **matcher_options
+        )
+        matcher.run(cancellation=CancellationToken(deadline, event=cancel_event))
+    # report any failure to the parent, which outlives this process.
+    # pylint:disable=broad-except
+    except Exception as error_handle:
+        logger.exception('Matcher process failed')
+        messages.put(('error', str(error_handle)))
+
+class MatcherProcess:
+    '''
+    Arguments:
+    - `datasource_factory`, `factory_args`:
+        a picklable (i.e. module-level) function that is called in the worker
+        as datasource_factory(*factory_args, logger=logger) to build the datasource.
+
+    - `matcher_options`:
+        the other keyword arguments of the Matcher (e.g. solver_class).
+
+    - `on_message` (optional):
+        called in the parent with each ('status' | 'phase' | 'error', ...) message.
+
+    - `on_exit` (optional):
+        called in the parent with the exit code of a worker that exited without
+        setting a final status.
+
+    - `deadline` (optional):
+        a time.time() value after which the run is cancelled.
+
+    - `start_method`:
+        the multiprocessing start method. 'spawn' doesn't copy the parent's
+        threads and memory into the worker.
+    '''
+    def __init__(
+            self,
+            datasource_factory,
+            factory_args,
+            matcher_options=None,
+            logger=logging.getLogger(__name__),
+            on_message=None,
+            on_exit=None,
+            deadline=None,
+            start_method='spawn'
+        ):
+        self.logger = logger
+        self.on_message = on_message
+        self.on_exit = on_exit
+        self.status = None
+        self._context = multiprocessing.get_context(start_method)
+        self._messages = self._context.Queue()
+        self._cancel_event = self._context.Event()
+        self._process = self._context.Process(
+            target=_process_main,
+            args=(
+                self._messages,
+                self._cancel_event,
+                deadline,
+                datasource_factory,
+                factory_args,
+                matcher_options if matcher_options else {}),
+            daemon=True)
+        self._listener = threading.Thread(target=self._listen, daemon=True)
+
+    def start(self):
+        self._process.start()
+        self._listener.start()
+
+    def cancel(self):
+        '''Request the run to stop at its next check (see CancellationToken).'''
+        self._cancel_event.set()
+
+    def join(self, timeout=None):
+        '''Wait until the worker has exited and all of its messages were handled.'''
+        self._listener.join(timeout)
+
+    @property
+    def exitcode(self):
+        return self._process.exitcode
+
+    def _handle(self, message):
+        if isinstance(message, logging.LogRecord):
+            self.logger.handle(message)
+            return
+        if message[0] == 'status':
+            self.status = message[1]
+        if self.on_message:
+            self.on_message(message)
+
+    def _listen(self):
+        while True:
+            try:
+                self._handle(self._messages.get(timeout=0.1))
+            except queue.Empty:
+                if not self._process.is_alive():
+                    break
+
+        # handle what the worker sent right before exiting.
+        while True:
+            try:
+                self._handle(self._messages.get_nowait())
+            except queue.Empty:
+                break
+
+        self._process.join()
+        if self.status not in FINAL_STATUSES and self.on_exit:
+            self.on_exit(self._process.exitcode)
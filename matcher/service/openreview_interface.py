@@ -5,6 +5,11 @@ from tqdm import tqdm
 from matcher.encoder import EncoderError
 from matcher.core import MatcherError, MatcherStatus
 
+def connect_config_note_interface(token, baseurl, config_note_id, logger=logging.getLogger(__name__)):
+    '''Build a ConfigNoteInterface with a new client (e.g. in a matcher worker process)'''
+    client = openreview.Client(token=token, baseurl=baseurl)
+    return ConfigNoteInterface(client=client, config_note_id=config_note_id, logger=logger)
+
 class ConfigNoteInterface:
     def __init__(self, client, config_note_id, logger=logging.getLogger(__name__)):
         self.client = client
@@ -197,6 +202,10 @@ class ConfigNoteInterface:
         self.config_note = self.client.post_note(self.config_note)
         self.logger.debug('status set to: {}'.format(self.config_note.content['status']))
 
+    def set_stats(self, stats):
+        '''Store the phase records of the run, which are posted along with the next status'''
+        self.config_note.content['stats'] = stats
+
     def set_assignments(self, assignments_by_forum):
         '''Helper function for posting assignments returned by the Encoder'''
         label = self.config_note.content['title']
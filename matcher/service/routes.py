@@ -6,10 +6,14 @@ TODO: could error handling be cleaner?
 import flask
 from flask_cors import CORS
 import threading
+import time
 import openreview
 
 from matcher import Matcher
-from .openreview_interface import ConfigNoteInterface
+from matcher.core import MatcherStatus
+from matcher.process import MatcherProcess
+from matcher.solvers import CancellationToken
+from .openreview_interface import ConfigNoteInterface, connect_config_note_interface
 
 BLUEPRINT = flask.Blueprint('match', __name__)
 CORS(BLUEPRINT, supports_credentials=True)
@@ -18,6 +22,33 @@ class MatcherStatusException(Exception):
     '''Exception wrapper class for errors related to the status of the Matcher'''
     pass
 
+# the CancellationToken (or MatcherProcess) of each match running in this service, by config note id.
+RUNNING_MATCHES = {}
+RUNNING_MATCHES_LOCK = threading.Lock()
+
+def _run_match(matcher, config_note_id, cancellation):
+    try:
+        matcher.run(cancellation=cancellation)
+    finally:
+        with RUNNING_MATCHES_LOCK:
+            RUNNING_MATCHES.pop(config_note_id, None)
+
+def _run_match_process(match_process, config_note_id):
+    try:
+        match_process.start()
+        match_process.join()
+    finally:
+        with RUNNING_MATCHES_LOCK:
+            RUNNING_MATCHES.pop(config_note_id, None)
+
+def _set_error_status(interface, exitcode):
+    '''Report a matcher process that exited without setting a final status'''
+    interface.logger.error('Matcher process exited with code {}'.format(exitcode))
+    # the process may have updated the config note.
+    interface.config_note = interface.client.get_note(interface.config_note.id)
+    interface.set_status(
+        MatcherStatus.ERROR, message='The matcher process exited unexpectedly (exit code {})'.format(exitcode))
+
 @BLUEPRINT.route('/match/test')
 def test():
     '''Test endpoint.'''
@@ -63,13 +94,39 @@ def match():
 
         flask.current_app.logger.debug('Solver class {} selected for configuration id {}'.format(solver_class, config_note_id))
 
-        thread = threading.Thread(
-            target=Matcher(
-                datasource=interface,
-                solver_class=solver_class,
-                logger=flask.current_app.logger
-            ).run
-        )
+        # MATCH_TIMEOUT (in seconds) bounds the duration of every match.
+        timeout = flask.current_app.config.get('MATCH_TIMEOUT')
+        deadline = time.time() + timeout if timeout else None
+
+        if flask.current_app.config.get('MATCH_IN_PROCESS'):
+            # the worker process loads the inputs itself, with the same credentials.
+            match_process = MatcherProcess(
+                connect_config_note_interface,
+                (token, flask.current_app.config['OPENREVIEW_BASEURL'], config_note_id),
+                matcher_options={'solver_class': solver_class},
+                logger=flask.current_app.logger,
+                on_exit=lambda exitcode: _set_error_status(interface, exitcode),
+                deadline=deadline
+            )
+            with RUNNING_MATCHES_LOCK:
+                RUNNING_MATCHES[config_note_id] = match_process
+            thread = threading.Thread(target=_run_match_process, args=(match_process, config_note_id))
+        else:
+            cancellation = CancellationToken(deadline=deadline)
+            with RUNNING_MATCHES_LOCK:
+                RUNNING_MATCHES[config_note_id] = cancellation
+            thread = threading.Thread(
+                target=_run_match,
+                args=(
+                    Matcher(
+                        datasource=interface,
+                        solver_class=solver_class,
+                        logger=flask.current_app.logger
+                    ),
+                    config_note_id,
+                    cancellation
+                )
+            )
         thread.start()
 
         flask.current_app.logger.debug('Match for configuration has started: {}'.format(config_note_id))
@@ -102,3 +159,57 @@ def match():
     else:
         flask.current_app.logger.debug('POST returns ' + str(result))
         return flask.jsonify(result), 200
+
+@BLUEPRINT.route('/match/cancel', methods=['POST'])
+def cancel():
+    '''Cancel a match run. The run stops at its next check and sets the Cancelled status'''
+
+    flask.current_app.logger.debug('Cancel request received')
+
+    result = {}
+
+    token = flask.request.headers.get('Authorization')
+    if not token:
+        flask.current_app.logger.error('No Authorization token in headers')
+        result['error'] = 'No Authorization token in headers'
+        return flask.jsonify(result), 400
+    try:
+        config_note_id = flask.request.json['configNoteId']
+
+        # only users that can read the configuration may cancel its match.
+        openreview_client = openreview.Client(
+            token=token,
+            baseurl=flask.current_app.config['OPENREVIEW_BASEURL']
+        )
+        openreview_client.get_note(config_note_id)
+
+        with RUNNING_MATCHES_LOCK:
+            cancellation = RUNNING_MATCHES.get(config_note_id)
+        if cancellation is None:
+            raise MatcherStatusException('No match configured by {} is running'.format(config_note_id))
+        cancellation.cancel()
+
+        flask.current_app.logger.debug('Match for configuration is cancelled: {}'.format(config_note_id))
+
+    except openreview.OpenReviewException as error_handle:
+        flask.current_app.logger.error(str(error_handle))
+
+        error_type = str(error_handle)
+        status = 500
+
+        if 'not found' in error_type.lower():
+            status = 404
+        elif 'forbidden' in error_type.lower():
+            status = 403
+
+        result['error'] = error_type
+        return flask.jsonify(result), status
+
+    except MatcherStatusException as error_handle:
+        flask.current_app.logger.error(str(error_handle))
+        result['error'] = str(error_handle)
+        return flask.jsonify(result), 400
+
+    else:
+        flask.current_app.logger.debug('POST returns ' + str(result))
+        return flask.jsonify(result), 200
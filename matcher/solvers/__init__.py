@@ -1,6 +1,29 @@
-'''A module for paper-reviewer assignment solvers'''
+'''A module for paper-reviewer assignment solvers
 
+The solver modules (and OR-Tools) are only imported when one of their names is
+first used, e.g. by `from matcher.solvers import FairFlow`.
+'''
+
+import importlib
 from .core import *
-from .minmax_solver import MinMaxSolver
-from .simple_solver import SimpleSolver
-from .fairflow import FairFlow
+from .cancellation import CancellationToken, CancelledException
+from .registry import register_solver, available_solvers, get_solver
+
+_LAZY_ATTRIBUTES = {
+    'check_feasibility': '.feasibility',
+    'MinMaxSolver': '.minmax_solver',
+    'SimpleSolver': '.simple_solver',
+    'FairFlow': '.fairflow',
+    'SparseFairFlow': '.sparse_fairflow',
+    'polish': '.local_search'
+}
+
+def __getattr__(name):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+    value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
@@ -0,0 +1,59 @@
+'''
+Cooperative cancellation of matcher runs.
+
+A CancellationToken is shared between the code that starts a run and the run
+itself. The run calls `check` between its phases and the solvers call it
+between their iterations, so that a cancelled run, or a run past its deadline,
+stops at the next check by raising CancelledException.
+
+OR-Tools solves can't be interrupted, so a run stops after the network that is
+being solved when the token is cancelled.
+'''
+
+import threading
+import time
+
+class CancelledException(Exception):
+    '''Raised when a run is cancelled, or runs past its deadline.'''
+    pass
+
+class CancellationToken:
+    '''
+    Arguments:
+    - `deadline` (optional):
+        a time.time() value after which the run is stopped.
+
+    - `event` (optional):
+        the event that `cancel` sets, e.g. a multiprocessing.Event to cancel a run
+        in another process. Defaults to a new threading.Event.
+    '''
+    def __init__(self, deadline=None, event=None):
+        self.deadline = deadline
+        self._event = event if event is not None else threading.Event()
+
+    def cancel(self):
+        '''Request the run to stop at its next check.'''
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    @property
+    def expired(self):
+        return self.deadline is not None and time.time() >= self.deadline
+
+    def check(self):
+        '''Raise CancelledException if the run was cancelled or is past its deadline.'''
+        if self.cancelled:
+            raise CancelledException('The run was cancelled')
+        if self.expired:
+            raise CancelledException('The run exceeded its deadline')
+
+    def __getstate__(self):
+        # worker processes only see the deadline; the parent passes them its own
+        # event to cancel them (see FairFlow._wait_for_workers).
+        return {'deadline': self.deadline}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
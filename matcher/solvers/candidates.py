@@ -0,0 +1,122 @@
+'''
+Candidate selection for pruned assignment graphs.
+
+By default, the solvers add an arc for every eligible reviewer-paper pair, even
+though an optimal assignment uses only a handful of arcs per paper. In pruned mode,
+the graph is restricted to a candidate set:
+
+    - the top-k reviewers of each paper,
+    - the top-k papers of each reviewer,
+    - every pair with a score of at least `threshold` (if given),
+    - every forced (constraint = 1) pair.
+
+If the pruned problem is infeasible, k is doubled for the papers and reviewers
+reported by the feasibility check (or for all of them, if that is not enough),
+until the problem becomes feasible or no eligible pair is left out.
+'''
+
+import logging
+import numpy as np
+from .core import SolverException, InfeasibilityException
+from .feasibility import check_feasibility, eligibility_mask
+
+def _top_k_mask(scores, eligible, k, chunk_size=1024):
+    '''
+    Return a boolean matrix that is True for the `k[i]` highest scoring eligible
+    entries of each row `i` of `scores`.
+    '''
+    num_rows, num_columns = scores.shape
+    mask = np.zeros(scores.shape, dtype=bool)
+
+    for start in range(0, num_rows, chunk_size):
+        stop = min(start + chunk_size, num_rows)
+        row_k = np.minimum(k[start:stop], num_columns)
+        max_k = int(np.max(row_k, initial=0))
+        if max_k == 0:
+            continue
+
+        block = np.where(eligible[start:stop], scores[start:stop], -np.inf)
+        if max_k < num_columns:
+            top = np.argpartition(-block, max_k - 1, axis=1)[:, :max_k]
+        else:
+            top = np.tile(np.arange(num_columns), (stop - start, 1))
+
+        # order the top columns, so that rows with a smaller k keep the best ones.
+        order = np.argsort(-np.take_along_axis(block, top, axis=1), axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+
+        keep = np.arange(max_k)[np.newaxis, :] < row_k[:, np.newaxis]
+        rows = np.broadcast_to(np.arange(start, stop)[:, np.newaxis], top.shape)
+        mask[rows[keep], top[keep]] = True
+
+    return mask & eligible
+
+def candidate_mask(scores, eligible, paper_k, reviewer_k, threshold=None):
+    '''
+    Return a #papers by #reviewers boolean matrix of candidate pairs.
+
+    `scores` is a #papers by #reviewers matrix where higher is better. `paper_k` and
+    `reviewer_k` are arrays holding the number of candidates to keep for each paper
+    and reviewer respectively.
+    '''
+    mask = _top_k_mask(scores, eligible, paper_k)
+    mask |= np.transpose(_top_k_mask(np.transpose(scores), np.transpose(eligible), reviewer_k))
+    if threshold is not None:
+        mask |= eligible & (scores >= threshold)
+    return mask
+
+def select_candidates(
+        scores,
+        constraint_matrix,
+        minimums,
+        maximums,
+        demands,
+        top_k,
+        threshold=None,
+        logger=logging.getLogger(__name__)
+    ):
+    '''
+    Return a #papers by #reviewers boolean matrix of candidate pairs for which the
+    assignment problem is feasible, widening k where the pruned problem is not.
+
+    Raises an InfeasibilityException if the unpruned problem is infeasible.
+    '''
+    if top_k < 1:
+        raise SolverException('top_k must be a positive integer, got {}'.format(top_k))
+
+    num_papers, num_reviewers = np.shape(constraint_matrix)
+    eligible = eligibility_mask(constraint_matrix, maximums)
+    num_eligible = np.sum(eligible)
+    forced = eligible & (constraint_matrix == 1)
+
+    paper_k = np.full(num_papers, top_k, dtype=int)
+    reviewer_k = np.full(num_reviewers, top_k, dtype=int)
+
+    while True:
+        mask = candidate_mask(scores, eligible, paper_k, reviewer_k, threshold=threshold) | forced
+        num_candidates = np.sum(mask)
+        logger.debug('Pruned graph keeps {} of {} eligible arcs'.format(num_candidates, num_eligible))
+
+        try:
+            check_feasibility(
+                minimums,
+                maximums,
+                demands,
+                np.where(mask, constraint_matrix, -1),
+                logger=logger)
+            return mask
+        except InfeasibilityException as error_handle:
+            if num_candidates == num_eligible or not (error_handle.papers or error_handle.reviewers):
+                raise
+
+            widened_papers = [p for p in error_handle.papers if paper_k[p] < num_reviewers]
+            widened_reviewers = [r for r in error_handle.reviewers if reviewer_k[r] < num_papers]
+            if not widened_papers and not widened_reviewers:
+                widened_papers = np.arange(num_papers)
+                widened_reviewers = np.arange(num_reviewers)
+
+            paper_k[widened_papers] *= 2
+            reviewer_k[widened_reviewers] *= 2
+
+            logger.debug('Pruned graph is infeasible; widened k for {} papers and {} reviewers'.format(
+                len(widened_papers), len(widened_reviewers)))
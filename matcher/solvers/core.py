@@ -1,3 +1,15 @@
 class SolverException(Exception):
     '''Exception wrapper class for errors related to the SimpleSolver'''
     pass
+
+class InfeasibilityException(SolverException):
+    '''
+    Raised when a pre-solve check proves that no assignment can satisfy the inputs.
+
+    `papers` and `reviewers` hold the indices of the papers whose demands, and of the
+    reviewers whose minimums, could not be met.
+    '''
+    def __init__(self, message, papers=None, reviewers=None):
+        super().__init__(message)
+        self.papers = list(papers) if papers is not None else []
+        self.reviewers = list(reviewers) if reviewers is not None else []
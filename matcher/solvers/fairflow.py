@@ -1,9 +1,17 @@
-from collections import defaultdict
 from ortools.graph import pywrapgraph
 import numpy as np
 import uuid
 import time
+import json
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_EXCEPTION, wait
+from .candidates import select_candidates
+from .cancellation import CancellationToken, CancelledException
 from .core import SolverException
+from .network import add_arcs, arc_flows
+from .tie_breaking import fill_tie_breaking_scores
+from ..assignment import Assignment
 import logging
 
 
@@ -28,8 +36,37 @@ class FairFlow(object):
     either: there are no papers in the first group, there are no papers in the
     third group, or running the procedure does not change the sum total score of
     the matching.
+
+    Invariants that need more than a pass over the paper and reviewer vectors
+    are only checked if `debug` is set (see _verify); the test suite sets it
+    for all solvers.
     """
-    def __init__(self, minimums, maximums, demands, encoder, solution=None, logger=logging.getLogger(__name__)):
+    debug = False
+
+    def __init__(
+            self,
+            minimums,
+            maximums,
+            demands,
+            encoder,
+            solution=None,
+            logger=logging.getLogger(__name__),
+            top_k=None,
+            score_threshold=None,
+            tie_break_seed=None,
+            workers=None,
+            ms_iterations=10,
+            ms_tolerance=None,
+            ms_stall_iterations=None,
+            time_budget=None,
+            starts=None,
+            perturbation=1e-6,
+            memory_lean=False,
+            cancellation=None,
+            checkpoint=None,
+            checkpoint_interval=60,
+            debug=None
+        ):
         """
         Initialize a makespan flow matcher
 
@@ -38,49 +75,216 @@ class FairFlow(object):
         :param demands: a list of integers specifying the number of reviews required per paper.
         :param encoder: an Encoder class object used to get affinity and constraint matrices.
         :param solution: a matrix of assignments (same shape as encoder.affinity_matrix)
+        :param top_k: if given, only consider the top-k reviewers of each paper and top-k papers of each reviewer.
+        :param score_threshold: in pruned mode, also consider every pair with at least this affinity.
+        :param tie_break_seed: if all affinities are zero, replace them with deterministic pseudo-random
+            values derived from this seed (instead of an unseeded random matrix).
+        :param workers: if greater than 1, search for the makespan by evaluating this many
+            candidate makespans at a time on a pool of worker processes.
+        :param ms_iterations: the maximum number of binary search steps for the makespan.
+        :param ms_tolerance: if given, stop the makespan search once the width of the search
+            interval is at most this fraction of its upper end.
+        :param ms_stall_iterations: if given, stop the makespan search after this many
+            consecutive steps that don't improve the worst paper score.
+        :param time_budget: if given, a number of seconds after which solve stops improving
+            the solution and returns the best valid solution found so far.
+        :param starts: if greater than 1, solve this many differently seeded instances on a
+            pool of worker processes and keep the one with the best worst paper score.
+        :param perturbation: in multi-start mode, the seeded perturbation added to tied, but
+            not all-zero, affinities, relative to the maximum affinity.
+        :param memory_lean: if True, read the affinities from the encoder's score matrix
+            without copying or shifting it, and keep the solution as a boolean matrix.
+        :param cancellation: if given, a CancellationToken that is checked before each
+            improvement iteration; solve raises CancelledException once it is cancelled
+            or past its deadline.
+        :param checkpoint: if given, the path of a file that the state of the makespan search
+            is saved to, and that solve resumes from if it exists. The path must identify the
+            instance (the Matcher names it after the fingerprint of the inputs). In multi-start
+            mode, each start uses its own path, derived from this one.
+        :param checkpoint_interval: the minimum number of seconds between two checkpoints.
+        :param debug: if given, overrides the class-wide `debug` setting.
 
         :return: initialized makespan matcher.
         """
         self.logger = logger
         self.logger.debug('Init FairFlow')
-        self.constraint_matrix = encoder.constraint_matrix
-        affinity_matrix = encoder.aggregate_score_matrix.transpose()
+        if debug is not None:
+            self.debug = debug
 
         self.maximums = maximums
         self.minimums = minimums
         self.demands = demands
-        # make sure that all weights are positive:
-        self.affinity_matrix = affinity_matrix.copy()
-        if not self.affinity_matrix.any():
-            self.affinity_matrix = np.random.rand(*affinity_matrix.shape)
-
-        self.orig_affinities = self.affinity_matrix.copy()
-
-        self.num_reviewers = np.size(self.affinity_matrix, axis=0)
-        self.num_papers = np.size(self.affinity_matrix, axis=1)
-
-        min_affinities = np.min(affinity_matrix)
-        if min_affinities < 0:
-            self.affinity_matrix -= min_affinities
+        self.top_k = top_k
+        self.score_threshold = score_threshold
+        self.workers = workers
+        self.ms_iterations = ms_iterations
+        self.ms_tolerance = ms_tolerance
+        self.ms_stall_iterations = ms_stall_iterations
+        self.iteration_stats = []
+        self.time_budget = time_budget
+        self.starts = starts
+        self.perturbation = perturbation
+        self.start_stats = []
+        # counts of the networks solved and of the improvement iterations run.
+        self.stats = {'networks': 0, 'nodes': 0, 'arcs': 0, 'iterations': 0}
+        self.memory_lean = memory_lean
+        self.cancellation = cancellation
+        self.checkpoint = checkpoint
+        self.checkpoint_interval = checkpoint_interval
+        self._last_checkpoint = None
+        self.tie_break_seed = tie_break_seed
+        self.all_zero_affinities = not encoder.aggregate_score_matrix.any()
+        # the unperturbed #papers by #reviewers scores that the objective is computed on.
+        self.scores = encoder.aggregate_score_matrix
+        self._deadline = None
+        # (worst paper score, total paper score, makespan, assigned indices) of the best valid solution.
+        self._snapshot = None
+        self.num_papers, self.num_reviewers = np.shape(encoder.aggregate_score_matrix)
+        self._init_affinities(encoder, tie_break_seed)
         self.id = uuid.uuid4()
         self.makespan = 0.0     # the minimum allowable paper score.
-        self.solution = solution if solution else np.zeros((self.num_reviewers, self.num_papers))
+        self._init_solution(solution)
         self.valid = True if solution else False
-        assert(self.affinity_matrix.shape == self.solution.shape)
-        self.max_affinities = np.max(self.affinity_matrix)
+        self._reset_scores()
         self.big_c = 10000
         self.bigger_c = self.big_c ** 2
 
         self.min_cost_flow = pywrapgraph.SimpleMinCostFlow()
-        self.start_inds = []
-        self.end_inds = []
-        self.caps = []
-        self.costs = []
+        self._assignment_arcs = []
+        self._unassignment_arcs = []
         self.source = self.num_reviewers + self.num_papers
         self.sink = self.num_reviewers + self.num_papers + 1
         self.solved = False
         self.logger.debug('End Init FairFlow')
 
+    # Storage of affinities and of the solution. FairFlow keeps dense reviewers
+    # x papers matrices; SparseFairFlow overrides these methods to only store
+    # a set of candidate pairs. The rest of the algorithm works on arrays of
+    # (reviewer, paper) pairs through them.
+
+    def _init_affinities(self, encoder, tie_break_seed):
+        """Set up the (shifted, non-negative) affinities and the constraints.
+
+        In memory-lean mode, `affinity_matrix` is the transposed view of the
+        encoder's score matrix, and the shift is added whenever affinities are
+        read (see `affinity_shift`) instead of being applied to a copy.
+        """
+        self.constraint_matrix = encoder.constraint_matrix
+        affinity_matrix = encoder.aggregate_score_matrix.transpose()
+        if not affinity_matrix.any():
+            if tie_break_seed is None:
+                affinity_matrix = np.random.rand(*affinity_matrix.shape)
+            else:
+                # the refinement networks read affinities everywhere, so fill a
+                # matrix with them rather than perturbing arcs one by one.
+                affinity_matrix = fill_tie_breaking_scores(
+                    np.empty(affinity_matrix.shape), tie_break_seed, transposed=True)
+
+        min_affinities = np.min(affinity_matrix)
+        # paper scores are sums of shifted affinities; this undoes the shift.
+        self.affinity_offset = min(min_affinities, 0)
+        # make sure that all weights are positive:
+        if self.memory_lean:
+            self.affinity_matrix = affinity_matrix
+            self.orig_affinities = affinity_matrix
+            self.affinity_shift = -self.affinity_offset
+        else:
+            self.affinity_matrix = affinity_matrix - self.affinity_offset
+            self.orig_affinities = affinity_matrix.copy()
+            self.affinity_shift = 0
+        self.max_affinities = np.max(self.affinity_matrix) + self.affinity_shift
+
+    def _reseed_affinities(self, seed):
+        """Perturb the affinities with tie-breaking scores derived from `seed`.
+
+        All-zero affinities are replaced by the tie-breaking scores; otherwise
+        the scores are scaled by `perturbation` * maxaffinity, so that they
+        only reorder (nearly) tied pairs.
+        """
+        noise = fill_tie_breaking_scores(np.empty(self.affinity_matrix.shape), seed, transposed=True)
+        if self.all_zero_affinities:
+            self.affinity_matrix = noise
+        elif self.memory_lean:
+            # the affinities may be a view of the encoder's scores, which must not change.
+            self.affinity_matrix = self.affinity_matrix + self.perturbation * self.max_affinities * noise
+        else:
+            self.affinity_matrix += self.perturbation * self.max_affinities * noise
+        self.max_affinities = np.max(self.affinity_matrix) + self.affinity_shift
+        self._reset_scores()
+
+    def _solution_dtype(self):
+        return bool if self.memory_lean else float
+
+    def _init_solution(self, solution):
+        if solution:
+            self.solution = np.asarray(solution, dtype=self._solution_dtype())
+        else:
+            self.solution = np.zeros((self.num_reviewers, self.num_papers), dtype=self._solution_dtype())
+        assert(self.affinity_matrix.shape == self.solution.shape)
+
+    def _pair_affinities(self, revs, paps):
+        """Get the (shifted) affinity of each reviewer-paper pair."""
+        return self.affinity_matrix[revs, paps] + self.affinity_shift
+
+    def _is_assigned(self, revs, paps):
+        return self.solution[revs, paps] == 1.0
+
+    def _is_eligible(self, revs, paps):
+        return self.constraint_matrix[paps, revs] == 0
+
+    def _set_assigned(self, revs, paps, assigned):
+        self.solution[revs, paps] = 1.0 if assigned else 0.0
+
+    def _assigned_pairs(self, papers=None):
+        """Get the reviewers and papers of all assigned pairs (or only those of `papers`)."""
+        if papers is None:
+            return np.nonzero(self.solution)
+        # read the pairs of `papers` from their reviewer sets, in the order of
+        # np.nonzero(self.solution[:, papers]).
+        counts = [len(self.paper_reviewers[pap]) for pap in papers]
+        revs = np.fromiter(
+            (rev for pap in papers for rev in self.paper_reviewers[pap]), dtype=int, count=sum(counts))
+        index = np.repeat(np.arange(np.size(papers)), counts)
+        order = np.lexsort((index, revs))
+        return revs[order], np.asarray(papers, dtype=int)[index[order]]
+
+    def _open_pairs(self, reviewers=None, papers=None):
+        """Get the reviewers and papers of the unassigned pairs that may be assigned.
+
+        If given, only pairs between `reviewers` and `papers` are considered.
+
+        a constraint of 0 means there's no constraint, so the pair is open.
+        a constraint of 1 means that this user was explicitly assigned to this paper. We do not support positive constraints right now, so the pair is not open.
+        a constraint of anything other that 0 or 1 essentially indicates a conflict, so the pair is not open.
+        """
+        if reviewers is None and papers is None:
+            return np.nonzero((self.constraint_matrix.transpose() == 0) & (self.solution != 1))
+
+        reviewers = np.arange(self.num_reviewers) if reviewers is None else reviewers
+        papers = np.arange(self.num_papers) if papers is None else papers
+        open_pairs = (self.solution[np.ix_(reviewers, papers)] == 0) & \
+            (self.constraint_matrix[np.ix_(papers, reviewers)].transpose() == 0)
+        reviewer_index, paper_index = np.nonzero(open_pairs)
+        return reviewers[reviewer_index], papers[paper_index]
+
+    def _load_assignment(self, revs, paps):
+        """Replace the solution with the given assigned pairs."""
+        self.solution = np.zeros((self.num_reviewers, self.num_papers), dtype=self._solution_dtype())
+        self.solution[revs, paps] = 1.0
+        self._reset_scores()
+
+    def __getstate__(self):
+        # the OR-Tools network can't be pickled; workers start from an empty one.
+        state = self.__dict__.copy()
+        state['min_cost_flow'] = None
+        state['_assignment_arcs'] = []
+        state['_unassignment_arcs'] = []
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.min_cost_flow = pywrapgraph.SimpleMinCostFlow()
+
     def _validate_input_range(self):
         '''Validate if demand is in the range of min supply and max supply'''
         self.logger.debug('Checking if demand is in range')
@@ -96,17 +300,184 @@ class FairFlow(object):
 
         self.logger.debug('Finished checking graph inputs')
 
+    def _prune_constraints(self):
+        """Mark the pairs outside of the candidate set as conflicts."""
+        candidates = select_candidates(
+            self.orig_affinities.transpose(),
+            self.constraint_matrix,
+            self.minimums,
+            self.maximums,
+            self.demands,
+            self.top_k,
+            threshold=self.score_threshold,
+            logger=self.logger)
+        self.constraint_matrix = np.where(candidates, self.constraint_matrix, -1)
+
     def objective_val(self):
-        """Get the objective value of the RAP."""
-        return np.sum(self.sol_as_mat() * self.orig_affinities)
+        """Get the objective value of the RAP, on the encoder's scores.
+
+        The affinities the solver works with may be random or perturbed (when the
+        scores are all zero, or in multi-start mode), so they aren't used here.
+        """
+        self._check_valid()
+        revs, paps = self._assigned_pairs(np.arange(self.num_papers))
+        return np.sum(self.scores[paps, revs])
+
+    def _count_network(self, min_cost_flow):
+        self.stats['networks'] += 1
+        self.stats['nodes'] += min_cost_flow.NumNodes()
+        self.stats['arcs'] += min_cost_flow.NumArcs()
+
+    def _add_stats(self, stats):
+        """Add the counts of a worker process (see _stats_since)."""
+        for key, value in stats.items():
+            self.stats[key] += value
+
+    def _save_checkpoint(self, state, force=False):
+        """Save `state` (a JSON-serializable dict) and the solution, at most every `checkpoint_interval` seconds."""
+        if self.checkpoint is None:
+            return
+        now = time.time()
+        if not force and self._last_checkpoint is not None and now - self._last_checkpoint < self.checkpoint_interval:
+            return
+        revs, paps = self._assigned_pairs()
+        state = dict(
+            state,
+            shape=[self.num_papers, self.num_reviewers],
+            iteration_stats=self.iteration_stats,
+            stats=self.stats)
+        # write to a temporary file first, so that a crash never leaves a partial checkpoint.
+        temporary_path = self.checkpoint + '.tmp'
+        with open(temporary_path, 'wb') as file_handle:
+            np.savez(
+                file_handle,
+                reviewers=revs,
+                papers=paps,
+                state=np.array(json.dumps(state, default=lambda value: value.item())))
+        os.replace(temporary_path, self.checkpoint)
+        self._last_checkpoint = now
+        self.logger.debug('#info FairFlow:saved checkpoint %s' % self.checkpoint)
+
+    def _load_checkpoint(self):
+        """Load the solution of the checkpoint, if there is one, and return its state (or None)."""
+        if self.checkpoint is None or not os.path.exists(self.checkpoint):
+            return None
+        with np.load(self.checkpoint) as checkpoint:
+            state = json.loads(str(checkpoint['state']))
+            if state['shape'] != [self.num_papers, self.num_reviewers]:
+                self.logger.warning('Ignoring checkpoint %s of a different instance' % self.checkpoint)
+                return None
+            self._load_assignment(checkpoint['reviewers'], checkpoint['papers'])
+        self.valid = True
+        self.iteration_stats = state['iteration_stats']
+        self.stats.update(state['stats'])
+        self.logger.debug('#info FairFlow:resuming from checkpoint %s' % self.checkpoint)
+        return state
+
+    def _remove_checkpoint(self):
+        if self.checkpoint is not None and os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+
+    def _start_checkpoint(self, start):
+        """Get the checkpoint path of the start with index `start` of a multi-start run."""
+        if self.checkpoint is None:
+            return None
+        root, extension = os.path.splitext(self.checkpoint)
+        return '{}.start{}{}'.format(root, start, extension)
+
+    def _budget_expired(self):
+        return self._deadline is not None and time.time() >= self._deadline
+
+    def _take_snapshot(self):
+        """Remember the current (valid) solution if it is the best one found so far.
+
+        Solutions are ranked by their worst paper score, then by their total score.
+        The pairs are read from the maintained reviewer sets of the papers, not
+        from the dense solution matrix.
+        """
+        score = (np.min(self.paper_scores), np.sum(self.paper_scores))
+        if self._snapshot is None or score > self._snapshot[:2]:
+            self._snapshot = score + (self.makespan, self._assigned_pairs(np.arange(self.num_papers)))
+
+    def _restore_snapshot(self):
+        """Make the best solution found so far the current solution."""
+        if self._snapshot is not None:
+            self._load_assignment(*self._snapshot[3])
+            self.valid = True
+
+    def _as_assignment(self, revs, paps):
+        return Assignment(paps, revs, (self.num_papers, self.num_reviewers))
+
+    def best_assignment(self):
+        """Get the best valid solution found so far as an Assignment (None if there is none yet)."""
+        if self._snapshot is None:
+            return None
+        return self._as_assignment(*self._snapshot[3])
+
+    def _reset_scores(self):
+        """Recompute the paper scores and the paper and reviewer loads from the solution."""
+        revs, paps = self._assigned_pairs()
+        self.paper_scores = np.bincount(
+            paps, weights=self._pair_affinities(revs, paps), minlength=self.num_papers).astype(float)
+        self.paper_loads = np.bincount(paps, minlength=self.num_papers)
+        self.reviewer_loads = np.bincount(revs, minlength=self.num_reviewers)
+        self.paper_reviewers = [set() for _ in range(self.num_papers)]
+        for rev, pap in zip(revs.tolist(), paps.tolist()):
+            self.paper_reviewers[pap].add(rev)
+
+    def _assign(self, revs, paps):
+        """Assign each reviewer in `revs` to the paper at the same position in `paps`."""
+        revs, paps = np.asarray(revs, dtype=int), np.asarray(paps, dtype=int)
+        if self.debug:
+            assert(not np.any(self._is_assigned(revs, paps)))
+        self._set_assigned(revs, paps, True)
+        np.add.at(self.paper_scores, paps, self._pair_affinities(revs, paps))
+        np.add.at(self.paper_loads, paps, 1)
+        np.add.at(self.reviewer_loads, revs, 1)
+        for rev, pap in zip(revs.tolist(), paps.tolist()):
+            self.paper_reviewers[pap].add(rev)
+
+    def _unassign(self, revs, paps):
+        """Unassign each reviewer in `revs` from the paper at the same position in `paps`."""
+        revs, paps = np.asarray(revs, dtype=int), np.asarray(paps, dtype=int)
+        if self.debug:
+            assert(np.all(self._is_assigned(revs, paps)))
+        self._set_assigned(revs, paps, False)
+        np.subtract.at(self.paper_scores, paps, self._pair_affinities(revs, paps))
+        np.subtract.at(self.paper_loads, paps, 1)
+        np.subtract.at(self.reviewer_loads, revs, 1)
+        for rev, pap in zip(revs.tolist(), paps.tolist()):
+            self.paper_reviewers[pap].remove(rev)
+
+    def _check_loads(self):
+        """Check that the solution is valid, from the paper and reviewer loads only."""
+        assert (np.all(self.paper_loads == self.demands))
+        assert (np.all(self.reviewer_loads <= self.maximums))
+        if self.minimums is not None:
+            assert (np.all(self.reviewer_loads >= self.minimums))
+
+    def _verify(self):
+        """Check the invariants of the solver state in full (only in debug mode).
+
+        The maintained paper scores, loads and reviewer sets must match the
+        assigned pairs, and only eligible pairs may be assigned.
+        """
+        if not self.debug:
+            return
+        revs, paps = self._assigned_pairs()
+        assert np.all(self._is_eligible(revs, paps))
+        assert np.allclose(self.paper_scores, np.bincount(
+            paps, weights=self._pair_affinities(revs, paps), minlength=self.num_papers))
+        assert np.array_equal(self.paper_loads, np.bincount(paps, minlength=self.num_papers))
+        assert np.array_equal(self.reviewer_loads, np.bincount(revs, minlength=self.num_reviewers))
+        assert sum(len(reviewers) for reviewers in self.paper_reviewers) == np.size(revs)
+        assert all(rev in self.paper_reviewers[pap] for rev, pap in zip(revs.tolist(), paps.tolist()))
 
     def _refresh_internal_vars(self):
-        """Set start, end, caps, costs to be empty."""
+        """Start a new, empty min cost flow network."""
         self.min_cost_flow = pywrapgraph.SimpleMinCostFlow()
-        self.start_inds = []
-        self.end_inds = []
-        self.caps = []
-        self.costs = []
+        self._assignment_arcs = []
+        self._unassignment_arcs = []
 
     def _grp_paps_by_ms(self):
         """Group papers by makespan.
@@ -125,7 +496,7 @@ class FairFlow(object):
         Returns:
             A 3-tuple of paper ids.
         """
-        paper_scores = np.sum(self.solution * self.affinity_matrix, axis=0)
+        paper_scores = self.paper_scores
         g1 = np.where(paper_scores >= self.makespan)[0]
         g2 = np.intersect1d(
             np.where(self.makespan > paper_scores),
@@ -137,16 +508,20 @@ class FairFlow(object):
     def _worst_reviewer(self, papers):
         """Get the worst reviewer from each paper in the input.
 
+        Only the assigned pairs of `papers` are looked at. Ties are broken in
+        favor of the lowest reviewer index.
+
         Args:
             papers - numpy array of paper indices.
 
         Returns:
-            A tuple of rows and columns of the
+            A tuple of the reviewers and the papers they were found for (papers
+            without any reviewers are left out).
         """
-        mask = (self.solution - 1.0) * -self.big_c
-        tmp = (mask + self.affinity_matrix).astype('float')
-        worst_revs = np.argmin(tmp, axis=0)
-        return worst_revs[papers], papers
+        revs, paps = self._assigned_pairs(papers)
+        order = np.lexsort((revs, self._pair_affinities(revs, paps), paps))
+        _, first = np.unique(paps[order], return_index=True)
+        return revs[order][first], paps[order][first]
 
     def _construct_and_solve_validifier_network(self):
         """Construct a network to make an invalid solution valid.
@@ -161,27 +536,24 @@ class FairFlow(object):
         # First solve flow with lower bounds as caps.
         # Construct edges between the source and each reviewer that must review.
         if self.minimums is not None:
-            rev_caps = np.maximum(self.minimums - np.sum(self.solution, axis=1), 0)
+            rev_caps = np.maximum(self.minimums - self.reviewer_loads, 0)
             assert (np.size(rev_caps) == self.num_reviewers)
             flow = np.sum(rev_caps)
-            pap_caps = np.maximum(self.demands - np.sum(self.solution, axis=0), 0)
-            self._construct_graph_and_solve(self.num_reviewers, self.num_papers, rev_caps, pap_caps, self.affinity_matrix, flow)
+            pap_caps = np.maximum(self.demands - self.paper_loads, 0)
+            self._construct_graph_and_solve(self.num_reviewers, self.num_papers, rev_caps, pap_caps, flow)
 
         # Now compute the residual flow that must be routed so that each paper
         # is sufficiently reviewed. Also compute residual maximums and demands.
-        rev_caps = self.maximums - np.sum(self.solution, axis=1)
+        rev_caps = self.maximums - self.reviewer_loads
         assert (np.size(rev_caps) == self.num_reviewers)
-        pap_caps = np.maximum(self.demands - np.sum(self.solution, axis=0), 0)
+        pap_caps = np.maximum(self.demands - self.paper_loads, 0)
         flow = np.sum(pap_caps)
-        self._construct_graph_and_solve(self.num_reviewers, self.num_papers, rev_caps, pap_caps, self.affinity_matrix, flow)
+        self._construct_graph_and_solve(self.num_reviewers, self.num_papers, rev_caps, pap_caps, flow)
 
         # Finally, return.
-        assert (np.all(np.sum(self.solution, axis=0) == self.demands))
-        assert (np.all(np.sum(self.solution, axis=1) <= self.maximums))
-        if self.minimums is not None:
-            assert (np.all(np.sum(self.solution, axis=1) >= self.minimums))
+        self._check_loads()
+        self._verify()
         self.valid = True
-        return self.solution
 
     def _construct_ms_improvement_network(self, g1, g2, g3):
         """Construct the network that reassigns reviewers to improve makespan.
@@ -202,114 +574,67 @@ class FairFlow(object):
         Returns:
             None -- modifies the internal min_cost_flow network.
         """
-        # Must convert to python ints first.
-        g1 = [int(x) for x in g1]
-        g2 = [int(x) for x in g2]
-        g3 = [int(x) for x in g3]
+        g1 = np.asarray(g1, dtype=int)
+        g2 = np.asarray(g2, dtype=int)
+        g3 = np.asarray(g3, dtype=int)
 
-        pap_scores = np.sum(self.solution * self.affinity_matrix, axis=0)
+        pap_scores = self.paper_scores
+        lower_ms = self.makespan - self.max_affinities
+        dummy_offset = self.num_reviewers + self.num_papers + 2
 
-        # First construct edges between the source and each pap in g1.
         self._refresh_internal_vars()
-        for i in range(np.size(g1)):
-            self.start_inds.append(self.source)
-            self.end_inds.append(self.num_reviewers + g1[i])
-            self.caps.append(1)
-            self.costs.append(0)
+        mcf = self.min_cost_flow
+
+        # First construct edges between the source and each pap in g1.
+        add_arcs(mcf, np.full(np.size(g1), self.source), self.num_reviewers + g1, 1, 0)
 
         # Next construct the sink node and edges to each paper in g3.
-        papers_needing_no_assignments = 0
-        for i in range(np.size(g3)):
-            self.start_inds.append(self.num_reviewers + g3[i])
-            self.end_inds.append(self.sink)
-            edge_capacity = 1 if self.demands[g3[i]] else 0
-            self.caps.append(edge_capacity)
-            self.costs.append(0)
-            papers_needing_no_assignments += (1 - edge_capacity)
+        g3_caps = (np.asarray(self.demands)[g3] > 0).astype(int)
+        papers_needing_no_assignments = np.size(g3) - np.sum(g3_caps)
+        add_arcs(mcf, self.num_reviewers + g3, np.full(np.size(g3), self.sink), g3_caps, 0)
 
         # For each paper in g2, create a dummy node the restricts the flow to
         # that paper to 1.
-        for pap2 in g2:
-            self.start_inds.append(self.num_reviewers + self.num_papers + 2 + pap2)
-            self.end_inds.append(self.num_reviewers + pap2)
-            self.caps.append(1)
-            self.costs.append(0)
+        add_arcs(mcf, dummy_offset + g2, self.num_reviewers + g2, 1, 0)
 
         # For each assignment in the g1 group, reverse the flow.
-        revs, paps1 = np.nonzero(self.solution[:, g1])
-        assignment_to_give = set()
-        added = set()
-        pg2_to_minaff = defaultdict(lambda: np.inf) # min incoming affinity.
-        for i in range(np.size(revs)):
-            rev = int(revs[i])
-            pap = g1[paps1[i]]
-            assert(self.solution[rev, pap] == 1.0)
-            self.start_inds.append(self.num_reviewers + pap)
-            self.end_inds.append(rev)
-            self.caps.append(1)
-            self.costs.append(0)
-            assignment_to_give.add(rev)
-
-            # and now connect this reviewer to each dummy paper associate with
-            # a paper in g2 if that rev not already been assigned to that paper.
-            if rev not in added:
-                for pap2 in g2:
-                    if self.solution[rev, pap2] == 0.0 and self.constraint_matrix[pap2, rev] == 0.0:
-                        rp_aff = self.affinity_matrix[rev, pap2]
-                        self.start_inds.append(rev)
-                        self.end_inds.append(self.num_reviewers + self.num_papers + 2 + pap2)
-                        pg2_to_minaff[pap2] = min(pg2_to_minaff[pap2], rp_aff)
-
-                        self.caps.append(1)
-                        self.costs.append(0)
-                added.add(rev)
+        revs1, paps1 = self._assigned_pairs(g1)
+        self._unassignment_arcs = [(add_arcs(mcf, self.num_reviewers + paps1, revs1, 1, 0), revs1, paps1)]
+
+        # and now connect each of these reviewers to each dummy paper associated with
+        # a paper in g2 if that rev is not already assigned to that paper.
+        givers = np.unique(revs1)
+        revs_to_g2, paps_to_g2 = self._open_pairs(givers, g2)
+        self._assignment_arcs = [(add_arcs(mcf, revs_to_g2, dummy_offset + paps_to_g2, 1, 0), revs_to_g2, paps_to_g2)]
+
+        # min incoming affinity of each paper in g2.
+        min_aff = np.full(self.num_papers, np.inf)
+        np.minimum.at(min_aff, paps_to_g2, self._pair_affinities(revs_to_g2, paps_to_g2))
+
         # For each paper in g2, reverse the flow to assigned revs only if the
         # reversal, plus the min edge coming in from G1 wouldn't violate ms.
-        revs, paps2 = np.nonzero(self.solution[:, g2])
-        for i in range(np.size(revs)):
-            rev = int(revs[i])
-            pap = g2[paps2[i]]
-            pap_score = pap_scores[pap]
-            assert(self.solution[rev, pap] == 1.0)
-            min_in = pg2_to_minaff[pap]
-            rp_aff = self.affinity_matrix[rev, pap]
-            # lower bound on new paper score.
-            lower_bound = (pap_score + min_in - rp_aff)
-            ms_satisfied = (self.makespan - self.max_affinities) <= lower_bound
-            if min_in < np.inf and ms_satisfied:
-                self.start_inds.append(self.num_reviewers + pap)
-                self.end_inds.append(rev)
-                self.caps.append(1)
-                self.costs.append(0)
-                assignment_to_give.add(rev)
+        revs2, paps2 = self._assigned_pairs(g2)
+        min_in = min_aff[paps2]
+        # lower bound on new paper score.
+        lower_bound = pap_scores[paps2] + min_in - self._pair_affinities(revs2, paps2)
+        reversible = (min_in < np.inf) & (lower_ms <= lower_bound)
+        revs2, paps2 = revs2[reversible], paps2[reversible]
+        self._unassignment_arcs.append((add_arcs(mcf, self.num_reviewers + paps2, revs2, 1, 0), revs2, paps2))
 
         # For each reviewer, connect them to a paper in g3 if not assigned.
-        for rev in assignment_to_give:
-            for pap3 in g3:
-                if self.solution[rev, pap3] == 0.0 and self.constraint_matrix[pap3, rev] == 0.0:
-                    self.start_inds.append(rev)
-                    self.end_inds.append(self.num_reviewers + pap3)
-                    self.caps.append(1)
-                    lb = self.makespan - self.max_affinities
-                    pap_score = pap_scores[pap3]
-                    rp_aff = self.affinity_matrix[rev, pap3]
-                    # give a bigger reward if assignment would improve group.
-                    if rp_aff + pap_score >= lb:
-                        self.costs.append(int(-1.0 - self.bigger_c * rp_aff))
-                    else:
-                        self.costs.append(int(-1.0 - self.big_c * rp_aff))
+        givers = np.union1d(givers, revs2)
+        revs3, paps3 = self._open_pairs(givers, g3)
+        rp_aff = self._pair_affinities(revs3, paps3)
+        # give a bigger reward if assignment would improve group.
+        costs3 = np.where(
+            rp_aff + pap_scores[paps3] >= lower_ms,
+            -1.0 - self.bigger_c * rp_aff,
+            -1.0 - self.big_c * rp_aff)
+        self._assignment_arcs.append((add_arcs(mcf, revs3, self.num_reviewers + paps3, 1, costs3), revs3, paps3))
 
         flow = int(min(np.size(g3) - papers_needing_no_assignments, np.size(g1)))
-        self.supplies = np.zeros(self.num_reviewers + self.num_papers + 2)
-        self.supplies[self.source] = flow
-        self.supplies[self.sink] = -flow
-
-        for i in range(len(self.start_inds)):
-            self.min_cost_flow.AddArcWithCapacityAndUnitCost(
-                self.start_inds[i], self.end_inds[i], self.caps[i],
-                self.costs[i])
-        for i in range(len(self.supplies)):
-            self.min_cost_flow.SetNodeSupply(i, int(self.supplies[i]))
+        mcf.SetNodeSupply(self.source, flow)
+        mcf.SetNodeSupply(self.sink, -flow)
 
     def solve_ms_improvement(self):
         """Reassign reviewers to improve the makespan.
@@ -317,44 +642,24 @@ class FairFlow(object):
         After solving min-cost-flow in the improvement network, record the
         corresponding solution. In particular, if we have flow leaving a paper
         and entering a reviewer, unassign the reviewer from that paper. If we
-        have flow leaving a reviewer and entering a paper, assign the reviewer
-        to that paper.
+        have flow leaving a reviewer and entering a paper (or the dummy node of
+        a paper), assign the reviewer to that paper.
         """
+        self._count_network(self.min_cost_flow)
         if self.min_cost_flow.Solve() == self.min_cost_flow.OPTIMAL:
-            num_un = 0
-            for arc in range(self.min_cost_flow.NumArcs()):
-                # Can ignore arcs leading out of source or into sink.
-                if self.min_cost_flow.Tail(arc) != self.source and self.min_cost_flow.Head(arc) != self.sink:
-                    if self.min_cost_flow.Flow(arc) > 0:
-                        # flow goes from tail to head
-                        head = self.min_cost_flow.Head(arc)
-                        tail = self.min_cost_flow.Tail(arc)
-                        if head >= self.num_reviewers + self.num_papers + 2:
-                            # this is an edge that restricts flow to a paper
-                            pap = head - (self.num_reviewers + self.num_papers + 2)
-                            assert(tail <= self.num_reviewers)
-                            rev = tail
-                            assert(self.solution[rev, pap] == 0.0)
-                            self.solution[rev, pap] = 1.0
-                        elif tail >= self.num_reviewers + self.num_papers + 2:
-                            continue
-                        elif head >= self.num_reviewers:
-                            pap = head - self.num_reviewers
-                            rev = tail
-                            assert(self.solution[rev, pap] == 0.0)
-                            self.solution[rev, pap] = 1.0
-                            num_un += 1
-                        else:
-                            rev = head
-                            pap = tail - self.num_reviewers
-                            assert(self.solution[rev, pap] == 1.0)
-                            self.solution[rev, pap] = 0.0
+            for first_arc, revs, paps in self._assignment_arcs:
+                assigned = arc_flows(self.min_cost_flow, first_arc, np.size(revs)) > 0
+                self._assign(revs[assigned], paps[assigned])
+            for first_arc, revs, paps in self._unassignment_arcs:
+                unassigned = arc_flows(self.min_cost_flow, first_arc, np.size(revs)) > 0
+                self._unassign(revs[unassigned], paps[unassigned])
             self.valid = False
         else:
             raise SolverException('There was an issue with the min cost flow input.')
 
     def solve_validifier(self):
         """Reassign reviewers to make the matching valid."""
+        self._count_network(self.min_cost_flow)
         if self.min_cost_flow.Solve() == self.min_cost_flow.OPTIMAL:
             for arc in range(self.min_cost_flow.NumArcs()):
                 # Can ignore arcs leading out of source or into sink.
@@ -362,23 +667,25 @@ class FairFlow(object):
                     if self.min_cost_flow.Flow(arc) > 0:
                         rev = self.min_cost_flow.Tail(arc)
                         pap = self.min_cost_flow.Head(arc) - self.num_reviewers
-                        assert(self.solution[rev, pap] == 0.0)
-                        assert(np.sum(self.solution[:, pap], axis=0) == self.demands[pap] - 1)
-                        self.solution[rev, pap] = 1.0
-            assert np.all(np.sum(self.solution, axis=1) <= self.maximums)
-            assert (np.sum(self.solution) == np.sum(self.demands))
+                        if self.debug:
+                            assert(self.paper_loads[pap] == self.demands[pap] - 1)
+                        self._assign([rev], [pap])
+            self._check_loads()
+            self._verify()
             self.valid = True
         else:
             raise SolverException('There was an issue with the min cost flow input.')
 
-    def sol_as_mat(self):
-        if self.valid:
-            return self.solution
-        else:
+    def _check_valid(self):
+        if not self.valid:
             raise SolverException(
                 'You must have solved the model optimally or suboptimally '
                 'before calling this function.')
 
+    def sol_as_mat(self):
+        self._check_valid()
+        return self.solution
+
     def try_improve_ms(self):
         """Try to improve the minimum paper score.
 
@@ -397,19 +704,22 @@ class FairFlow(object):
             scores) and the size of the bottom group (papers with the lowest
             paper scores).
         """
+        if self.cancellation is not None:
+            self.cancellation.check()
+        self.stats['iterations'] += 1
         self._refresh_internal_vars()
-        if np.sum(self.solution) != np.sum(self.demands):
+        if np.sum(self.paper_loads) != np.sum(self.demands):
             self._construct_and_solve_validifier_network()
-        assert(np.sum(self.solution) == np.sum(self.demands))
+        assert(np.sum(self.paper_loads) == np.sum(self.demands))
         g1, g2, g3 = self._grp_paps_by_ms()
-        old_g1, old_g2, old_g3 = set(g1), set(g2), set(g3)
+        old_g3_size = np.size(g3)
         if np.size(g1) > 0 and np.size(g3) > 0:
             self._refresh_internal_vars()
             # Unassign the worst reviewer from each paper in g3.
             w_revs, w_paps = self._worst_reviewer(g3)
-            assert (np.sum(self.solution) == np.sum(self.demands))
-            assert(len(set(w_paps)) == len(w_paps))
-            self.solution[w_revs, w_paps] = 0.0
+            if self.debug:
+                assert(len(set(w_paps)) == len(w_paps))
+            self._unassign(w_revs, w_paps)
 
             # Try to route reviewers from the top group to the bottom.
             self._construct_ms_improvement_network(g1, g2, g3)
@@ -420,125 +730,211 @@ class FairFlow(object):
 
             # Checks: the bottom group should never grow in size.
             g1, g2, g3 = self._grp_paps_by_ms()
-            assert(len(g3) <= len(old_g3))
+            assert(len(g3) <= old_g3_size)
             return np.size(g1), np.size(g3)
         else:
             return np.size(g1), np.size(g3)
 
-    def _construct_graph_and_solve(self, n_rev, n_pap, _caps, _covs, ws, flow):
+    def _construct_graph_and_solve(self, n_rev, n_pap, _caps, _covs, flow):
         """Solve min-cost-flow.
 
+        The network only contains the reviewers with remaining capacity, the
+        papers with remaining demand and the open pairs between them, so its
+        size depends on how much of the solution must be repaired rather than
+        on the size of the problem.
+
         Args:
             n_rev - (int) number of reviewers (sources)
             n_pap - (int) number of papers (sinks)
             _caps - (array of ints) capacities for each reviewer
             _covs - (array of ints) demands for each paper
-            ws - (matrix) affinities between reviewers and papers.
             flow - (int) total flow from revs to paps (some of demands)
 
         Returns:
-            None -- but sets self.solution to be a binary matrix containing the
-            assignment of reviewers to papers.
+            None -- but assigns reviewers to papers according to the flow.
         """
-        source = n_rev + n_pap
-        sink = n_rev + n_pap + 1
+        _caps = np.asarray(_caps)
+        _covs = np.asarray(_covs)
+        assert (np.size(_caps) == n_rev and np.size(_covs) == n_pap)
+        if flow == 0:
+            self.solved = True
+            return
+
+        reviewers = np.nonzero(_caps > 0)[0]
+        papers = np.nonzero(_covs > 0)[0]
+        num_revs, num_paps = np.size(reviewers), np.size(papers)
+        # nodes are numbered: reviewers, papers, source, sink.
+        source = num_revs + num_paps
+        sink = num_revs + num_paps + 1
+
+        # only add arcs for the pairs that may be assigned (see _open_pairs).
+        revs, paps = self._open_pairs(reviewers, papers)
+
+        # Costs must be integers. Also, we have affinities so make the "costs" negative affinities.
+        arc_costs = (-1.0 - self.big_c * self._pair_affinities(revs, paps)).astype(int)
 
         mcf = pywrapgraph.SimpleMinCostFlow()
 
         # edges from source to reviewers.
-        for i in range(n_rev):
-            mcf.AddArcWithCapacityAndUnitCost(source, i, int(_caps[i]), 0)
+        add_arcs(mcf, np.full(num_revs, source), np.arange(num_revs), _caps[reviewers], 0)
 
         # edges from reviewers to papers.
-        for i in range(n_rev):
-            for j in range(n_pap):
-                arc_cap = 1
-                if self.solution[i, j] == 1:
-                    arc_cap = 0
-
-                edge_constraint = self.constraint_matrix[(j,i)]
-
-                # a constraint of 0 means there's no constraint, so apply the cost as normal, so add an arc normally
-                # a constraint of 1 means that this user was explicitly assigned to this paper. We do not support positive constraints right now, so, do not add an arc
-                # a constraint of anything other that 0 or 1 essentially indicates a conflict, so do not add an arc
-                if edge_constraint == 0:
-                    # Costs must be integers. Also, we have affinities so make the "costs" negative affinities.
-                    mcf.AddArcWithCapacityAndUnitCost(i, n_rev + j, int(arc_cap), int(-1.0 - self.big_c * ws[i, j]))
+        first_arc = add_arcs(
+            mcf, np.searchsorted(reviewers, revs), num_revs + np.searchsorted(papers, paps), 1, arc_costs)
 
         # edges from papers to sink.
-        for j in range(n_pap):
-            mcf.AddArcWithCapacityAndUnitCost(n_rev + j, sink, int(_covs[j]), 0)
-
-        supplies = np.zeros(n_rev + n_pap + 2)
-        supplies[source] = int(flow)
-        supplies[sink] = int(-flow)
+        add_arcs(mcf, num_revs + np.arange(num_paps), np.full(num_paps, sink), _covs[papers], 0)
 
         # set Node supply for this MCF.
-        for i in range(len(supplies)):
-            mcf.SetNodeSupply(i, int(supplies[i]))
+        mcf.SetNodeSupply(source, int(flow))
+        mcf.SetNodeSupply(sink, int(-flow))
 
         # Solve.
+        self._count_network(mcf)
         if mcf.Solve() == mcf.OPTIMAL:
-            for arc in range(mcf.NumArcs()):
-                # Can ignore arcs leading out of source or into sink.
-                if mcf.Tail(arc) != source and mcf.Head(arc) != sink:
-                    if mcf.Flow(arc) > 0:
-                        rev = mcf.Tail(arc)
-                        pap = mcf.Head(arc) - n_rev
-                        assert(self.solution[rev, pap] == 0.0)
-                        self.solution[rev, pap] = 1.0
+            assigned = arc_flows(mcf, first_arc, np.size(revs)) > 0
+            self._assign(revs[assigned], paps[assigned])
             self.solved = True
         else:
             raise SolverException('Solver could not find a solution. Adjust your parameters')
 
-    def find_ms(self):
+    def _improve_until_stable(self):
+        """Run try_improve_ms at the current makespan until the bottom group stops shrinking.
+
+        Returns:
+            A tuple of whether the bottom group was emptied (i.e. the makespan
+            was achieved) and the resulting worst paper score.
+        """
+        s1, s3 = self.try_improve_ms()
+        self._take_snapshot()
+        can_improve = s3 > 0
+        prev_s1, prev_s3 = -1, -1
+        while can_improve and prev_s3 != s3 and not self._budget_expired():
+            prev_s1, prev_s3 = s1, s3
+            start = time.time()
+            s1, s3 = self.try_improve_ms()
+            self._take_snapshot()
+            can_improve = s3 > 0
+            self.logger.debug('#info FairFlow:try_improve takes: %s s' % (time.time() - start))
+
+        worst_pap_score = np.min(self.paper_scores)
+        return s3 == 0, worst_pap_score
+
+    def _makespan_upper_bound(self, chunk_size=1024):
+        """Get an upper bound on the makespans that the search can achieve.
+
+        No paper can score more than the sum of its `demand` highest eligible
+        affinities, so the worst paper score is at most the minimum of these
+        sums. A makespan is achieved once every paper scores at least the
+        makespan - maxaffinity, so add maxaffinity to get the bound (which is
+        never looser than maxaffinity * maxdemand).
+        """
+        demands = np.asarray(self.demands, dtype=int)
+        bound = np.inf
+        for start in range(0, self.num_papers, chunk_size):
+            stop = min(start + chunk_size, self.num_papers)
+            eligible = self.constraint_matrix[start:stop].transpose() == 0
+            affinities = np.where(eligible, self.affinity_matrix[:, start:stop] + self.affinity_shift, 0.0)
+            # cumulative sums of each paper's affinities, highest first.
+            top_sums = np.cumsum(-np.sort(-affinities, axis=0), axis=0)
+            chunk_demands = demands[start:stop]
+            has_demand = chunk_demands > 0
+            if np.any(has_demand):
+                rows = np.minimum(chunk_demands[has_demand], self.num_reviewers) - 1
+                bound = min(bound, np.min(top_sums[rows, np.nonzero(has_demand)[0]]))
+
+        loose_bound = self.max_affinities * np.max(self.demands)
+        return min(bound + self.max_affinities, loose_bound)
+
+    def _search_stopped(self, mn, mx, stalled):
+        """Check the optional stopping criteria of the makespan search."""
+        if self.ms_tolerance is not None and mx - mn <= self.ms_tolerance * mx:
+            self.logger.debug('#info FairFlow:makespan interval within tolerance')
+            return True
+        if self.ms_stall_iterations is not None and stalled >= self.ms_stall_iterations:
+            self.logger.debug('#info FairFlow:makespan search stalled')
+            return True
+        if self._budget_expired():
+            self.logger.debug('#info FairFlow:time budget expired')
+            return True
+        return False
+
+    def find_ms(self, resume=None):
         """Find the highest possible makespan.
 
-        Perform a binary search on the makespan value. Solve the RAP with each
-        makespan value and return the solution corresponding to the makespan
-        which achieves the largest minimum paper score.
+        Perform a binary search on the makespan value, between 0 and the bound
+        given by _makespan_upper_bound. Solve the RAP with each makespan value
+        and return the solution corresponding to the makespan which achieves
+        the largest minimum paper score. The search runs for `ms_iterations`
+        steps, or until the optional tolerance or stall criteria are met. If
+        `workers` is greater than 1, perform a k-ary search in parallel
+        instead (see find_ms_parallel).
+
+        The statistics of each step are recorded in `iteration_stats`. If a
+        `checkpoint` is set, the state of the search is saved after each step
+        (at most every `checkpoint_interval` seconds).
 
         Args:
-            None
+            resume - (dict) the state of the search saved in a checkpoint, to
+                continue from instead of starting over.
 
         Return:
             Highest feasible makespan value found.
         """
-        mn = 0.0
-        mx = np.max(self.affinity_matrix) * np.max(self.demands)
-        ms = (mx - mn) / 2.0
+        if self.workers and self.workers > 1:
+            return self.find_ms_parallel(self.workers, self.ms_iterations)
+
+        if resume is None:
+            self.iteration_stats = []
+            start, mn, mx = 0, 0.0, self._makespan_upper_bound()
+            ms = (mx - mn) / 2.0
+            best = None
+            best_worst_pap_score = 0.0
+            stalled = 0
+        else:
+            start, mn, mx, ms, best, best_worst_pap_score, stalled = [resume[key] for key in [
+                'iteration', 'lower', 'upper', 'makespan', 'best', 'best_worst_paper_score', 'stalled']]
         self.makespan = ms
-        best = None
-        best_worst_pap_score = 0.0
 
-        for i in range(10):
+        for i in range(start, self.ms_iterations):
             self.logger.debug('#info FairFlow:ITERATION %s ms %s' % (i, ms))
-            s1, s3 = self.try_improve_ms()
-            can_improve = s3 > 0
-            prev_s1, prev_s3 = -1, -1
-            while can_improve and prev_s3 != s3:
-                prev_s1, prev_s3 = s1, s3
-                start = time.time()
-                s1, s3 = self.try_improve_ms()
-                can_improve = s3 > 0
-                self.logger.debug('#info FairFlow:try_improve takes: %s s' % (time.time() - start))
-
-            worst_pap_score = np.min(np.sum(self.solution * self.affinity_matrix, axis=0))
+            start = time.time()
+            success, worst_pap_score = self._improve_until_stable()
             self.logger.debug('#info FairFlow:best worst paper score %s worst score %s' % (best_worst_pap_score, worst_pap_score))
-
-            success = s3 == 0
             self.logger.debug('#info FairFlow:success = %s' % success)
+            self.iteration_stats.append({
+                'iteration': i,
+                'makespan': ms,
+                'success': success,
+                'worst_paper_score': worst_pap_score,
+                'lower': mn,
+                'upper': mx,
+                'seconds': time.time() - start
+            })
 
             if success and worst_pap_score >= best_worst_pap_score:
+                stalled = 0 if best is None or worst_pap_score > best_worst_pap_score else stalled + 1
                 best = ms
                 best_worst_pap_score = worst_pap_score
                 mn = ms
                 ms += (mx - ms) / 2.0
             else:
                 assert (not success or worst_pap_score < best_worst_pap_score)
+                stalled += 1
                 mx = ms
                 ms -= (ms - mn) / 2.0
             self.makespan = ms
+            self._save_checkpoint({'phase': 'search', 'search': {
+                'iteration': i + 1,
+                'lower': mn,
+                'upper': mx,
+                'makespan': ms,
+                'best': best,
+                'best_worst_paper_score': best_worst_pap_score,
+                'stalled': stalled
+            }})
+            if self._search_stopped(mn, mx, stalled):
+                break
         self.logger.debug('#info FairFlow:Best found %s' % best)
         self.logger.debug('#info FairFlow:Best Worst Paper Score found %s' %best_worst_pap_score)
         if best is None:
@@ -546,28 +942,278 @@ class FairFlow(object):
         else:
             return best
 
+    def find_ms_parallel(self, workers, iterations=10):
+        """Find the highest possible makespan with a parallel k-ary search.
+
+        First make the current solution valid. Then, in each round, split the
+        makespan interval into `workers` + 1 parts and evaluate the `workers`
+        inner points concurrently, each starting from that same valid solution.
+        The interval is narrowed to lie between the highest makespan that was
+        achieved and the next candidate above it. The number of rounds is
+        chosen so that the interval shrinks at least as much as it does in
+        `iterations` steps of binary search; the optional tolerance and stall
+        criteria are checked after each round.
+
+        The statistics of each evaluated candidate are recorded in
+        `iteration_stats`.
+
+        Args:
+            workers - (int) number of worker processes (and candidates per round).
+            iterations - (int) number of binary search steps to match.
+
+        Return:
+            Highest feasible makespan value found. The solution is set to the
+            one found for that makespan.
+        """
+        self._refresh_internal_vars()
+        if np.sum(self.paper_loads) != np.sum(self.demands):
+            self._construct_and_solve_validifier_network()
+
+        self.iteration_stats = []
+        mn = 0.0
+        mx = self._makespan_upper_bound()
+        rounds = max(1, int(np.ceil(iterations / np.log2(workers + 1))))
+        best = None
+        best_worst_pap_score = 0.0
+        best_solution = None
+        stalled = 0
+
+        cancel_event = multiprocessing.Event()
+        with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_makespan_worker,
+                initargs=(self, cancel_event)) as executor:
+            for i in range(rounds):
+                if self.cancellation is not None:
+                    self.cancellation.check()
+                candidates = mn + (mx - mn) * np.arange(1, workers + 1) / (workers + 1)
+                self.logger.debug('#info FairFlow:ROUND %s candidate ms %s' % (i, candidates))
+                results = self._wait_for_workers(
+                    [executor.submit(_evaluate_makespan, ms) for ms in candidates], cancel_event)
+
+                improved = False
+                for ms, (success, worst_pap_score, assigned, seconds, stats) in zip(candidates, results):
+                    self._add_stats(stats)
+                    self.iteration_stats.append({
+                        'iteration': i,
+                        'makespan': ms,
+                        'success': success,
+                        'worst_paper_score': worst_pap_score,
+                        'lower': mn,
+                        'upper': mx,
+                        'seconds': seconds
+                    })
+                    if success and worst_pap_score >= best_worst_pap_score:
+                        improved = improved or best is None or worst_pap_score > best_worst_pap_score
+                        best = ms
+                        best_worst_pap_score = worst_pap_score
+                        best_solution = assigned
+                stalled = 0 if improved else stalled + 1
+
+                if best is not None:
+                    mn = best
+                above = candidates[candidates > mn]
+                if np.size(above) > 0:
+                    mx = above[0]
+                if self._search_stopped(mn, mx, stalled):
+                    break
+
+        self.logger.debug('#info FairFlow:Best found %s' % best)
+        self.logger.debug('#info FairFlow:Best Worst Paper Score found %s' % best_worst_pap_score)
+        if best is None:
+            return 0.0
+
+        self._load_assignment(*best_solution)
+        self.valid = True
+        self._take_snapshot()
+        return best
+
     def solve(self):
         """Find a makespan and solve flow.
 
         Run a binary search to find best makespan and return the corresponding
-        solution.
+        solution. If the time budget expires, return the best valid solution
+        found so far instead.
 
         Args:
             None
 
         Returns:
-            The solution as a matrix.
+            The solution as an Assignment.
         """
 
+        if self.time_budget is not None:
+            self._deadline = time.time() + self.time_budget
         self._validate_input_range()
-        ms = self.find_ms()
+        if self.top_k:
+            self._prune_constraints()
+        if self.starts and self.starts > 1:
+            return self.solve_multi_start(self.starts)
+
+        resume = self._load_checkpoint()
+        if resume is not None and resume['phase'] == 'final':
+            ms = resume['makespan']
+        else:
+            ms = self.find_ms(resume['search'] if resume is not None else None)
+            self._save_checkpoint({'phase': 'final', 'makespan': ms}, force=True)
         self.makespan = ms
-        s1, s3 = self.try_improve_ms()
-        can_improve = s3 > 0
-        prev_s1, prev_s3 = -1, -1
-        while can_improve and (prev_s1 != s1 or prev_s3 != s3):
-            prev_s1, prev_s3 = s1, s3
+        if not self._budget_expired():
             s1, s3 = self.try_improve_ms()
             can_improve = s3 > 0
+            prev_s1, prev_s3 = -1, -1
+            while can_improve and (prev_s1 != s1 or prev_s3 != s3) and not self._budget_expired():
+                prev_s1, prev_s3 = s1, s3
+                s1, s3 = self.try_improve_ms()
+                can_improve = s3 > 0
+
+        if self._budget_expired():
+            self.logger.debug('#info FairFlow:time budget expired, returning the best solution found')
+            self._restore_snapshot()
+
+        self._check_valid()
+        self._remove_checkpoint()
+        return self._as_assignment(*self._assigned_pairs())
 
-        return self.sol_as_mat().transpose()
+    def _wait_for_workers(self, futures, cancel_event):
+        """Wait for the results of `futures`, checking the cancellation token meanwhile.
+
+        Worker processes only receive the deadline of the token. When the token is
+        cancelled (or expires), `cancel_event`, which the workers check between their
+        improvement iterations, is set, the futures that haven't started are
+        cancelled, and CancelledException is raised.
+        """
+        pending = set(futures)
+        while pending:
+            if self.cancellation is not None:
+                try:
+                    self.cancellation.check()
+                except CancelledException:
+                    cancel_event.set()
+                    for future in futures:
+                        future.cancel()
+                    raise
+            _, pending = wait(pending, timeout=_CANCELLATION_POLL_INTERVAL, return_when=FIRST_EXCEPTION)
+            if any(future.done() and future.exception() is not None for future in futures):
+                break
+        return [future.result() for future in futures]
+
+    def solve_multi_start(self, starts):
+        """Solve several differently seeded instances in parallel and keep the best.
+
+        The first start solves the problem as given. Each other start i first
+        perturbs the affinities with tie-breaking scores seeded with
+        `tie_break_seed` + i (see _reseed_affinities), which leads FairFlow to
+        a different solution when affinities are all zero or heavily tied. The
+        starts run on a pool of up to `workers` (or `starts`) processes. Their
+        solutions are compared on the unperturbed affinities, by worst paper
+        score and then by total score.
+
+        The starts share the time budget: each one stops improving at the deadline
+        that solve set when the multi-start run began.
+
+        Each start saves its checkpoints to its own file (see _start_checkpoint),
+        resumes from it if it exists, and removes it once it is solved.
+
+        The statistics of each start are recorded in `start_stats`.
+
+        Args:
+            starts - (int) number of instances to solve.
+
+        Returns:
+            The best solution as an Assignment.
+        """
+        base_seed = self.tie_break_seed if self.tie_break_seed is not None else 0
+        seeds = [None] + [base_seed + i for i in range(1, starts)]
+        max_workers = min(starts, self.workers) if self.workers else starts
+
+        cancel_event = multiprocessing.Event()
+        with ProcessPoolExecutor(
+                max_workers=max_workers,
+                initializer=_init_cancellable_worker,
+                initargs=(cancel_event,)) as executor:
+            results = self._wait_for_workers(
+                [executor.submit(_solve_start, self, seed, self._start_checkpoint(start), self._deadline)
+                 for start, seed in enumerate(seeds)],
+                cancel_event)
+
+        self.start_stats = []
+        best = None
+        for seed, (assigned, makespan, stats) in zip(seeds, results):
+            self._add_stats(stats)
+            self._load_assignment(*assigned)
+            score = (np.min(self.paper_scores), np.sum(self.paper_scores))
+            self.start_stats.append({
+                'seed': seed,
+                'makespan': makespan,
+                'worst_paper_score': score[0],
+                'total_paper_score': score[1]
+            })
+            if best is None or score > best[0]:
+                best = (score, assigned, makespan)
+        self.logger.debug('#info FairFlow:best of {} starts has worst paper score {}'.format(starts, best[0][0]))
+
+        self._load_assignment(*best[1])
+        self.makespan = best[2]
+        self.valid = True
+        self.solved = True
+        return self._as_assignment(*best[1])
+
+
+# the number of seconds between two checks of the cancellation token while waiting for workers.
+_CANCELLATION_POLL_INTERVAL = 0.1
+
+# the event that the parent process sets to cancel the work of each worker process.
+_worker_cancel_event = None
+
+def _init_cancellable_worker(cancel_event):
+    global _worker_cancel_event
+    _worker_cancel_event = cancel_event
+
+def _share_cancellation(solver):
+    """Make the solver of a worker process also stop when the parent sets the cancel event."""
+    deadline = solver.cancellation.deadline if solver.cancellation is not None else None
+    solver.cancellation = CancellationToken(deadline, event=_worker_cancel_event)
+
+def _solve_start(solver, seed, checkpoint, deadline):
+    """Solve one start of a multi-start run (see FairFlow.solve_multi_start)."""
+    # the constraints were already pruned, and starts don't parallelize further.
+    solver.top_k = None
+    solver.starts = None
+    solver.workers = None
+    solver.checkpoint = checkpoint
+    # all starts share the time budget of the parent, which is already running.
+    solver.time_budget = None
+    solver._deadline = deadline
+    _share_cancellation(solver)
+    if seed is not None:
+        solver._reseed_affinities(seed)
+    before = dict(solver.stats)
+    assignment = solver.solve()
+    return (assignment.reviewer_indices, assignment.paper_indices), solver.makespan, _stats_since(solver, before)
+
+def _stats_since(solver, before):
+    """Get the counts that `solver` added to its stats since they were `before`."""
+    return {key: value - before[key] for key, value in solver.stats.items()}
+
+
+# the solver that each worker process evaluates candidate makespans with.
+_makespan_worker_solver = None
+
+def _init_makespan_worker(solver, cancel_event):
+    global _makespan_worker_solver
+    _init_cancellable_worker(cancel_event)
+    _share_cancellation(solver)
+    _makespan_worker_solver = solver
+
+def _evaluate_makespan(makespan):
+    """Improve a copy of the worker's starting solution towards `makespan`."""
+    solver = _makespan_worker_solver
+    start_solution = solver._assigned_pairs()
+    solver.makespan = makespan
+    start = time.time()
+    before = dict(solver.stats)
+    try:
+        success, worst_pap_score = solver._improve_until_stable()
+        return success, worst_pap_score, solver._assigned_pairs(), time.time() - start, _stats_since(solver, before)
+    finally:
+        solver._load_assignment(*start_solution)
@@ -0,0 +1,152 @@
+'''
+Pre-solve feasibility check for paper-reviewer assignment problems.
+
+A configuration is feasible if every paper can receive exactly its demand of
+reviewers, every reviewer receives between its minimum and maximum load, and no
+reviewer is assigned to a paper it conflicts with.
+
+`check_feasibility` first runs vectorized sanity checks (e.g. papers with fewer
+eligible reviewers than their demand). If they pass, it then solves a single
+max-flow on the assignment network, with reviewer minimums handled as lower
+bounds. The max-flow is much cheaper than a min-cost-flow solve, but it adds one
+arc per eligible pair in Python, so callers with very large inputs may skip it
+with `check_flow=False`. Both raise an InfeasibilityException that lists the offending paper and reviewer
+indices when the instance cannot be satisfied.
+
+Pairs with a constraint of 1 (forced assignments) are eligible here, since the
+MinMax solver assigns them. FairFlow doesn't support forced assignments and
+excludes these pairs, so for FairFlow the check is necessary but not sufficient.
+'''
+
+import logging
+import numpy as np
+from ortools.graph import pywrapgraph
+from .core import InfeasibilityException
+
+def eligibility_mask(constraint_matrix, maximums):
+    '''
+    Return a boolean #papers by #reviewers matrix that is True where a reviewer
+    may be assigned to a paper (i.e. the pair is not conflicted and the reviewer
+    can take at least one paper).
+
+    Forced pairs (a constraint of 1) are eligible, see the module docstring.
+    '''
+    eligible = (constraint_matrix == 0) | (constraint_matrix == 1)
+    eligible &= (np.asarray(maximums) > 0)[np.newaxis, :]
+    return eligible
+
+def _raise_if_any(message, papers, reviewers):
+    if np.size(papers) or np.size(reviewers):
+        raise InfeasibilityException(
+            message.format(len(papers), len(reviewers)),
+            papers=[int(p) for p in papers],
+            reviewers=[int(r) for r in reviewers])
+
+def _check_counts(minimums, maximums, demands, eligible):
+    '''Vectorized checks that do not require solving a flow problem.'''
+    demand = np.sum(demands)
+    if demand > np.sum(maximums) or demand < np.sum(minimums):
+        raise InfeasibilityException(
+            'Total demand ({}) is out of range when min review supply is ({}) and max review supply is ({})'.format(
+                demand, np.sum(minimums), np.sum(maximums)))
+
+    paper_supply = np.sum(eligible, axis=1)
+    short_papers = np.where(paper_supply < demands)[0]
+
+    reviewer_supply = np.sum(eligible[demands > 0], axis=0)
+    short_reviewers = np.where(
+        (reviewer_supply < minimums) | (maximums < minimums))[0]
+
+    _raise_if_any(
+        '{} papers have fewer eligible reviewers than their demand, '
+        'and {} reviewers have fewer eligible papers than their minimum',
+        short_papers,
+        short_reviewers)
+
+def _check_flow(minimums, maximums, demands, eligible):
+    '''
+    Solve a max-flow on the assignment network with lower bounds.
+
+    Reviewer loads are bounded by [minimum, maximum] and paper loads are fixed to
+    their demands. The bounds are removed with the standard transformation: each
+    lower bound l on an arc (u, v) becomes an excess of l at v and a deficit of l
+    at u, which are connected to a super source and a super sink. The problem is
+    feasible if and only if the max-flow saturates every super source arc.
+    '''
+    num_papers, num_reviewers = eligible.shape
+    total_demand = int(np.sum(demands))
+    total_minimum = int(np.sum(minimums))
+
+    source = num_reviewers + num_papers
+    sink = source + 1
+    super_source = source + 2
+    super_sink = source + 3
+
+    max_flow = pywrapgraph.SimpleMaxFlow()
+
+    # the circulation arc, and the excesses of the source and sink nodes.
+    max_flow.AddArcWithCapacity(sink, source, total_demand)
+    max_flow.AddArcWithCapacity(super_source, sink, total_demand)
+    max_flow.AddArcWithCapacity(source, super_sink, total_minimum)
+
+    minimum_arcs = []
+    for reviewer, (minimum, maximum) in enumerate(zip(minimums.tolist(), maximums.tolist())):
+        max_flow.AddArcWithCapacity(source, reviewer, max(maximum - minimum, 0))
+        minimum_arcs.append(max_flow.AddArcWithCapacity(super_source, reviewer, minimum))
+
+    paper_indices, reviewer_indices = np.nonzero(eligible)
+    for paper, reviewer in zip(paper_indices.tolist(), reviewer_indices.tolist()):
+        max_flow.AddArcWithCapacity(reviewer, num_reviewers + paper, 1)
+
+    demand_arcs = []
+    for paper, demand in enumerate(demands.tolist()):
+        demand_arcs.append(max_flow.AddArcWithCapacity(num_reviewers + paper, super_sink, demand))
+
+    if max_flow.Solve(super_source, super_sink) != max_flow.OPTIMAL:
+        raise InfeasibilityException('There was an issue with the max flow input.')
+
+    if max_flow.OptimalFlow() < total_demand + total_minimum:
+        short_papers = [
+            paper for paper, arc in enumerate(demand_arcs)
+            if max_flow.Flow(arc) < max_flow.Capacity(arc)]
+        short_reviewers = [
+            reviewer for reviewer, arc in enumerate(minimum_arcs)
+            if max_flow.Flow(arc) < max_flow.Capacity(arc)]
+
+        _raise_if_any(
+            '{} papers could not receive their demand, '
+            'and {} reviewers could not receive their minimum',
+            short_papers,
+            short_reviewers)
+
+def check_feasibility(
+        minimums,
+        maximums,
+        demands,
+        constraint_matrix,
+        check_flow=True,
+        logger=logging.getLogger(__name__)
+    ):
+    '''
+    Raise an InfeasibilityException if no assignment can satisfy the given reviewer
+    loads, paper demands and constraints. `constraint_matrix` is #papers by #reviewers.
+
+    If `check_flow` is False, only the vectorized count checks run.
+    '''
+    logger.debug('Checking feasibility')
+
+    num_papers, num_reviewers = np.shape(constraint_matrix)
+    demands = np.asarray(demands, dtype=int)
+    maximums = np.asarray(maximums, dtype=int)
+    if minimums is None:
+        minimums = np.zeros(num_reviewers, dtype=int)
+    else:
+        minimums = np.asarray(minimums, dtype=int)
+
+    eligible = eligibility_mask(constraint_matrix, maximums)
+
+    _check_counts(minimums, maximums, demands, eligible)
+    if check_flow:
+        _check_flow(minimums, maximums, demands, eligible)
+
+    logger.debug('Finished checking feasibility')
@@ -0,0 +1,207 @@
+'''
+Local-search polishing of a solved assignment.
+
+After a solver returns, `polish` tries two kinds of local changes, evaluated with
+numpy for a batch of papers at a time:
+
+    - moves, which replace a reviewer of a paper with a reviewer that has spare
+      capacity (the replaced reviewer must stay above its minimum),
+    - swaps, which exchange the reviewers of two assigned pairs (p, r1) and
+      (q, r2), so that loads don't change.
+
+Only unconflicted (constraint = 0) pairs can be created, and forced (constraint = 1)
+pairs are never removed. The best change found for each paper of the batch is
+applied, as long as it doesn't touch a paper or reviewer changed earlier in the
+same round.
+
+There are two objectives:
+
+    - 'min' raises the lowest paper scores. The batch holds the lowest scoring
+      papers, and a change is improving if the lowest score of the papers it
+      touches goes up, so the sorted paper scores only ever improve. Of the
+      changes that raise it equally, the one with the best total gain is taken.
+    - 'total' raises the total score without lowering the lowest score of the
+      papers a change touches. The batch cycles through all papers.
+'''
+
+import logging
+import numpy as np
+from ..assignment import Assignment
+
+OBJECTIVES = ('min', 'total')
+
+def _pick(primary, secondary, tolerance):
+    '''
+    Return the flat index of the best entry, by `primary` and then by `secondary`
+    gain, or None if no entry has a positive primary gain.
+    '''
+    best = np.max(primary, initial=-np.inf)
+    if best <= tolerance:
+        return None
+    return np.argmax(np.where(primary >= best - tolerance, secondary, -np.inf))
+
+def _best_change(paper, removable, addable, loads, bounds, scores, paper_scores, pairs, objective, cap, tolerance):
+    '''
+    Return the best improving change for `paper` as a tuple
+    (gain, total gain, paper, reviewer out, reviewer in, other paper), where other
+    paper is None for a move, or None if there is no improving change.
+
+    In 'min' mode, the gain is the rise of the lowest score among the touched
+    papers, counting scores above `cap` as `cap`; ties are broken by total gain.
+    '''
+    outgoing = np.nonzero(removable[paper])[0]
+    if np.size(outgoing) == 0:
+        return None
+    score = paper_scores[paper]
+    best = None
+
+    def gains(new_scores, old_scores, total_gain, valid):
+        if objective == 'min':
+            primary = np.minimum(np.minimum.reduce(new_scores), cap) - np.minimum.reduce(old_scores)
+        else:
+            primary = total_gain
+            valid = valid & (np.minimum.reduce(new_scores) >= np.minimum.reduce(old_scores) - tolerance)
+        return np.where(valid, primary, -np.inf), np.where(valid, total_gain, -np.inf)
+
+    # moves: replace an outgoing reviewer with a reviewer that has spare capacity.
+    minimums, maximums = bounds
+    incoming = np.nonzero(addable[paper] & (loads < maximums))[0]
+    can_leave = loads[outgoing] > minimums[outgoing]
+    if np.size(incoming) > 0 and np.any(can_leave):
+        total_gain = scores[paper, incoming][np.newaxis, :] - scores[paper, outgoing][:, np.newaxis]
+        primary, secondary = gains(
+            [score + total_gain], [score], total_gain,
+            np.broadcast_to(can_leave[:, np.newaxis], total_gain.shape))
+        index = _pick(primary, secondary, tolerance)
+        if index is not None:
+            out_index, in_index = np.unravel_index(index, primary.shape)
+            best = (primary[out_index, in_index], secondary[out_index, in_index],
+                paper, outgoing[out_index], incoming[in_index], None)
+
+    # swaps: give `paper` the reviewer r2 of another pair (q, r2), and q the outgoing reviewer.
+    other_papers, other_reviewers = pairs
+    keep = (other_papers != paper) & addable[paper, other_reviewers]
+    other_papers, other_reviewers = other_papers[keep], other_reviewers[keep]
+    if np.size(other_papers) > 0:
+        valid = addable[other_papers[np.newaxis, :], outgoing[:, np.newaxis]]
+        new_score = score - scores[paper, outgoing][:, np.newaxis] + scores[paper, other_reviewers][np.newaxis, :]
+        old_other = paper_scores[other_papers][np.newaxis, :]
+        new_other = old_other - scores[other_papers, other_reviewers][np.newaxis, :] \
+            + scores[other_papers[np.newaxis, :], outgoing[:, np.newaxis]]
+        total_gain = (new_score - score) + (new_other - old_other)
+        primary, secondary = gains(
+            [new_score, new_other], [np.full(old_other.shape, score), old_other], total_gain, valid)
+        index = _pick(primary, secondary, tolerance)
+        if index is not None:
+            out_index, pair_index = np.unravel_index(index, primary.shape)
+            change = (primary[out_index, pair_index], secondary[out_index, pair_index],
+                paper, outgoing[out_index], other_reviewers[pair_index], other_papers[pair_index])
+            if best is None or change[:2] > best[:2]:
+                best = change
+
+    return best
+
+def polish(
+        assignment,
+        scores,
+        constraint_matrix,
+        minimums,
+        maximums,
+        demands,
+        objective='min',
+        batch_size=64,
+        max_rounds=100,
+        tolerance=1e-9,
+        logger=logging.getLogger(__name__)
+    ):
+    '''
+    Improve a solved assignment with local moves and swaps (see module docstring).
+
+    `assignment` is an Assignment (or a #papers by #reviewers flow matrix), and
+    `scores` and `constraint_matrix` are #papers by #reviewers matrices, as in
+    the Encoder. `demands` are only used to check the input.
+
+    Returns the polished assignment as an Assignment.
+    '''
+    if objective not in OBJECTIVES:
+        raise ValueError('objective must be one of {}, got {}'.format(OBJECTIVES, objective))
+    if not isinstance(assignment, Assignment):
+        assignment = Assignment.from_matrix(assignment)
+
+    scores = np.asarray(scores, dtype=float)
+    constraint_matrix = np.asarray(constraint_matrix)
+    num_papers, num_reviewers = scores.shape
+    minimums = np.zeros(num_reviewers, dtype=int) if minimums is None else np.asarray(minimums)
+    bounds = (minimums, np.asarray(maximums))
+
+    assigned = assignment.to_matrix(dtype=bool)
+    if not np.array_equal(np.sum(assigned, axis=1), demands):
+        raise ValueError('The assignment to polish does not meet the paper demands')
+    # forced pairs stay, conflicted pairs are never created.
+    removable = assigned & (constraint_matrix == 0)
+    addable = ~assigned & (constraint_matrix == 0)
+    loads = np.sum(assigned, axis=0)
+    paper_scores = np.sum(np.where(assigned, scores, 0.0), axis=1)
+
+    start_min, start_total = np.min(paper_scores, initial=0.0), np.sum(paper_scores)
+    batch_size = min(batch_size, num_papers)
+    offset = 0
+    idle_rounds = 0
+    num_changes = 0
+
+    for _ in range(max_rounds):
+        if objective == 'min':
+            order = np.argsort(paper_scores, kind='stable')
+            batch = order[:batch_size]
+            # raising a paper above the lowest score outside of the batch doesn't
+            # raise the lowest scores any further in this round.
+            cap = paper_scores[order[batch_size]] if batch_size < num_papers else np.inf
+        else:
+            cap = np.inf
+            batch = (offset + np.arange(batch_size)) % num_papers
+            offset = (offset + batch_size) % num_papers
+
+        pairs = np.nonzero(removable)
+        changes = [
+            change for change in (
+                _best_change(
+                    paper, removable, addable, loads, bounds, scores,
+                    paper_scores, pairs, objective, cap, tolerance)
+                for paper in batch)
+            if change is not None]
+        changes.sort(key=lambda change: (-change[0], -change[1]))
+
+        touched_papers, touched_reviewers = set(), set()
+        applied = 0
+        for _, _, paper, outgoing, incoming, other in changes:
+            papers = {paper} if other is None else {paper, other}
+            if papers & touched_papers or {outgoing, incoming} & touched_reviewers:
+                continue
+            touched_papers |= papers
+            touched_reviewers |= {outgoing, incoming}
+
+            for pap, rev_out, rev_in in [(paper, outgoing, incoming)] + \
+                    ([] if other is None else [(other, incoming, outgoing)]):
+                assigned[pap, rev_out], assigned[pap, rev_in] = False, True
+                removable[pap, rev_out], removable[pap, rev_in] = False, True
+                addable[pap, rev_out], addable[pap, rev_in] = True, False
+                paper_scores[pap] += scores[pap, rev_in] - scores[pap, rev_out]
+            if other is None:
+                loads[outgoing] -= 1
+                loads[incoming] += 1
+            applied += 1
+
+        num_changes += applied
+        if objective == 'min':
+            if applied == 0:
+                break
+        else:
+            # stop after a full pass over the papers without any change.
+            idle_rounds = 0 if applied else idle_rounds + 1
+            if idle_rounds * batch_size >= num_papers:
+                break
+
+    logger.debug('Polishing made {} changes: min paper score {} -> {}, total score {} -> {}'.format(
+        num_changes, start_min, np.min(paper_scores, initial=0.0), start_total, np.sum(paper_scores)))
+
+    return Assignment.from_matrix(assigned)
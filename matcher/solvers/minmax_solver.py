@@ -1,8 +1,9 @@
 '''
 A paper-reviewer assignment solver that ensures a minimum paper load per reviewer, if possible.
 
-First calls an iteration of SimpleSolver with minimum reviewer loads,
-then calls a second iteration, accounting for the results from the first iteration.
+Solves a single SimpleSolver, in which the minimum reviewer loads are lower bounds on the
+source-to-reviewer arcs and the maximum loads are their capacities. The result is the
+minimum cost assignment that respects both bounds.
 
 Arguments are the same as SimpleSolver,
 except that the "num_reviews" argument is replaced by "minimums" and "maximums".
@@ -12,11 +13,34 @@ except that the "num_reviews" argument is replaced by "minimums" and "maximums".
         integer representing the minimum/maximum number of reviews a reviewer
         should be assigned.
 
+    "top_k" (optional):
+        if given, solve on a pruned graph that only keeps the top-k reviewers of each
+        paper and the top-k papers of each reviewer (see candidates.py).
+
+    "score_threshold" (optional):
+        in pruned mode, also keep every pair with an aggregate score of at least this value.
+
+    "tie_break_seed" (optional):
+        when all costs are zero, break ties with deterministic per-arc perturbations
+        derived from this seed (see tie_breaking.py) instead of a random cost matrix.
+
+    "cancellation" (optional):
+        a CancellationToken (see cancellation.py), checked before building the network,
+        before solving it and before returning the solution.
+
+    "instrumentation" (optional):
+        an Instrumentation (see instrumentation.py) that records building the network,
+        solving the min-cost flow and extracting the assignment from the flows as phases.
+
 '''
+import contextlib
 import numpy as np
 import logging
 from .simple_solver import SimpleSolver
+from .candidates import select_candidates
 from .core import SolverException
+from ..assignment import Assignment
+from ..encoder import score_to_cost
 import time
 
 class MinMaxSolver:
@@ -27,23 +51,38 @@ class MinMaxSolver:
             maximums,
             demands,
             encoder,
-            logger=logging.getLogger(__name__)
+            logger=logging.getLogger(__name__),
+            top_k=None,
+            score_threshold=None,
+            tie_break_seed=None,
+            cancellation=None,
+            instrumentation=None
         ):
 
         self.minimums = minimums
         self.maximums = maximums
         self.demands = demands
         self.cost_matrix = encoder.cost_matrix
+        self.tie_break_seed = None
 
         if not self.cost_matrix.any():
-            self.cost_matrix = np.random.rand(*encoder.cost_matrix.shape)
+            if tie_break_seed is None:
+                self.cost_matrix = np.random.rand(*encoder.cost_matrix.shape)
+            else:
+                self.tie_break_seed = tie_break_seed
 
         self.constraint_matrix = encoder.constraint_matrix
+        self.top_k = top_k
+        self.score_threshold = score_threshold
+        self.cancellation = cancellation
+        self.instrumentation = instrumentation
 
         self.solved = False
-        self.flow_matrix = None
+        self.assignment = None
         self.optimal_cost = None
         self.cost = None
+        # network sizes and timings of the last solve.
+        self.stats = {}
         self.logger = logger
 
     def _validate_input_range(self):
@@ -61,47 +100,82 @@ class MinMaxSolver:
 
         self.logger.debug('Finished checking graph inputs')
 
-    def solve(self):
-        '''Computes combined solution of two SimpleSolvers'''
-        self._validate_input_range()
+    def _prune_constraints(self):
+        '''Mark the pairs outside of the candidate set as conflicts.'''
+        threshold = None
+        if self.score_threshold is not None:
+            threshold = -score_to_cost(self.score_threshold)
 
-        start_time = time.time()
-        self.logger.debug('Min Solver started at={}'.format(start_time))
-        minimum_solver = SimpleSolver(
+        candidates = select_candidates(
+            -self.cost_matrix,
+            self.constraint_matrix,
             self.minimums,
+            self.maximums,
             self.demands,
-            self.cost_matrix,
-            self.constraint_matrix,
-            logger=self.logger,
-            strict=False
-        ) # strict=False prevents errors from being thrown for supply/demand mismatch
-        minimum_result = minimum_solver.solve()
-        stop_time = time.time()
-        self.logger.debug('Min Solver finished at {} and took {} seconds'.format(stop_time, stop_time - start_time))
-
-        adjusted_constraints = self.constraint_matrix - minimum_solver.flow_matrix
-        adjusted_maximums = self.maximums - np.sum(minimum_solver.flow_matrix, axis=0)
-        adjusted_demands = self.demands - np.sum(minimum_solver.flow_matrix, axis=1)
-
-        start_time = time.time()
-        self.logger.debug('Max Solver started at={}'.format(start_time))
-        maximum_solver = SimpleSolver(
-            adjusted_maximums,
-            adjusted_demands,
-            self.cost_matrix,
-            adjusted_constraints,
+            self.top_k,
+            threshold=threshold,
             logger=self.logger)
 
-        maximum_result = maximum_solver.solve()
-        stop_time = time.time()
-        self.logger.debug('Max Solver finished at {} and took {} seconds'.format(stop_time, stop_time - start_time))
+        self.constraint_matrix = np.where(candidates, self.constraint_matrix, -1)
 
-        self.solved = minimum_solver.solved and maximum_solver.solved
+    def _check_cancelled(self):
+        if self.cancellation is not None:
+            self.cancellation.check()
 
-        self.optimal_cost = minimum_solver.min_cost_flow.OptimalCost() + \
-            maximum_solver.min_cost_flow.OptimalCost()
+    def _phase(self, name):
+        '''Record a step of the solve as a phase, if an Instrumentation was given.'''
+        if self.instrumentation is None:
+            return contextlib.nullcontext()
+        return self.instrumentation.phase(name)
 
-        self.flow_matrix = minimum_result + maximum_result
-        self.cost = np.sum(self.flow_matrix * self.cost_matrix)
+    def solve(self):
+        '''Computes the solution of a single SimpleSolver with reviewer minimums as lower bounds'''
+        self._validate_input_range()
+        self._check_cancelled()
+
+        if self.top_k:
+            self._prune_constraints()
 
-        return self.flow_matrix
+        start_time = time.time()
+        self.logger.debug('Solver started at={}'.format(start_time))
+        with self._phase('build_network'):
+            solver = SimpleSolver(
+                self.maximums,
+                self.demands,
+                self.cost_matrix,
+                self.constraint_matrix,
+                logger=self.logger,
+                minimums=self.minimums,
+                tie_break_seed=self.tie_break_seed
+            )
+        build_time = time.time()
+        self._check_cancelled()
+        with self._phase('min_cost_flow'):
+            solver.solve_flow()
+        flow_time = time.time()
+        with self._phase('extract_flow'):
+            self.assignment = solver.read_assignment()
+        stop_time = time.time()
+        self.logger.debug('Solver finished at {} and took {} seconds'.format(stop_time, stop_time - start_time))
+        self.stats = {
+            'networks': 1,
+            'nodes': solver.min_cost_flow.NumNodes(),
+            'arcs': solver.min_cost_flow.NumArcs(),
+            'build_time': build_time - start_time,
+            'flow_time': flow_time - build_time,
+            'extract_time': stop_time - flow_time
+        }
+
+        self.solved = solver.solved
+        self.optimal_cost = solver.min_cost_flow.OptimalCost()
+        self.cost = np.sum(self.cost_matrix[self.assignment.paper_indices, self.assignment.reviewer_indices])
+        self._check_cancelled()
+
+        return self.assignment
+
+    @property
+    def flow_matrix(self):
+        '''The dense #papers by #reviewers flow matrix, built on demand.'''
+        if self.assignment is None:
+            return None
+        return self.assignment.to_matrix()
@@ -0,0 +1,34 @@
+'''
+Helpers for loading arcs into, and reading flows out of, OR-Tools min-cost-flow solvers in bulk.
+
+The arcs of a network are assembled as aligned numpy arrays (tails, heads, capacities,
+costs). They are converted to Python ints once, since SimpleMinCostFlow can't handle
+numpy integer types, and handed to the solver in a single tight loop.
+'''
+
+import numpy as np
+
+def _as_int_list(values, size):
+    return np.broadcast_to(np.asarray(values), (size,)).astype(int).tolist()
+
+def add_arcs(min_cost_flow, tails, heads, capacities, costs):
+    '''
+    Add an arc for each aligned entry of `tails`, `heads`, `capacities` and `costs`
+    (`capacities` and `costs` may also be scalars).
+
+    Returns the index of the first added arc; the arcs are numbered consecutively.
+    '''
+    size = np.size(tails)
+    first_arc = min_cost_flow.NumArcs()
+    for tail, head, capacity, cost in zip(
+            _as_int_list(tails, size),
+            _as_int_list(heads, size),
+            _as_int_list(capacities, size),
+            _as_int_list(costs, size)):
+        min_cost_flow.AddArcWithCapacityAndUnitCost(tail, head, capacity, cost)
+    return first_arc
+
+def arc_flows(min_cost_flow, first_arc, num_arcs):
+    '''Return the flows of `num_arcs` consecutive arcs, starting at `first_arc`, as an array.'''
+    return np.array(
+        [min_cost_flow.Flow(arc) for arc in range(first_arc, first_arc + num_arcs)], dtype=int)
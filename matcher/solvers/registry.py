@@ -0,0 +1,73 @@
+'''
+A registry of solvers by name.
+
+Solvers are registered as classes or as "module:class" paths, and a path is only
+imported when its solver is first selected, so that listing the solvers (e.g. for
+the CLI) doesn't import the solver modules or OR-Tools.
+
+Other packages can add solvers with an entry point in the
+"openreview_matcher.solvers" group, e.g. in their setup.py:
+
+    entry_points={
+        'openreview_matcher.solvers': ['MySolver = my_package.my_module:MySolver']
+    }
+
+The solvers registered here take precedence over entry points of the same name.
+'''
+
+import importlib
+
+ENTRY_POINT_GROUP = 'openreview_matcher.solvers'
+
+SOLVER_MAP = {
+    'MinMax': 'matcher.solvers.minmax_solver:MinMaxSolver',
+    'FairFlow': 'matcher.solvers.fairflow:FairFlow',
+    'SparseFairFlow': 'matcher.solvers.sparse_fairflow:SparseFairFlow'
+}
+
+_entry_points_loaded = False
+
+def _load_entry_points():
+    '''Add the solvers of installed entry points to SOLVER_MAP, without importing them.'''
+    global _entry_points_loaded
+    if _entry_points_loaded:
+        return
+    _entry_points_loaded = True
+
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        # Python < 3.8
+        return
+    try:
+        found = entry_points(group=ENTRY_POINT_GROUP)
+    except TypeError:
+        # Python < 3.10 returns a dict of entry points by group.
+        found = entry_points().get(ENTRY_POINT_GROUP, [])
+    for entry_point in found:
+        SOLVER_MAP.setdefault(entry_point.name, entry_point.value)
+
+def register_solver(name, solver):
+    '''Register `solver`, a solver class or a "module:class" path, under `name`.'''
+    SOLVER_MAP[name] = solver
+
+def available_solvers():
+    '''Get the names of all registered solvers.'''
+    _load_entry_points()
+    return list(SOLVER_MAP)
+
+def get_solver(name):
+    '''
+    Get the solver class registered under `name`, importing its module if needed.
+
+    Raises KeyError if no solver is registered under `name`.
+    '''
+    _load_entry_points()
+    solver = SOLVER_MAP[name]
+    if isinstance(solver, str):
+        module_name, _, attribute = solver.partition(':')
+        solver = importlib.import_module(module_name)
+        for part in attribute.split('.'):
+            solver = getattr(solver, part)
+        SOLVER_MAP[name] = solver
+    return solver
@@ -29,6 +29,17 @@ SimpleSolver is initialized with the following arguments:
         True (default) or False. If True, throws an error when the sum of
         the number of available reviews does not equal the sum of demands
 
+    "minimums" (optional):
+        a list of integers of length #reviewers representing the minimum number
+        of reviews each reviewer must be assigned. Minimums are lower bounds on the
+        source-to-reviewer arcs, which are removed with the standard transformation:
+        the capacity of each arc is reduced by its minimum, and the minimum is moved
+        from the supply of the source to the supply of the reviewer node.
+
+    "tie_break_seed" (optional):
+        if given, the cost of each reviewer-paper arc is perturbed by a deterministic,
+        pseudo-random amount computed from the paper index, reviewer index and this seed.
+
 
 Node is a namedtuple that is used to represent nodes in the graph:
 
@@ -54,6 +65,9 @@ import logging
 import numpy as np
 from ortools.graph import pywrapgraph
 from .core import SolverException
+from .tie_breaking import tie_breaking_scores
+from ..assignment import Assignment
+from ..encoder import score_to_cost
 
 Node = namedtuple('Node', ['number', 'index', 'supply'])
 
@@ -67,7 +81,9 @@ class SimpleSolver:
             cost_matrix,
             constraint_matrix,
             logger=logging.getLogger(__name__),
-            strict=True
+            strict=True,
+            minimums=None,
+            tie_break_seed=None
         ):
 
         self.logger = logger
@@ -76,9 +92,11 @@ class SimpleSolver:
         self.solved = False
         self.cost_matrix = cost_matrix
         self.constraint_matrix = constraint_matrix
-        self.flow_matrix = np.zeros(np.shape(self.cost_matrix))
+        self.assignment = None
         self.num_reviews = num_reviews
         self.demands = demands
+        self.minimums = minimums if minimums is not None else [0] * len(num_reviews)
+        self.tie_break_seed = tie_break_seed
         self.num_papers = np.size(cost_matrix, axis=0)
         self.num_reviewers = np.size(cost_matrix, axis=1)
         self.current_offset = 0
@@ -92,6 +110,7 @@ class SimpleSolver:
         self.node_by_number = {}
 
         total_supply = min(sum(self.num_reviews), sum(self.demands))
+        total_minimum = sum(self.minimums)
 
 
         # -- Add Nodes --
@@ -99,9 +118,10 @@ class SimpleSolver:
         # no index because the source isn't represented in the cost/constraint matrices.
         self.source_node = self.add_node(
             index=None,
-            supply=total_supply)
+            supply=total_supply - total_minimum)
 
-        self.reviewer_nodes = [self.add_node(i) for i in range(self.num_reviewers)]
+        self.reviewer_nodes = [
+            self.add_node(i, supply=self.minimums[i]) for i in range(self.num_reviewers)]
         self.paper_nodes = [self.add_node(i) for i in range(self.num_papers)]
 
         # no index because the sink isn't represented in the cost/constraint matrices.
@@ -116,25 +136,45 @@ class SimpleSolver:
 
         # connect the source node to all reviewer nodes.
         for r_node in self.reviewer_nodes:
-            capacity = self.num_reviews[r_node.index]
+            capacity = self.num_reviews[r_node.index] - self.minimums[r_node.index]
             self.add_edge(self.source_node, r_node, capacity, cost=0)
 
-        for r_node in self.reviewer_nodes:
-            for p_node in self.paper_nodes:
-
-                coordinates = (p_node.index, r_node.index)
-                arc_cost = int(self.cost_matrix[coordinates])
-                arc_constraint = self.constraint_matrix[coordinates]
-
-                # a constraint of 0 means there's no constraint, so apply the cost as normal
-                # a constraint of 1 means that this user was explicitly assigned to this paper
-                # a constraint of anything other that 0 or 1 essentially indicates a conflict, so do not add an arc
-                if arc_constraint == 0:
-                    self.add_edge(r_node, p_node, 1, arc_cost)
-                elif arc_constraint == 1:
-                    # TODO: this should be handled as a hard constraint
-                    arc_cost = self._least_cost() - 1
-                    self.add_edge(r_node, p_node, 1, int(arc_cost))
+        # a constraint of 0 means there's no constraint, so apply the cost as normal
+        # a constraint of 1 means that this user was explicitly assigned to this paper
+        # a constraint of anything other that 0 or 1 essentially indicates a conflict, so do not add an arc
+        # (pruned graphs mark the pairs left out of the candidate set as conflicts)
+
+        # iterate over the eligible pairs only, reviewer by reviewer.
+        # keep track of the reviewer-paper arcs, so that flows can be read back without lookups.
+        eligible = (self.constraint_matrix == 0) | (self.constraint_matrix == 1)
+        reviewer_indices, paper_indices = np.nonzero(np.transpose(eligible))
+        self.first_assignment_arc = len(self.start_nodes)
+        self.arc_reviewer_indices = reviewer_indices
+        self.arc_paper_indices = paper_indices
+
+        arc_costs = self.cost_matrix[paper_indices, reviewer_indices].astype(int)
+        if self.tie_break_seed is not None:
+            arc_costs += score_to_cost(
+                tie_breaking_scores(paper_indices, reviewer_indices, self.tie_break_seed)).astype(int)
+
+        # TODO: this should be handled as a hard constraint
+        # forced arcs must be cheaper than any rearrangement of the other arcs (including the
+        # tie-breaking perturbations) that drops them. A rearrangement changes at most one arc
+        # per node, so a margin of the spread of the other costs times the number of nodes suffices.
+        forced = self.constraint_matrix[paper_indices, reviewer_indices] == 1
+        if np.any(forced):
+            other_costs = arc_costs[~forced]
+            spread = int(np.max(other_costs) - np.min(other_costs)) if other_costs.size else 0
+            least_cost = min(self._least_cost(), np.min(arc_costs))
+            arc_costs[forced] = int(least_cost - 1 - spread * (self.num_papers + self.num_reviewers))
+
+        for r_index, p_index, arc_cost in zip(
+                reviewer_indices.tolist(), paper_indices.tolist(), arc_costs.tolist()):
+            self.add_edge(
+                self.reviewer_node_by_index[r_index],
+                self.paper_node_by_index[p_index],
+                1,
+                arc_cost)
 
         # connect paper nodes to the sink node.
         for p_node in self.paper_nodes:
@@ -170,12 +210,23 @@ class SimpleSolver:
                 'self.demands array must be same length ({}) as number of papers ({})'.format(
                     len(self.demands), num_papers))
 
+        if not len(self.minimums) == num_reviewers:
+            raise SolverException(
+                'minimums must be same length ({}) as number of reviewers ({})'.format(
+                    len(self.minimums), num_reviewers))
+
+        if any([minimum > maximum for minimum, maximum in zip(self.minimums, self.num_reviews)]):
+            raise SolverException('minimums may not be greater than num_reviews')
+
         supply = sum(self.num_reviews)
         demand = sum(self.demands)
         self.logger.debug('Total supply of reviews is ({}) and total demands are ({})'.format(supply, demand))
         if strict and supply < demand:
             raise SolverException('Total supply of reviews ({}) must be greater than total demand ({})'.format(supply, demand))
 
+        if sum(self.minimums) > min(supply, demand):
+            raise SolverException('Total minimum reviews ({}) must not be greater than total demand ({})'.format(sum(self.minimums), demand))
+
         self.logger.debug('Finished checking graph inputs')
 
     def _check_graph_integrity(self):
@@ -285,29 +336,54 @@ class SimpleSolver:
         for node in self.node_by_number.values():
             self.min_cost_flow.SetNodeSupply(node.number, node.supply)
 
-    def solve(self):
+    @property
+    def flow_matrix(self):
+        '''The dense #papers by #reviewers flow matrix, built on demand.'''
+        if self.assignment is None:
+            return np.zeros((self.num_papers, self.num_reviewers))
+        return self.assignment.to_matrix()
+
+    def solve_flow(self):
         '''
-        Executes the OR-Tools MinCostFlow solver,
-        and returns the solution in the form of a flow matrix.
+        Executes the OR-Tools MinCostFlow solver, and returns whether it found an optimal flow.
 
         '''
         assert hasattr(self, 'min_cost_flow'), \
             'Solver not constructed. Run self.construct_solver() first.'
         self.cost = 0
-        if self.min_cost_flow.Solve() == self.min_cost_flow.OPTIMAL:
-            self.solved = True
-            for i in range(self.min_cost_flow.NumArcs()):
-                self.cost += self.min_cost_flow.Flow(i) * self.min_cost_flow.UnitCost(i)
-                r_node = self.node_by_number[self.min_cost_flow.Tail(i)]
-                p_node = self.node_by_number[self.min_cost_flow.Head(i)]
-                flow = self.min_cost_flow.Flow(i)
-
-                if r_node in self.reviewer_nodes and p_node in self.paper_nodes:
-                    self.flow_matrix[p_node.index, r_node.index] = flow
-        else:
-            self.solved = False
+        self.solved = self.min_cost_flow.Solve() == self.min_cost_flow.OPTIMAL
+        if self.solved:
+            self.cost = self.min_cost_flow.OptimalCost()
+        return self.solved
+
+    def read_assignment(self):
+        '''
+        Reads the flows of the reviewer-paper arcs after solve_flow,
+        and returns them in the form of an Assignment (empty if there is no solution).
+
+        '''
+        self.assignment = Assignment([], [], (self.num_papers, self.num_reviewers))
+        if self.solved:
+            first_arc = self.first_assignment_arc
+            flows = np.array([
+                self.min_cost_flow.Flow(arc)
+                for arc in range(first_arc, first_arc + len(self.arc_paper_indices))], dtype=int)
+            assigned = flows > 0
+            self.assignment = Assignment(
+                self.arc_paper_indices[assigned],
+                self.arc_reviewer_indices[assigned],
+                (self.num_papers, self.num_reviewers))
+
+        return self.assignment
 
-        return self.flow_matrix
+    def solve(self):
+        '''
+        Executes the OR-Tools MinCostFlow solver,
+        and returns the solution in the form of an Assignment.
+
+        '''
+        self.solve_flow()
+        return self.read_assignment()
 
     def __str__(self):
         return_lines = []
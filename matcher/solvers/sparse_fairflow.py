@@ -0,0 +1,171 @@
+import numpy as np
+from .candidates import select_candidates
+from .core import SolverException
+from .fairflow import FairFlow
+from .tie_breaking import tie_breaking_scores
+
+
+class SparseFairFlow(FairFlow):
+    """FairFlow restricted to a set of candidate reviewer-paper pairs.
+
+    FairFlow keeps dense reviewers x papers float matrices of affinities,
+    original affinities and of the solution, and adds an arc for every
+    unconflicted pair to its networks. This variant only stores the candidate
+    pairs: the top-k reviewers of each paper and top-k papers of each reviewer
+    (see candidates.py), or every unconflicted pair if `top_k` is not given.
+
+    The pairs are kept sorted by paper, then reviewer, as aligned arrays of
+    reviewer indices, paper indices, (shifted) affinities and a boolean
+    "assigned" flag, with CSR row pointers per paper. All networks and paper
+    scores are built from these arrays only.
+    """
+    def _init_affinities(self, encoder, tie_break_seed):
+        """Select the candidate pairs and store their (shifted, non-negative) affinities."""
+        scores = encoder.aggregate_score_matrix
+        constraint_matrix = encoder.constraint_matrix
+
+        if self.top_k:
+            candidates = select_candidates(
+                scores,
+                constraint_matrix,
+                self.minimums,
+                self.maximums,
+                self.demands,
+                self.top_k,
+                threshold=self.score_threshold,
+                logger=self.logger)
+            candidates &= constraint_matrix == 0
+        else:
+            candidates = constraint_matrix == 0
+
+        pair_papers, pair_reviewers = np.nonzero(candidates)
+        del candidates
+        self.pair_papers = pair_papers.astype(np.int32)
+        self.pair_reviewers = pair_reviewers.astype(np.int32)
+        self.pair_indptr = np.concatenate((
+            [0], np.cumsum(np.bincount(pair_papers, minlength=self.num_papers))))
+        # sorted keys for looking up the position of a (reviewer, paper) pair.
+        self._pair_keys = pair_papers.astype(np.int64) * self.num_reviewers + pair_reviewers
+
+        if not scores.any():
+            if tie_break_seed is None:
+                self.pair_affinities = np.random.rand(np.size(pair_papers))
+            else:
+                self.pair_affinities = tie_breaking_scores(pair_papers, pair_reviewers, tie_break_seed)
+        else:
+            self.pair_affinities = scores[pair_papers, pair_reviewers].astype(float)
+
+        # shift by the minimum over all pairs, like FairFlow does.
+        min_affinities = np.min(scores)
+        self.affinity_offset = min(min_affinities, 0)
+        if min_affinities < 0:
+            self.pair_affinities -= min_affinities
+        self.max_affinities = np.max(self.pair_affinities, initial=0.0)
+        self.logger.debug('SparseFairFlow keeps {} candidate pairs'.format(np.size(pair_papers)))
+
+    def _reseed_affinities(self, seed):
+        noise = tie_breaking_scores(self.pair_papers, self.pair_reviewers, seed)
+        if self.all_zero_affinities:
+            self.pair_affinities = noise
+        else:
+            self.pair_affinities += self.perturbation * self.max_affinities * noise
+        self.max_affinities = np.max(self.pair_affinities, initial=0.0)
+        self._reset_scores()
+
+    def _init_solution(self, solution):
+        self.pair_assigned = np.zeros(np.size(self.pair_papers), dtype=bool)
+        if solution:
+            revs, paps = np.nonzero(solution)
+            self.pair_assigned[self._pair_index(revs, paps)] = True
+
+    def _prune_constraints(self):
+        """The candidate pairs have already been selected."""
+        pass
+
+    def _find_pairs(self, revs, paps):
+        """Get the positions of reviewer-paper pairs, and whether each pair is a candidate.
+
+        The position of a pair that isn't a candidate is that of another pair.
+        """
+        keys = np.asarray(paps, dtype=np.int64) * self.num_reviewers + np.asarray(revs, dtype=np.int64)
+        index = np.minimum(np.searchsorted(self._pair_keys, keys), np.size(self._pair_keys) - 1)
+        if np.size(self._pair_keys) == 0:
+            return index, np.zeros(np.shape(keys), dtype=bool)
+        return index, self._pair_keys[index] == keys
+
+    def _pair_index(self, revs, paps):
+        """Get the positions of reviewer-paper pairs, which must be candidates."""
+        index, found = self._find_pairs(revs, paps)
+        if not np.all(found):
+            raise SolverException(
+                '{} reviewer-paper pairs are not candidate pairs'.format(np.size(found) - np.count_nonzero(found)))
+        return index
+
+    def _pairs_of(self, papers):
+        """Get the positions of all candidate pairs of `papers`."""
+        starts = self.pair_indptr[papers]
+        counts = self.pair_indptr[np.asarray(papers) + 1] - starts
+        # for each pair, its offset from the first pair of its paper.
+        offsets = np.arange(np.sum(counts)) - np.repeat(np.cumsum(counts) - counts, counts)
+        return np.repeat(starts, counts) + offsets
+
+    def _pair_affinities(self, revs, paps):
+        return self.pair_affinities[self._pair_index(revs, paps)]
+
+    def _is_assigned(self, revs, paps):
+        """Pairs that aren't candidates are never assigned."""
+        index, found = self._find_pairs(revs, paps)
+        return found & self.pair_assigned[index]
+
+    def _is_eligible(self, revs, paps):
+        """Only candidate pairs are stored, and all of them are eligible."""
+        keys = np.asarray(paps, dtype=np.int64) * self.num_reviewers + np.asarray(revs, dtype=np.int64)
+        return np.isin(keys, self._pair_keys)
+
+    def _set_assigned(self, revs, paps, assigned):
+        self.pair_assigned[self._pair_index(revs, paps)] = assigned
+
+    def _assigned_pairs(self, papers=None):
+        if papers is None:
+            index = np.nonzero(self.pair_assigned)[0]
+        else:
+            index = self._pairs_of(papers)
+            index = index[self.pair_assigned[index]]
+        return self.pair_reviewers[index].astype(int), self.pair_papers[index].astype(int)
+
+    def _open_pairs(self, reviewers=None, papers=None):
+        if papers is None:
+            index = np.nonzero(~self.pair_assigned)[0]
+        else:
+            index = self._pairs_of(papers)
+            index = index[~self.pair_assigned[index]]
+        if reviewers is not None:
+            index = index[np.isin(self.pair_reviewers[index], reviewers)]
+        return self.pair_reviewers[index].astype(int), self.pair_papers[index].astype(int)
+
+    def _load_assignment(self, revs, paps):
+        self.pair_assigned[:] = False
+        self.pair_assigned[self._pair_index(revs, paps)] = True
+        self._reset_scores()
+
+    def _makespan_upper_bound(self):
+        """Get an upper bound on the makespans that the search can achieve (see FairFlow)."""
+        demands = np.asarray(self.demands, dtype=int)
+        # rank the candidate pairs of each paper from the highest affinity down.
+        order = np.lexsort((-self.pair_affinities, self.pair_papers))
+        ranks = np.arange(np.size(order)) - self.pair_indptr[self.pair_papers[order]]
+        top = order[ranks < demands[self.pair_papers[order]]]
+        top_sums = np.bincount(
+            self.pair_papers[top], weights=self.pair_affinities[top], minlength=self.num_papers)
+
+        has_demand = demands > 0
+        bound = np.min(top_sums[has_demand], initial=np.inf)
+        loose_bound = self.max_affinities * np.max(self.demands)
+        return min(bound + self.max_affinities, loose_bound)
+
+    def sol_as_mat(self):
+        """Get the solution as a dense reviewers x papers matrix."""
+        self._check_valid()
+        solution = np.zeros((self.num_reviewers, self.num_papers))
+        solution[self._assigned_pairs()] = 1.0
+        return solution
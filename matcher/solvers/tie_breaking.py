@@ -0,0 +1,50 @@
+'''
+Deterministic tie-breaking for inputs where all scores are zero.
+
+Instead of drawing a dense random matrix, each (paper, reviewer) pair gets a
+pseudo-random perturbation computed from its indices and a seed with the
+SplitMix64 hash, so perturbations can be generated for just the arcs being built,
+and reruns with the same seed give identical results.
+'''
+
+import numpy as np
+
+_GOLDEN_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+
+def tie_breaking_scores(paper_indices, reviewer_indices, seed):
+    '''
+    Return an array of floats in [0, 1), one for each (paper, reviewer) pair,
+    that only depends on the indices and on `seed`.
+    '''
+    papers = np.asarray(paper_indices, dtype=np.uint64)
+    reviewers = np.asarray(reviewer_indices, dtype=np.uint64)
+
+    with np.errstate(over='ignore'):
+        state = (papers << np.uint64(32)) ^ reviewers
+        state ^= np.uint64(int(seed) & 0xFFFFFFFFFFFFFFFF) * _GOLDEN_GAMMA
+        state += _GOLDEN_GAMMA
+        state = (state ^ (state >> np.uint64(30))) * _MIX_1
+        state = (state ^ (state >> np.uint64(27))) * _MIX_2
+        state ^= state >> np.uint64(31)
+
+    # keep the top 53 bits, which a float64 represents exactly.
+    return (state >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+def fill_tie_breaking_scores(matrix, seed, transposed=False, chunk_size=1024):
+    '''
+    Overwrite `matrix` in place with tie-breaking scores, a chunk of rows at a time.
+
+    `matrix` is #papers by #reviewers, or #reviewers by #papers if `transposed`.
+    '''
+    num_rows, num_columns = matrix.shape
+    columns = np.arange(num_columns)
+    for start in range(0, num_rows, chunk_size):
+        stop = min(start + chunk_size, num_rows)
+        rows = np.arange(start, stop)[:, np.newaxis]
+        if transposed:
+            matrix[start:stop] = tie_breaking_scores(columns[np.newaxis, :], rows, seed)
+        else:
+            matrix[start:stop] = tie_breaking_scores(rows, columns[np.newaxis, :], seed)
+    return matrix
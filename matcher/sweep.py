@@ -0,0 +1,166 @@
+'''
+Solves many variants of one match, sharing a single Encoder.
+
+Encoding the score edges into per-type matrices is done once. Each variant may
+override any of:
+
+    - "name": a label for the variant in the results (defaults to its index),
+    - "weight_by_type" and "normalization_types": the aggregate score matrix of
+      the variant is derived from the shared per-type matrices (see
+      Encoder.with_weights),
+    - "minimums", "maximums" and "demands": lists, or a single value for every
+      reviewer or paper,
+    - "solver" and "solver_options": the solver name and the options that are
+      added to the base solver options,
+    - "polish": the polishing objective.
+
+The variants run on a pool of `workers` processes, which receive the shared
+Encoder once each, or one after the other in this process. Each variant returns
+a row of a comparison table:
+
+    name, status, message, objective (the total aggregate score), worst paper
+    score, mean paper score, min / max / mean reviewer load, the number of
+    reviewers used, and the number of seconds it took.
+'''
+
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from . import solvers
+from .solvers import SolverException
+from .solvers.registry import available_solvers, get_solver
+
+COLUMNS = [
+    'name', 'status', 'objective', 'worst_paper_score', 'mean_paper_score',
+    'min_load', 'max_load', 'mean_load', 'reviewers_used', 'seconds', 'message'
+]
+
+def _broadcast(value, size):
+    return np.broadcast_to(np.asarray(value), (size,)).tolist()
+
+def _statistics(encoder, assignment, demands):
+    '''Get the comparison columns of a solved assignment.'''
+    scores = encoder.aggregate_score_matrix[assignment.paper_indices, assignment.reviewer_indices]
+    num_papers, num_reviewers = encoder.matrix_shape
+    paper_scores = np.bincount(assignment.paper_indices, weights=scores, minlength=num_papers)
+    loads = np.bincount(assignment.reviewer_indices, minlength=num_reviewers)
+    has_demand = np.asarray(demands) > 0
+    return {
+        'objective': float(np.sum(scores)),
+        'worst_paper_score': float(np.min(paper_scores[has_demand], initial=np.inf)) if np.any(has_demand) else None,
+        'mean_paper_score': float(np.mean(paper_scores)) if num_papers else None,
+        'min_load': int(np.min(loads)) if num_reviewers else None,
+        'max_load': int(np.max(loads)) if num_reviewers else None,
+        'mean_load': float(np.mean(loads)) if num_reviewers else None,
+        'reviewers_used': int(np.count_nonzero(loads))
+    }
+
+def _variant_name(variant, index):
+    return variant.get('name', str(index))
+
+def _check_variant(base, variant, index):
+    '''Raise a ValueError that names the variant if it selects an unknown solver.'''
+    solver = variant.get('solver', base['solver'])
+    if solver not in available_solvers():
+        raise ValueError('Variant "{}" selects an unknown solver "{}", choose from: {}'.format(
+            _variant_name(variant, index), solver, available_solvers()))
+
+def solve_variant(encoder, base, variant, index=0, logger=logging.getLogger(__name__)):
+    '''
+    Solve one variant (see the module docstring) of the match described by `base`,
+    a dict of 'minimums', 'maximums', 'demands', 'solver', 'solver_options',
+    'polish' and 'check_flow', and return its row of the comparison table.
+
+    Raises a ValueError if the variant selects an unknown solver.
+    '''
+    _check_variant(base, variant, index)
+    start = time.time()
+    num_papers, num_reviewers = encoder.matrix_shape
+    if 'weight_by_type' in variant or 'normalization_types' in variant:
+        encoder = encoder.with_weights(
+            variant.get('weight_by_type', encoder.weight_by_type), variant.get('normalization_types'))
+    minimums = _broadcast(variant.get('minimums', base['minimums']), num_reviewers)
+    maximums = _broadcast(variant.get('maximums', base['maximums']), num_reviewers)
+    demands = _broadcast(variant.get('demands', base['demands']), num_papers)
+    solver_options = dict(base.get('solver_options') or {}, **variant.get('solver_options', {}))
+    polish = variant.get('polish', base.get('polish'))
+
+    row = {column: None for column in COLUMNS}
+    row['name'] = _variant_name(variant, index)
+    try:
+        solvers.check_feasibility(
+            minimums,
+            maximums,
+            demands,
+            encoder.constraint_matrix,
+            check_flow=base.get('check_flow', True),
+            logger=logger)
+        solver = get_solver(variant.get('solver', base['solver']))(
+            minimums, maximums, demands, encoder, logger=logger, **solver_options)
+        assignment = solver.solve()
+        if not solver.solved:
+            raise SolverException('Solver could not find a solution. Adjust your parameters')
+        if polish:
+            assignment = solvers.polish(
+                assignment,
+                encoder.aggregate_score_matrix,
+                encoder.constraint_matrix,
+                minimums,
+                maximums,
+                demands,
+                objective=polish,
+                logger=logger)
+    except SolverException as error_handle:
+        row.update(status='No Solution', message=str(error_handle))
+    else:
+        row.update(status='Complete', **_statistics(encoder, assignment, demands))
+
+    row['seconds'] = time.time() - start
+    return row
+
+# the shared Encoder of each worker process.
+_sweep_encoder = None
+
+def _init_sweep_worker(encoder):
+    global _sweep_encoder
+    _sweep_encoder = encoder
+
+def _solve_variant_in_worker(base, variant, index):
+    return solve_variant(_sweep_encoder, base, variant, index)
+
+def sweep(encoder, base, variants, workers=None, logger=logging.getLogger(__name__)):
+    '''
+    Solve each of `variants` (see the module docstring and solve_variant) with
+    the shared `encoder`, and return the rows of the comparison table, in the
+    order of the variants.
+
+    If `workers` is greater than 1, the variants run on a pool of that many processes.
+
+    All variants are checked before any is solved: a ValueError that names the
+    variant is raised if one of them selects an unknown solver.
+    '''
+    for index, variant in enumerate(variants):
+        _check_variant(base, variant, index)
+
+    if not workers or workers <= 1:
+        return [
+            solve_variant(encoder, base, variant, index, logger=logger)
+            for index, variant in enumerate(variants)]
+
+    with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_sweep_worker, initargs=(encoder,)) as executor:
+        return list(executor.map(
+            _solve_variant_in_worker, [base] * len(variants), variants, range(len(variants))))
+
+def format_table(rows, columns=COLUMNS):
+    '''Format the rows of a comparison table as aligned text.'''
+    def cell(value):
+        if isinstance(value, float):
+            return '{:.4f}'.format(value)
+        return '' if value is None else str(value)
+
+    cells = [list(columns)] + [[cell(row.get(column)) for column in columns] for row in rows]
+    widths = [max(len(line[i]) for line in cells) for i in range(len(columns))]
+    return '\n'.join(
+        '  '.join(value.ljust(width) for value, width in zip(line, widths)).rstrip() for line in cells)
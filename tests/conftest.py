@@ -14,6 +14,7 @@ import pytest
 import openreview
 
 import matcher.service
+from matcher.solvers import FairFlow
 
 AFFINITY_SCORE_FILE = './affinity_scores'
 
@@ -115,6 +116,13 @@ def assert_arrays(array_A, array_B, is_string=False):
     else:
         assert all([float(a) == float(b) for a, b in zip(sorted(array_A), sorted(array_B))])    
 
+@pytest.fixture(autouse=True)
+def solver_debug_mode(monkeypatch):
+    '''
+    Check the full solver invariants, which are skipped in production, in every test.
+    '''
+    monkeypatch.setattr(FairFlow, 'debug', True)
+
 @pytest.fixture
 def openreview_context(scope='function'):
     '''
@@ -0,0 +1,47 @@
+'''
+Unit test suite for `matcher/assignment.py`
+'''
+import numpy as np
+from matcher.assignment import Assignment
+
+def test_assignment_from_matrix():
+    flow_matrix = np.array([
+        [0, 1, 0, 1],
+        [1, 0, 0, 0],
+        [0, 0, 0, 0]
+    ])
+
+    assignment = Assignment.from_matrix(flow_matrix)
+
+    assert assignment.shape == (3, 4)
+    assert assignment.nnz == 3
+    assert assignment.paper_indices.dtype == np.int32
+    assert assignment.reviewer_indices.dtype == np.int32
+    assert assignment.indptr.tolist() == [0, 2, 3, 3]
+    assert assignment.reviewers_of(0).tolist() == [1, 3]
+    assert assignment.reviewers_of(2).tolist() == []
+    assert np.array_equal(assignment.to_matrix(), flow_matrix)
+
+def test_assignment_behaves_like_matrix():
+    '''An Assignment can be used wherever the dense flow matrix was used.'''
+    flow_matrix = np.array([
+        [0, 1, 0, 1],
+        [1, 0, 0, 0],
+        [0, 0, 1, 0]
+    ], dtype=float)
+
+    # pairs don't need to be given in order
+    assignment = Assignment([2, 0, 1, 0], [2, 3, 0, 1], (3, 4))
+
+    assert len(assignment) == 3
+    assert len(assignment[0]) == 4
+    assert assignment[1, 0] == 1
+    assert assignment.any()
+    assert not Assignment([], [], (3, 4)).any()
+
+    assert np.sum(assignment) == 4
+    assert np.array_equal(np.sum(assignment, axis=0), np.sum(flow_matrix, axis=0))
+    assert np.array_equal(np.sum(assignment, axis=1), np.sum(flow_matrix, axis=1))
+    assert np.array_equal(np.asarray(assignment), flow_matrix)
+    assert np.array_equal(assignment.transpose().to_matrix(), flow_matrix.transpose())
+    assert [list(row) for row in assignment] == flow_matrix.tolist()
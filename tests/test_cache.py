@@ -0,0 +1,53 @@
+import os
+import numpy as np
+from matcher.assignment import Assignment
+from matcher.cache import ResultCache, fingerprint
+
+def _inputs(**changes):
+    inputs = {
+        'reviewers': ['reviewer1', 'reviewer2'],
+        'papers': ['paper1'],
+        'scores_by_type': {'affinity': {'edges': [('paper1', 'reviewer1', 0.5), ('paper1', 'reviewer2', 0.25)]}},
+        'weight_by_type': {'affinity': 1},
+        'demands': [1],
+        'solver_options': {'tie_break_seed': 1}
+    }
+    inputs.update(changes)
+    return inputs
+
+def test_fingerprint():
+    '''Fingerprints only depend on the values of the inputs'''
+    assert fingerprint(_inputs()) == fingerprint(_inputs())
+    assert fingerprint(_inputs()) == fingerprint(_inputs(demands=np.array([1])))
+    assert fingerprint(_inputs()) != fingerprint(_inputs(demands=[2]))
+    assert fingerprint(_inputs()) != fingerprint(_inputs(solver_options={'tie_break_seed': 2}))
+    assert fingerprint(_inputs()) != fingerprint(_inputs(scores_by_type={
+        'affinity': {'edges': [('paper1', 'reviewer1', 0.5), ('paper1', 'reviewer2', 0.3)]}}))
+
+def test_fingerprint_default_score():
+    '''The default score of a score type, which fills the pairs without an edge, changes the fingerprint'''
+    edges = [('paper1', 'reviewer1', 0.5)]
+    assert fingerprint(_inputs(scores_by_type={'affinity': {'edges': edges, 'default': 0.0}})) != \
+        fingerprint(_inputs(scores_by_type={'affinity': {'edges': edges, 'default': 0.9}}))
+    assert fingerprint(_inputs(scores_by_type={'affinity': {'edges': edges}})) != \
+        fingerprint(_inputs(scores_by_type={'affinity': {'edges': edges, 'default': 0.9}}))
+
+def test_result_cache_evicts_least_recently_used(tmp_path):
+    '''Storing an entry evicts the least recently used entries over the size bound'''
+    solution = Assignment([0, 1], [1, 0], (2, 2))
+    cache = ResultCache(str(tmp_path))
+    cache.put('a', {'paper1': []}, {}, solution)
+    entry_size = os.path.getsize(str(tmp_path / 'a.json'))
+
+    cache.max_bytes = 2 * entry_size
+    cache.put('b', {'paper1': []}, {}, solution)
+    os.utime(str(tmp_path / 'a.json'), ns=(0, 0))
+    os.utime(str(tmp_path / 'b.json'), ns=(1, 1))
+    # reading 'a' makes 'b' the least recently used entry.
+    result = cache.get('a')
+    cache.put('c', {'paper1': []}, {}, solution)
+
+    assert sorted(os.listdir(str(tmp_path))) == ['a.json', 'c.json']
+    assert cache.get('b') is None
+    assert result['assignments'] == {'paper1': []}
+    np.testing.assert_array_equal(result['solution'], solution)
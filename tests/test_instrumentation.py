@@ -0,0 +1,42 @@
+'''
+Unit test suite for `matcher/instrumentation.py`
+'''
+
+import numpy as np
+import pytest
+from matcher.instrumentation import Instrumentation, reset_peak_rss
+
+def test_instrumentation_phases():
+    '''Phases are recorded in the order in which they started, and reported when they end'''
+    ended = []
+    instrumentation = Instrumentation(callbacks=[lambda name, record: ended.append(name)])
+
+    with instrumentation.phase('outer'):
+        with instrumentation.phase('inner') as record:
+            record['arcs'] = 3
+        instrumentation.count('outer', iterations=2)
+
+    assert list(instrumentation.phases) == ['outer', 'inner']
+    assert ended == ['inner', 'outer']
+    assert instrumentation.phases['inner']['arcs'] == 3
+    assert instrumentation.phases['outer']['iterations'] == 2
+    for record in instrumentation.as_dict().values():
+        assert record['wall_time'] >= 0 and record['cpu_time'] >= 0
+
+@pytest.mark.skipif(not reset_peak_rss(), reason='the peak RSS can only be reset on Linux')
+def test_instrumentation_peak_rss_per_phase():
+    '''The peak RSS of a phase is reached while it runs, not carried over from earlier phases'''
+    size = 64 * 1024 * 1024
+    instrumentation = Instrumentation()
+
+    with instrumentation.phase('large'):
+        with instrumentation.phase('allocate'):
+            np.ones(size, dtype=np.uint8)
+        # the nested phase reset the peak, but the enclosing phase keeps it.
+    with instrumentation.phase('small'):
+        pass
+
+    phases = instrumentation.phases
+    assert phases['allocate']['peak_rss'] >= size
+    assert phases['large']['peak_rss'] >= size
+    assert phases['small']['peak_rss'] < phases['large']['peak_rss'] - size // 2
@@ -6,8 +6,12 @@ import itertools
 import random
 import pytest
 import logging
+import json
+import os
+import time
 from numpy import testing as nptest
 from matcher import Matcher
+from matcher.solvers import CancellationToken
 
 def test_matcher_basic_minmax():
     reviewers = ['reviewer1', 'reviewer2', 'reviewer3']
@@ -156,4 +160,345 @@ def test_matcher_fairflow_fixed_input():
     assert len(test_fairflow_matcher.solution[0]) == 3
     assert None == nptest.assert_array_equal(test_fairflow_matcher.solution, [[0.0, 1.0, 0.0], [1.0, 0.0, 0.0], [0.0, 0.0, 1.0]])
     assert test_fairflow_matcher.assignments
-    assert test_fairflow_matcher.alternates
\ No newline at end of file
+    assert test_fairflow_matcher.alternates
+
+def test_matcher_infeasible_fails_before_solving():
+    reviewers = ['reviewer1', 'reviewer2', 'reviewer3']
+    papers = ['paper1', 'paper2', 'paper3']
+
+    scores = [
+        (paper, reviewer, random.random()) \
+        for paper, reviewer in itertools.product(papers, reviewers)
+    ]
+
+    # paper2 conflicts with every reviewer
+    constraints = [('paper2', reviewer, -1) for reviewer in reviewers]
+
+    test_matcher = Matcher(
+        {
+            'reviewers': reviewers,
+            'papers': papers,
+            'constraints': constraints,
+            'scores_by_type': {'affinity': {'edges': scores}},
+            'weight_by_type': {'affinity': 1},
+            'minimums': [0, 0, 0],
+            'maximums': [2, 2, 2],
+            'demands': [1, 1, 1],
+            'num_alternates': 1
+        },
+        solver_class = 'MinMax'
+    )
+
+    test_matcher.run()
+
+    assert test_matcher.get_status() == 'No Solution'
+    assert test_matcher.solution is None
+    assert test_matcher.assignments is None
+
+def test_matcher_check_flow():
+    '''By default, infeasibility that only a max-flow detects is found before solving'''
+    reviewers = ['reviewer1', 'reviewer2', 'reviewer3']
+    papers = ['paper1', 'paper2', 'paper3']
+
+    scores = [
+        (paper, reviewer, random.random()) \
+        for paper, reviewer in itertools.product(papers, reviewers)
+    ]
+
+    # paper1 and paper2 can only be reviewed by reviewer1, who can review one paper.
+    constraints = [
+        (paper, reviewer, -1) \
+        for paper, reviewer in itertools.product(['paper1', 'paper2'], ['reviewer2', 'reviewer3'])
+    ]
+
+    def run(**kwargs):
+        messages = []
+        test_matcher = Matcher(
+            {
+                'reviewers': reviewers,
+                'papers': papers,
+                'constraints': constraints,
+                'scores_by_type': {'affinity': {'edges': scores}},
+                'weight_by_type': {'affinity': 1},
+                'minimums': [0, 0, 0],
+                'maximums': [1, 1, 1],
+                'demands': [1, 1, 1],
+                'num_alternates': 1
+            },
+            solver_class = 'MinMax',
+            on_set_status = lambda status, message: messages.append(message),
+            **kwargs
+        )
+        test_matcher.run()
+        return test_matcher, messages
+
+    test_matcher, messages = run()
+    assert test_matcher.get_status() == 'No Solution'
+    assert 'could not receive their demand' in messages[-1]
+    assert 'solve' not in test_matcher.instrumentation.as_dict()
+
+    # without the max-flow, the solver finds out.
+    test_matcher, messages = run(check_flow = False)
+    assert test_matcher.get_status() == 'No Solution'
+    assert 'solve' in test_matcher.instrumentation.as_dict()
+
+def test_matcher_polish():
+    '''The polishing stage raises the lowest paper score of the MinMax solution'''
+    reviewers = ['reviewer1', 'reviewer2', 'reviewer3']
+    papers = ['paper1', 'paper2', 'paper3']
+
+    scores = [
+        ('paper1', 'reviewer1', 1),
+        ('paper1', 'reviewer2', 0),
+        ('paper1', 'reviewer3', 0.25),
+        ('paper2', 'reviewer1', 1),
+        ('paper2', 'reviewer2', 0),
+        ('paper2', 'reviewer3', 0.25),
+        ('paper3', 'reviewer1', 1),
+        ('paper3', 'reviewer2', 0.2),
+        ('paper3', 'reviewer3', 0.5)]
+
+    test_matcher = Matcher(
+        {
+            'reviewers': reviewers,
+            'papers': papers,
+            'scores_by_type': {'affinity': {'edges': scores}},
+            'weight_by_type': {'affinity': 1},
+            'minimums': [1, 1, 1],
+            'maximums': [1, 1, 1],
+            'demands': [1, 1, 1],
+            'num_alternates': 1
+        },
+        solver_class = 'MinMax',
+        polish = 'min'
+    )
+
+    test_matcher.run()
+
+    assert test_matcher.get_status() == 'Complete'
+    assert None == nptest.assert_array_equal(test_matcher.solution, [[1.0, 0.0, 0.0], [0.0, 0.0, 1.0], [0.0, 1.0, 0.0]])
+
+def test_matcher_phase_instrumentation():
+    '''Each phase of a run is timed, and reported to the callback and the datasource'''
+    reviewers = ['reviewer1', 'reviewer2', 'reviewer3']
+    papers = ['paper1', 'paper2', 'paper3']
+
+    scores = [
+        (paper, reviewer, random.random()) \
+        for paper, reviewer in itertools.product(papers, reviewers)
+    ]
+
+    ended = []
+    stats = []
+    test_matcher = Matcher(
+        {
+            'reviewers': reviewers,
+            'papers': papers,
+            'scores_by_type': {'affinity': {'edges': scores}},
+            'weight_by_type': {'affinity': 1},
+            'minimums': [1, 1, 1],
+            'maximums': [2, 2, 2],
+            'demands': [1, 2, 1],
+            'num_alternates': 1
+        },
+        solver_class = 'FairFlow',
+        on_phase = lambda name, record: ended.append(name)
+    )
+    test_matcher.datasource.set_stats = stats.append
+
+    test_matcher.run()
+
+    assert test_matcher.get_status() == 'Complete'
+    phases = test_matcher.instrumentation.as_dict()
+    assert ended == list(phases) == [
+        'load', 'encode', 'feasibility', 'build_solver', 'solve',
+        'decode_assignments', 'write_assignments', 'decode_alternates', 'write_alternates']
+    assert stats == [phases]
+    for record in phases.values():
+        assert record['wall_time'] >= 0 and record['cpu_time'] >= 0
+        assert 'peak_rss' in record
+    assert phases['load']['papers'] == 3
+    assert phases['solve']['networks'] > 0
+    assert phases['solve']['arcs'] > 0
+
+def test_matcher_minmax_solve_phases():
+    '''MinMax records building the network, the min-cost flow and extracting the flows as phases'''
+    reviewers = ['reviewer1', 'reviewer2', 'reviewer3']
+    papers = ['paper1', 'paper2', 'paper3']
+
+    scores = [
+        (paper, reviewer, random.random()) \
+        for paper, reviewer in itertools.product(papers, reviewers)
+    ]
+
+    test_matcher = Matcher(
+        {
+            'reviewers': reviewers,
+            'papers': papers,
+            'scores_by_type': {'affinity': {'edges': scores}},
+            'weight_by_type': {'affinity': 1},
+            'minimums': [1, 1, 1],
+            'maximums': [2, 2, 2],
+            'demands': [1, 2, 1],
+            'num_alternates': 1
+        },
+        solver_class = 'MinMax'
+    )
+
+    test_matcher.run()
+
+    assert test_matcher.get_status() == 'Complete'
+    phases = test_matcher.instrumentation.as_dict()
+    assert list(phases)[4:8] == ['solve', 'build_network', 'min_cost_flow', 'extract_flow']
+    assert phases['solve']['wall_time'] >= sum(
+        phases[name]['wall_time'] for name in ['build_network', 'min_cost_flow', 'extract_flow'])
+
+def test_matcher_result_cache(tmp_path):
+    '''A run with the same inputs as an earlier run is served from the cache'''
+    reviewers = ['reviewer1', 'reviewer2', 'reviewer3']
+    papers = ['paper1', 'paper2', 'paper3']
+
+    scores = [
+        (paper, reviewer, random.random()) \
+        for paper, reviewer in itertools.product(papers, reviewers)
+    ]
+
+    def run(demands, output):
+        test_matcher = Matcher(
+            {
+                'reviewers': reviewers,
+                'papers': papers,
+                'scores_by_type': {'affinity': {'edges': scores}},
+                'weight_by_type': {'affinity': 1},
+                'minimums': [1, 1, 1],
+                'maximums': [2, 2, 2],
+                'demands': demands,
+                'num_alternates': 1,
+                'assignments_output': str(tmp_path / output),
+                'alternates_output': str(tmp_path / 'alternates.json')
+            },
+            solver_class = 'MinMax',
+            cache = str(tmp_path / 'cache')
+        )
+        test_matcher.run()
+        assert test_matcher.get_status() == 'Complete'
+        return test_matcher
+
+    first = run([1, 2, 1], 'first.json')
+    assert first.instrumentation.phases['cache_lookup']['hit'] is False
+    assert 'solve' in first.instrumentation.phases
+
+    second = run([1, 2, 1], 'second.json')
+    assert second.instrumentation.phases['cache_lookup']['hit'] is True
+    assert 'solve' not in second.instrumentation.phases
+    assert second.assignments == json.loads((tmp_path / 'first.json').read_text())
+    assert (tmp_path / 'first.json').read_text() == (tmp_path / 'second.json').read_text()
+    nptest.assert_array_equal(second.solution, first.solution)
+
+    changed = run([2, 1, 1], 'changed.json')
+    assert changed.instrumentation.phases['cache_lookup']['hit'] is False
+
+def test_matcher_cancellation():
+    '''A cancelled run, or a run past its deadline, stops with the Cancelled status'''
+    reviewers = ['reviewer1', 'reviewer2', 'reviewer3']
+    papers = ['paper1', 'paper2', 'paper3']
+
+    scores = [
+        (paper, reviewer, random.random()) \
+        for paper, reviewer in itertools.product(papers, reviewers)
+    ]
+
+    def matcher(on_phase=None):
+        return Matcher(
+            {
+                'reviewers': reviewers,
+                'papers': papers,
+                'scores_by_type': {'affinity': {'edges': scores}},
+                'weight_by_type': {'affinity': 1},
+                'minimums': [1, 1, 1],
+                'maximums': [2, 2, 2],
+                'demands': [1, 2, 1],
+                'num_alternates': 1
+            },
+            solver_class = 'FairFlow',
+            on_phase = on_phase
+        )
+
+    cancellation = CancellationToken()
+    test_matcher = matcher(
+        on_phase = lambda name, record: cancellation.cancel() if name == 'encode' else None)
+    test_matcher.run(cancellation=cancellation)
+    assert test_matcher.get_status() == 'Cancelled'
+    assert list(test_matcher.instrumentation.phases) == ['load', 'encode']
+    assert test_matcher.solution is None
+
+    test_matcher = matcher()
+    test_matcher.run(deadline=time.time() - 1)
+    assert test_matcher.get_status() == 'Cancelled'
+    assert test_matcher.assignments is None
+
+    test_matcher = matcher()
+    test_matcher.run(deadline=time.time() + 60)
+    assert test_matcher.get_status() == 'Complete'
+
+def test_matcher_checkpoint_dir(tmp_path):
+    '''Solvers that support checkpoints save them in the checkpoint directory'''
+    reviewers = ['reviewer1', 'reviewer2', 'reviewer3']
+    papers = ['paper1', 'paper2', 'paper3']
+
+    scores = [
+        (paper, reviewer, random.random()) \
+        for paper, reviewer in itertools.product(papers, reviewers)
+    ]
+
+    test_matcher = Matcher(
+        {
+            'reviewers': reviewers,
+            'papers': papers,
+            'scores_by_type': {'affinity': {'edges': scores}},
+            'weight_by_type': {'affinity': 1},
+            'minimums': [1, 1, 1],
+            'maximums': [2, 2, 2],
+            'demands': [1, 2, 1],
+            'num_alternates': 1
+        },
+        solver_class = 'FairFlow',
+        solver_options = {'checkpoint_interval': 0},
+        checkpoint_dir = str(tmp_path)
+    )
+    test_matcher.run()
+
+    assert test_matcher.get_status() == 'Complete'
+    assert 'fingerprint' in test_matcher.instrumentation.phases
+    # the checkpoint of a completed run is removed.
+    assert os.listdir(str(tmp_path)) == []
+
+def test_matcher_checkpoint_dir_multi_start(tmp_path):
+    '''Each start of a multi-start FairFlow run saves its own checkpoint'''
+    reviewers = ['reviewer{}'.format(index) for index in range(6)]
+    papers = ['paper{}'.format(index) for index in range(10)]
+
+    scores = [
+        (paper, reviewer, random.random()) \
+        for paper, reviewer in itertools.product(papers, reviewers)
+    ]
+
+    test_matcher = Matcher(
+        {
+            'reviewers': reviewers,
+            'papers': papers,
+            'scores_by_type': {'affinity': {'edges': scores}},
+            'weight_by_type': {'affinity': 1},
+            'minimums': [1] * 6,
+            'maximums': [4] * 6,
+            'demands': [2] * 10,
+            'num_alternates': 1
+        },
+        solver_class = 'FairFlow',
+        solver_options = {'starts': 3, 'checkpoint_interval': 0},
+        checkpoint_dir = str(tmp_path)
+    )
+    test_matcher.run()
+
+    assert test_matcher.get_status() == 'Complete'
+    assert os.listdir(str(tmp_path)) == []
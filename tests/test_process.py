@@ -0,0 +1,76 @@
+import itertools
+import json
+import os
+from matcher.core import KeywordDatasource
+from matcher.process import MatcherProcess
+
+def keyword_datasource(output_directory, logger):
+    '''Build the datasource in the worker process'''
+    reviewers = ['reviewer1', 'reviewer2', 'reviewer3']
+    papers = ['paper1', 'paper2', 'paper3']
+    scores = [
+        (paper, reviewer, (index % 4) / 4) \
+        for index, (paper, reviewer) in enumerate(itertools.product(papers, reviewers))
+    ]
+    return KeywordDatasource(
+        reviewers=reviewers,
+        papers=papers,
+        scores_by_type={'affinity': {'edges': scores}},
+        weight_by_type={'affinity': 1},
+        minimums=[1, 1, 1],
+        maximums=[2, 2, 2],
+        demands=[1, 2, 1],
+        num_alternates=1,
+        assignments_output=os.path.join(output_directory, 'assignments.json'),
+        alternates_output=os.path.join(output_directory, 'alternates.json'),
+        logger=logger
+    )
+
+def crashing_datasource(logger):
+    os._exit(3)
+
+def test_matcher_process(tmp_path):
+    '''The run happens in a worker process, which streams its status and phases back'''
+    messages = []
+    exits = []
+    match_process = MatcherProcess(
+        keyword_datasource,
+        (str(tmp_path),),
+        matcher_options={'solver_class': 'FairFlow'},
+        on_message=messages.append,
+        on_exit=exits.append
+    )
+    match_process.start()
+    match_process.join()
+
+    assert match_process.exitcode == 0
+    assert match_process.status == 'Complete'
+    assert [message[1] for message in messages if message[0] == 'status'] == ['Running', 'Complete']
+    assert 'solve' in [message[1] for message in messages if message[0] == 'phase']
+    assert exits == []
+    assignments = json.loads((tmp_path / 'assignments.json').read_text())
+    assert sorted(assignments) == ['paper1', 'paper2', 'paper3']
+
+def test_matcher_process_cancel(tmp_path):
+    '''Cancelling the process cancels the run'''
+    match_process = MatcherProcess(
+        keyword_datasource,
+        (str(tmp_path),),
+        matcher_options={'solver_class': 'FairFlow'}
+    )
+    match_process.cancel()
+    match_process.start()
+    match_process.join()
+
+    assert match_process.status == 'Cancelled'
+    assert not (tmp_path / 'assignments.json').exists()
+
+def test_matcher_process_exit():
+    '''A worker that exits without a final status is reported'''
+    exits = []
+    match_process = MatcherProcess(crashing_datasource, (), on_exit=exits.append)
+    match_process.start()
+    match_process.join()
+
+    assert match_process.status is None
+    assert exits == [3]
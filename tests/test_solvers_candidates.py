@@ -0,0 +1,126 @@
+'''
+Unit test suite for `matcher/solvers/candidates.py`
+'''
+from collections import namedtuple
+import pytest
+import numpy as np
+from matcher.solvers import MinMaxSolver, FairFlow
+from matcher.solvers.candidates import candidate_mask, select_candidates
+
+minmax_encoder = namedtuple('Encoder', ['cost_matrix', 'constraint_matrix'])
+fairflow_encoder = namedtuple('Encoder', ['aggregate_score_matrix', 'constraint_matrix'])
+
+def test_candidate_mask_top_k():
+    '''Keeps the top-k eligible reviewers of each paper and top-k papers of each reviewer.'''
+    scores = np.array([
+        [0.9, 0.8, 0.1, 0.0],
+        [0.1, 0.2, 0.3, 0.4],
+        [0.5, 0.1, 0.0, 0.2]
+    ])
+    eligible = np.ones(scores.shape, dtype=bool)
+    eligible[0, 0] = False
+
+    mask = candidate_mask(
+        scores, eligible, np.full(3, 1), np.zeros(4, dtype=int))
+    assert mask.tolist() == [
+        [False, True, False, False],
+        [False, False, False, True],
+        [True, False, False, False]
+    ]
+
+    mask = candidate_mask(
+        scores, eligible, np.zeros(3, dtype=int), np.full(4, 1))
+    assert mask.tolist() == [
+        [False, True, False, False],
+        [False, False, True, True],
+        [True, False, False, False]
+    ]
+
+    mask = candidate_mask(
+        scores, eligible, np.zeros(3, dtype=int), np.zeros(4, dtype=int), threshold=0.3)
+    assert np.array_equal(mask, eligible & (scores >= 0.3))
+
+def test_select_candidates_widens_infeasible():
+    '''
+    Papers 1 and 2 only keep reviewer 0 (who can review one paper) with k = 1,
+    and reviewers 1 and 2 only keep paper 0. The pruned problem is infeasible,
+    so k must be widened.
+    '''
+    scores = np.array([
+        [0.9, 0.9, 0.9],
+        [0.8, 0.1, 0.2],
+        [0.8, 0.2, 0.1]
+    ])
+    constraint_matrix = np.zeros(scores.shape)
+
+    pruned = candidate_mask(
+        scores, np.ones(scores.shape, dtype=bool), np.full(3, 1), np.full(3, 1))
+    assert pruned[1].tolist() == [True, False, False]
+    assert pruned[2].tolist() == [True, False, False]
+
+    candidates = select_candidates(
+        scores, constraint_matrix, [0,0,0], [1,1,1], [1,1,1], 1)
+    assert np.sum(candidates) > np.sum(pruned)
+    assert np.sum(candidates[1:, 1:]) > 0
+
+    solver = MinMaxSolver(
+        [0,0,0],
+        [1,1,1],
+        [1,1,1],
+        minmax_encoder(-100 * scores, constraint_matrix),
+        top_k=1
+    )
+    res = solver.solve()
+    assert solver.solved
+    assert np.all(np.sum(res, axis=1) == 1)
+
+def test_minmax_pruned_objective_gap():
+    '''
+    Compares pruned solves against the full solve on random instances,
+    to bound the objective gap introduced by pruning.
+    '''
+    random_state = np.random.RandomState(0)
+    num_papers, num_reviewers = 40, 30
+    demands = [3] * num_papers
+    minimums = [1] * num_reviewers
+    maximums = [5] * num_reviewers
+
+    cost_matrix = np.round(-100 * random_state.rand(num_papers, num_reviewers))
+    constraint_matrix = np.where(random_state.rand(num_papers, num_reviewers) < 0.1, -1, 0)
+
+    full_solver = MinMaxSolver(
+        minimums, maximums, demands, minmax_encoder(cost_matrix, constraint_matrix))
+    full_solver.solve()
+    assert full_solver.solved
+
+    for top_k in [5, 10, 20]:
+        pruned_solver = MinMaxSolver(
+            minimums, maximums, demands, minmax_encoder(cost_matrix, constraint_matrix), top_k=top_k)
+        res = pruned_solver.solve()
+        assert pruned_solver.solved
+        assert np.all(np.sum(res, axis=1) == demands)
+        assert not np.any(res[constraint_matrix == -1])
+
+        gap = (pruned_solver.cost - full_solver.cost) / abs(full_solver.cost)
+        assert 0 <= gap < 0.01
+
+def test_fairflow_pruned():
+    random_state = np.random.RandomState(1)
+    num_papers, num_reviewers = 20, 15
+    demands = [2] * num_papers
+
+    aggregate_score_matrix = random_state.rand(num_papers, num_reviewers)
+    constraint_matrix = np.where(random_state.rand(num_papers, num_reviewers) < 0.1, -1, 0)
+
+    solver = FairFlow(
+        [1] * num_reviewers,
+        [4] * num_reviewers,
+        demands,
+        fairflow_encoder(aggregate_score_matrix, constraint_matrix),
+        top_k=5
+    )
+    res = solver.solve()
+    assert solver.solved
+    assert np.all(np.sum(res, axis=1) == demands)
+    assert np.all(np.sum(res, axis=0) >= 1)
+    assert not np.any(res[constraint_matrix == -1])
@@ -1,8 +1,12 @@
 # TODO: This is a leftover module from the days of David. Clean this up / make it readable!
 from collections import namedtuple
+import os
+import time
 import pytest
 import numpy as np
-from matcher.solvers import SolverException, FairFlow
+from matcher.solvers import SolverException, FairFlow, CancellationToken, CancelledException
+from matcher.solvers import fairflow
+from matcher.solvers.tie_breaking import tie_breaking_scores
 from conftest import assert_arrays
 
 encoder = namedtuple('Encoder', ['aggregate_score_matrix', 'constraint_matrix'])
@@ -446,3 +450,438 @@ def test_solver_respects_two_minimum():
             if res[rix,pix] != 0:
                 reviewer_count_reviews += 1
         assert reviewer_count_reviews >= 1
+
+def test_solvers_fairflow_seeded_tie_breaking():
+    '''When affinities are all zero and a seed is given, assignments are reproducible'''
+    aggregate_score_matrix = np.zeros((6, 5))
+    constraint_matrix = np.zeros(np.shape(aggregate_score_matrix))
+    demands = [2,2,2,2,2,2]
+
+    def solve(seed):
+        solver = FairFlow(
+            [1,1,1,1,1],
+            [3,3,3,3,3],
+            demands,
+            encoder(aggregate_score_matrix, constraint_matrix),
+            tie_break_seed=seed
+        )
+        res = solver.solve()
+        assert_arrays(np.sum(res, axis=1), demands)
+        return solver.affinity_matrix, np.asarray(res)
+
+    affinities_A, res_A = solve(7)
+    affinities_B, res_B = solve(7)
+    assert np.array_equal(affinities_A, affinities_B)
+    assert np.array_equal(res_A, res_B)
+    assert 0 < np.min(affinities_A) and np.max(affinities_A) < 1
+    # the perturbation of each pair only depends on its (paper, reviewer) indices
+    assert affinities_A[3, 4] == tie_breaking_scores([4], [3], 7)[0]
+
+    affinities_C, _ = solve(8)
+    assert not np.array_equal(affinities_A, affinities_C)
+
+def test_solvers_fairflow_parallel_makespan_search():
+    '''The parallel k-ary search finds a makespan that the final solution achieves'''
+    rng = np.random.RandomState(3)
+    aggregate_score_matrix = rng.rand(12, 8)
+    constraint_matrix = np.where(rng.rand(12, 8) < 0.1, -1, 0)
+    demands = [2] * 12
+    maximums = [4] * 8
+
+    solver = FairFlow(
+        [1] * 8,
+        maximums,
+        demands,
+        encoder(aggregate_score_matrix, constraint_matrix),
+        workers=3
+    )
+    res = solver.solve()
+
+    assert solver.makespan > 0
+    assert_arrays(np.sum(res, axis=1), demands)
+    assert np.all(np.sum(res, axis=0) <= maximums)
+    assert not np.any((constraint_matrix == -1) & (np.asarray(res) > 0))
+    paper_scores = np.sum(np.asarray(res) * aggregate_score_matrix, axis=1)
+    assert np.min(paper_scores) >= solver.makespan - solver.max_affinities
+
+def test_solvers_fairflow_incremental_scores():
+    '''Paper scores and loads kept up to date during the search match the final solution'''
+    rng = np.random.RandomState(5)
+    aggregate_score_matrix = rng.rand(10, 6) - 0.25
+    constraint_matrix = np.zeros(np.shape(aggregate_score_matrix))
+
+    solver = FairFlow(
+        [1] * 6,
+        [5] * 6,
+        [2] * 10,
+        encoder(aggregate_score_matrix, constraint_matrix)
+    )
+    res = np.asarray(solver.solve())
+
+    assert np.allclose(solver.paper_scores, np.sum(solver.solution * solver.affinity_matrix, axis=0))
+    assert_arrays(solver.paper_loads, np.sum(res, axis=1))
+    assert_arrays(solver.reviewer_loads, np.sum(res, axis=0))
+    assert np.isclose(solver.objective_val(), np.sum(res * aggregate_score_matrix))
+
+def test_solvers_fairflow_makespan_search_bounds_and_stopping():
+    '''The makespan search starts below the loose bound and stops early when asked to'''
+    aggregate_score_matrix = np.transpose(np.array([
+        [0.2, 0.1, 0.4],
+        [0.5, 0.2, 0.3],
+        [0.2, 0.0, 0.6],
+        [0.7, 0.9, 0.3]
+    ]))
+    constraint_matrix = np.zeros(np.shape(aggregate_score_matrix))
+    constraint_matrix[1, 3] = -1
+
+    def make_solver(**kwargs):
+        return FairFlow(
+            [1,1,1,1],
+            [2,2,2,2],
+            [1,1,2],
+            encoder(aggregate_score_matrix, constraint_matrix),
+            **kwargs
+        )
+
+    # paper 1 can at best get 0.2 (reviewer 3 is in conflict), plus the max affinity.
+    solver = make_solver()
+    assert np.isclose(solver._makespan_upper_bound(), 0.2 + 0.9)
+    solver.solve()
+    assert len(solver.iteration_stats) == 10
+    assert all(stats['upper'] <= 0.2 + 0.9 for stats in solver.iteration_stats)
+
+    solver = make_solver(ms_tolerance=0.5)
+    res = solver.solve()
+    assert 0 < len(solver.iteration_stats) < 10
+    assert_arrays(np.sum(res, axis=1), [1,1,2])
+
+    solver = make_solver(ms_stall_iterations=1, ms_iterations=20)
+    solver.solve()
+    assert len(solver.iteration_stats) < 20
+
+def test_solvers_fairflow_time_budget():
+    '''When the time budget expires, the best valid solution found so far is returned'''
+    rng = np.random.RandomState(11)
+    aggregate_score_matrix = rng.rand(10, 6)
+    constraint_matrix = np.zeros(np.shape(aggregate_score_matrix))
+    demands = [2] * 10
+
+    solver = FairFlow(
+        [1] * 6,
+        [4] * 6,
+        demands,
+        encoder(aggregate_score_matrix, constraint_matrix),
+        time_budget=0
+    )
+    assert solver.best_assignment() is None
+    res = solver.solve()
+
+    # the search stopped after its first step.
+    assert len(solver.iteration_stats) == 1
+    assert_arrays(np.sum(res, axis=1), demands)
+    assert np.all(np.sum(res, axis=0) <= 4)
+    assert np.array_equal(np.asarray(solver.best_assignment()), np.asarray(res))
+
+def test_solvers_fairflow_snapshot_pairs():
+    '''Snapshots read the pairs from the reviewer sets, in the order of the dense solution'''
+    rng = np.random.RandomState(12)
+    aggregate_score_matrix = rng.rand(10, 6)
+    constraint_matrix = np.zeros(np.shape(aggregate_score_matrix))
+
+    solver = FairFlow([1] * 6, [4] * 6, [2] * 10, encoder(aggregate_score_matrix, constraint_matrix))
+    solver.solve()
+
+    solver._snapshot = None
+    solver._take_snapshot()
+    revs, paps = solver._snapshot[3]
+    expected_revs, expected_paps = np.nonzero(solver.solution)
+    assert np.array_equal(revs, expected_revs)
+    assert np.array_equal(paps, expected_paps)
+
+def test_solvers_fairflow_worst_reviewer():
+    '''The worst reviewer of a paper is its lowest affinity assigned reviewer'''
+    aggregate_score_matrix = np.transpose(np.array([
+        [0.2, 0.1, 0.4],
+        [0.5, 0.2, 0.3],
+        [0.2, 0.0, 0.6],
+        [0.7, 0.9, 0.3]
+    ]))
+    constraint_matrix = np.zeros(np.shape(aggregate_score_matrix))
+    solver = FairFlow(
+        [1,1,1,1],
+        [2,2,2,2],
+        [2,1,1],
+        encoder(aggregate_score_matrix, constraint_matrix)
+    )
+    solver._assign([0, 2, 3, 1], [0, 0, 1, 2])
+    assert solver.paper_reviewers == [{0, 2}, {3}, {1}]
+
+    # reviewers 0 and 2 tie on paper 0.
+    revs, paps = solver._worst_reviewer(np.array([0, 1, 2]))
+    assert revs.tolist() == [0, 3, 1]
+    assert paps.tolist() == [0, 1, 2]
+    revs, paps = solver._worst_reviewer(np.array([2]))
+    assert revs.tolist() == [1] and paps.tolist() == [2]
+
+    solver._unassign([0], [0])
+    assert solver.paper_reviewers[0] == {2}
+
+def test_solvers_fairflow_debug_verification():
+    '''Full invariant checks only run in debug mode'''
+    aggregate_score_matrix = np.transpose(np.array([
+        [0.2, 0.1, 0.4],
+        [0.5, 0.2, 0.3],
+        [0.2, 0.0, 0.6],
+        [0.7, 0.9, 0.3]
+    ]))
+    constraint_matrix = np.zeros(np.shape(aggregate_score_matrix))
+    solver = FairFlow(
+        [1,1,1,1],
+        [2,2,2,2],
+        [2,1,1],
+        encoder(aggregate_score_matrix, constraint_matrix),
+        debug=False
+    )
+    solver.solve()
+    solver.paper_scores[0] += 1.0
+    solver._verify()
+
+    solver.debug = True
+    with pytest.raises(AssertionError):
+        solver._verify()
+
+def test_solvers_fairflow_multi_start():
+    '''Multi-start mode keeps the start with the best worst paper score'''
+    aggregate_score_matrix = np.array([
+        [1, 1, 1, 1, 0],
+        [1, 1, 1, 1, 0],
+        [1, 1, 1, 1, 0],
+        [0, 0, 1, 1, 1],
+        [1, 1, 0, 0, 1],
+        [1, 1, 1, 1, 1]
+    ], dtype=float)
+    constraint_matrix = np.zeros(np.shape(aggregate_score_matrix))
+    demands = [2,2,2,2,2,2]
+
+    def solve(**kwargs):
+        solver = FairFlow(
+            [1,1,1,1,1],
+            [3,3,3,3,3],
+            demands,
+            encoder(aggregate_score_matrix, constraint_matrix),
+            **kwargs
+        )
+        return solver, np.asarray(solver.solve())
+
+    single, res_single = solve()
+    solver, res = solve(starts=3, tie_break_seed=5)
+
+    assert solver.solved
+    assert [stats['seed'] for stats in solver.start_stats] == [None, 6, 7]
+    assert_arrays(np.sum(res, axis=1), demands)
+    assert np.all(np.sum(res, axis=0) <= 3)
+    worst_score = np.min(np.sum(res * aggregate_score_matrix, axis=1))
+    assert np.isclose(worst_score, max(stats['worst_paper_score'] for stats in solver.start_stats))
+    assert worst_score >= np.min(np.sum(res_single * aggregate_score_matrix, axis=1))
+
+    # the starts are reproducible.
+    _, res_again = solve(starts=3, tie_break_seed=5)
+    assert np.array_equal(res, res_again)
+    # the objective is computed on the unperturbed scores, like a single start's.
+    assert np.isclose(solver.objective_val(), np.sum(res * aggregate_score_matrix))
+    assert np.isclose(single.objective_val(), np.sum(res_single * aggregate_score_matrix))
+
+def test_solvers_fairflow_multi_start_all_zero_objective():
+    '''When the scores are all zero, the objective of a multi-start solution is zero'''
+    aggregate_score_matrix = np.zeros((6, 5))
+    constraint_matrix = np.zeros(np.shape(aggregate_score_matrix))
+    solver = FairFlow(
+        [1] * 5,
+        [3] * 5,
+        [2] * 6,
+        encoder(aggregate_score_matrix, constraint_matrix),
+        starts=2
+    )
+    solver.solve()
+    assert solver.objective_val() == 0
+
+def test_solvers_fairflow_multi_start_time_budget():
+    '''Each start stops at the deadline of the multi-start run instead of restarting the budget'''
+    rng = np.random.RandomState(11)
+    aggregate_score_matrix = rng.rand(10, 6)
+    constraint_matrix = np.zeros(np.shape(aggregate_score_matrix))
+    solver = FairFlow(
+        [1] * 6,
+        [4] * 6,
+        [2] * 10,
+        encoder(aggregate_score_matrix, constraint_matrix),
+        time_budget=3600
+    )
+
+    # a start that begins after the deadline of the run stops after its first step.
+    fairflow._solve_start(solver, None, None, time.time() - 1)
+    assert len(solver.iteration_stats) == 1
+
+def test_solvers_fairflow_validifier_repairs_only_deficient_papers():
+    '''The validifier only assigns reviewers with spare capacity to papers missing reviewers'''
+    rng = np.random.RandomState(2)
+    aggregate_score_matrix = rng.rand(12, 6)
+    constraint_matrix = np.zeros(np.shape(aggregate_score_matrix))
+    solver = FairFlow(
+        [1] * 6,
+        [5] * 6,
+        [2] * 12,
+        encoder(aggregate_score_matrix, constraint_matrix)
+    )
+    solver.solve()
+    before = solver.solution.copy()
+
+    revs, paps = solver._assigned_pairs(np.array([3, 7]))
+    solver._unassign(revs, paps)
+    solver._construct_and_solve_validifier_network()
+
+    changed = np.nonzero(np.any(solver.solution != before, axis=0))[0]
+    assert set(changed) <= {3, 7}
+    assert_arrays(solver.paper_loads, [2] * 12)
+    assert np.all(solver.reviewer_loads <= 5)
+
+def test_solvers_fairflow_memory_lean():
+    '''In memory-lean mode, the encoder's scores are read in place and the solution is boolean'''
+    rng = np.random.RandomState(3)
+    aggregate_score_matrix = rng.rand(10, 6) - 0.5
+    original_scores = aggregate_score_matrix.copy()
+    constraint_matrix = np.where(rng.rand(10, 6) < 0.2, -1, 0)
+    demands = [2] * 10
+
+    def solve(**kwargs):
+        solver = FairFlow(
+            [1] * 6,
+            [4] * 6,
+            demands,
+            encoder(aggregate_score_matrix, constraint_matrix),
+            **kwargs
+        )
+        return solver, np.asarray(solver.solve())
+
+    _, res = solve()
+    solver, res_lean = solve(memory_lean=True, starts=2, tie_break_seed=1)
+    _, res_lean_single = solve(memory_lean=True)
+
+    assert np.shares_memory(solver.affinity_matrix, aggregate_score_matrix)
+    assert solver.solution.dtype == bool
+    assert np.array_equal(aggregate_score_matrix, original_scores)
+    assert np.array_equal(res, res_lean_single)
+    assert_arrays(np.sum(res_lean, axis=1), demands)
+    assert np.all(res_lean[constraint_matrix == -1] == 0)
+    assert np.isclose(
+        np.sum(solver.solution * aggregate_score_matrix.transpose()), solver.objective_val())
+
+def test_solvers_fairflow_cancellation():
+    '''The solver checks its cancellation token between improvement iterations'''
+    rng = np.random.RandomState(4)
+    aggregate_score_matrix = rng.rand(8, 4)
+    constraint_matrix = np.zeros(np.shape(aggregate_score_matrix))
+    cancellation = CancellationToken()
+    solver = FairFlow(
+        [1] * 4,
+        [5] * 4,
+        [2] * 8,
+        encoder(aggregate_score_matrix, constraint_matrix),
+        cancellation=cancellation
+    )
+    cancellation.cancel()
+    with pytest.raises(CancelledException):
+        solver.solve()
+    assert solver.stats['iterations'] == 0
+
+    solver = FairFlow(
+        [1] * 4,
+        [5] * 4,
+        [2] * 8,
+        encoder(aggregate_score_matrix, constraint_matrix),
+        cancellation=CancellationToken(deadline=time.time() - 1)
+    )
+    with pytest.raises(CancelledException, match='deadline'):
+        solver.solve()
+
+class CountdownToken(CancellationToken):
+    '''Cancels the run at its check after `checks` checks in the process that created it'''
+    def __init__(self, checks=None, deadline=None, event=None):
+        super().__init__(deadline, event)
+        self.checks = checks
+        # copies in worker processes don't count down.
+        self.pid = os.getpid()
+
+    def check(self):
+        if self.checks is not None and os.getpid() == self.pid:
+            self.checks -= 1
+            if self.checks < 0:
+                self.cancel()
+        super().check()
+
+@pytest.mark.parametrize('options', [{'starts': 3}, {'workers': 2}])
+def test_solvers_fairflow_parallel_cancellation(options):
+    '''Cancelling the token while worker processes run stops the parallel modes'''
+    rng = np.random.RandomState(4)
+    aggregate_score_matrix = rng.rand(40, 12)
+    constraint_matrix = np.zeros(np.shape(aggregate_score_matrix))
+    solver = FairFlow(
+        [1] * 12,
+        [10] * 12,
+        [2] * 40,
+        encoder(aggregate_score_matrix, constraint_matrix),
+        # the parent checks the token before the first round of the parallel search.
+        cancellation=CountdownToken(1 if 'workers' in options else 0),
+        **options
+    )
+    with pytest.raises(CancelledException):
+        solver.solve()
+    assert solver.start_stats == []
+    assert solver.iteration_stats == []
+
+def test_solvers_fairflow_checkpoint(tmp_path):
+    '''An interrupted solve resumes the makespan search from its checkpoint'''
+    rng = np.random.RandomState(5)
+    aggregate_score_matrix = rng.rand(20, 8)
+    constraint_matrix = np.zeros(np.shape(aggregate_score_matrix))
+    demands = [2] * 20
+    checkpoint = str(tmp_path / 'fairflow.npz')
+
+    class InterruptingToken(CancellationToken):
+        '''Cancels the run after a number of improvement iterations'''
+        def __init__(self, iterations):
+            super().__init__()
+            self.iterations = iterations
+
+        def check(self):
+            self.iterations -= 1
+            if self.iterations < 0:
+                self.cancel()
+            super().check()
+
+    def solver(**kwargs):
+        return FairFlow(
+            [1] * 8,
+            [6] * 8,
+            demands,
+            encoder(aggregate_score_matrix, constraint_matrix),
+            checkpoint=checkpoint,
+            checkpoint_interval=0,
+            **kwargs
+        )
+
+    interrupted = solver(cancellation=InterruptingToken(4))
+    with pytest.raises(CancelledException):
+        interrupted.solve()
+    saved_steps = len(interrupted.iteration_stats)
+    assert saved_steps > 0
+
+    resumed = solver()
+    res = np.asarray(resumed.solve())
+    assert [stats['makespan'] for stats in resumed.iteration_stats[:saved_steps]] == \
+        [stats['makespan'] for stats in interrupted.iteration_stats]
+    assert len(resumed.iteration_stats) == 10
+    assert_arrays(np.sum(res, axis=1), demands)
+    assert np.all(np.sum(res, axis=0) <= 6)
+    # a completed solve removes its checkpoint.
+    assert not (tmp_path / 'fairflow.npz').exists()
@@ -0,0 +1,103 @@
+'''
+Unit test suite for `matcher/solvers/feasibility.py`
+'''
+import pytest
+import numpy as np
+from matcher.solvers import SolverException, InfeasibilityException, check_feasibility
+
+def test_feasibility_feasible():
+    '''A problem with enough eligible reviewers for every paper passes the check.'''
+    constraint_matrix = np.transpose(np.array([
+        [0, 0, 0],
+        [0, -1, 0],
+        [-1, 0, 0],
+        [0, 0, 1]
+    ]))
+
+    check_feasibility([1,1,1,1], [2,2,2,2], [1,1,2], constraint_matrix)
+
+def test_feasibility_total_supply():
+    '''The total demand must fall between the total minimum and maximum loads.'''
+    constraint_matrix = np.zeros((3, 4))
+
+    with pytest.raises(InfeasibilityException):
+        check_feasibility([0,0,0,0], [1,1,1,1], [2,2,2], constraint_matrix)
+
+    with pytest.raises(InfeasibilityException):
+        check_feasibility([2,2,2,2], [3,3,3,3], [1,1,1], constraint_matrix)
+
+def test_feasibility_conflicted_paper():
+    '''A paper conflicted with too many reviewers is reported by index.'''
+    constraint_matrix = np.transpose(np.array([
+        [0, -1, 0],
+        [0, -1, 0],
+        [0, 0, 0],
+        [0, -1, 0]
+    ]))
+
+    with pytest.raises(InfeasibilityException) as error_info:
+        check_feasibility([0,0,0,0], [2,2,2,2], [2,2,2], constraint_matrix)
+
+    assert error_info.value.papers == [1]
+    assert error_info.value.reviewers == []
+
+    # the exception is a SolverException, so existing error handling still applies
+    assert isinstance(error_info.value, SolverException)
+
+def test_feasibility_reviewer_minimum():
+    '''A reviewer conflicted with too many papers to reach its minimum is reported.'''
+    constraint_matrix = np.transpose(np.array([
+        [0, 0, 0],
+        [0, 0, 0],
+        [-1, -1, 0],
+        [0, 0, 0]
+    ]))
+
+    with pytest.raises(InfeasibilityException) as error_info:
+        check_feasibility([0,0,2,0], [2,2,2,2], [1,1,2], constraint_matrix)
+
+    assert error_info.value.reviewers == [2]
+
+def test_feasibility_max_flow():
+    '''
+    3 papers, 3 reviewers, 1 review each. Papers 0 and 1 can only be reviewed by reviewer 0.
+    Each paper has an eligible reviewer, so only the max-flow can detect that one of them
+    will not be reviewed.
+    '''
+    constraint_matrix = np.array([
+        [0, -1, -1],
+        [0, -1, -1],
+        [0, 0, 0]
+    ])
+
+    with pytest.raises(InfeasibilityException) as error_info:
+        check_feasibility([0,0,0], [1,1,1], [1,1,1], constraint_matrix)
+
+    assert len(error_info.value.papers) == 1
+    assert error_info.value.papers[0] in [0, 1]
+
+def test_feasibility_max_flow_minimums():
+    '''
+    Both reviewers 1 and 2 need one paper, but paper 1 is the only paper they can review.
+    '''
+    constraint_matrix = np.array([
+        [0, -1, -1],
+        [0, 0, 0],
+        [0, -1, -1]
+    ])
+
+    with pytest.raises(InfeasibilityException) as error_info:
+        check_feasibility([0,1,1], [3,1,1], [1,1,1], constraint_matrix)
+
+    assert len(error_info.value.reviewers) == 1
+    assert error_info.value.reviewers[0] in [1, 2]
+
+def test_feasibility_count_checks_only():
+    '''Without the max-flow, only the count checks run, and they pass on the max-flow example.'''
+    constraint_matrix = np.array([
+        [0, -1, -1],
+        [0, -1, -1],
+        [0, 0, 0]
+    ])
+
+    check_feasibility([0,0,0], [1,1,1], [1,1,1], constraint_matrix, check_flow=False)
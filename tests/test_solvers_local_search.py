@@ -0,0 +1,84 @@
+'''
+Unit test suite for `matcher/solvers/local_search.py`
+'''
+import numpy as np
+import pytest
+from matcher.assignment import Assignment
+from matcher.solvers import polish
+from conftest import assert_arrays
+
+def test_polish_swap_raises_min_score():
+    '''With full loads, a swap raises the lowest paper score'''
+    scores = np.array([
+        [1, 0, 0.25],
+        [1, 0, 0.25],
+        [1, 0.2, 0.5]
+    ])
+    constraint_matrix = np.zeros(np.shape(scores))
+    assignment = Assignment.from_matrix(np.eye(3))
+
+    polished = polish(assignment, scores, constraint_matrix, [1,1,1], [1,1,1], [1,1,1], objective='min')
+
+    assert np.array_equal(np.asarray(polished), [[1, 0, 0], [0, 0, 1], [0, 1, 0]])
+
+def test_polish_move_respects_loads_and_constraints():
+    '''Moves only go to reviewers with spare capacity, unconflicted pairs and keep forced pairs'''
+    scores = np.array([
+        [0.9, 0.1, 0.8, 0.7],
+        [0.2, 0.1, 0.3, 0.9]
+    ])
+    constraint_matrix = np.array([
+        [0, 1, 0, 0],
+        [0, 0, -1, 0]
+    ])
+    flow_matrix = np.array([
+        [0, 1, 0, 1],
+        [1, 1, 0, 0]
+    ])
+
+    polished = np.asarray(polish(
+        flow_matrix, scores, constraint_matrix, [0,0,0,0], [1,2,1,2], [2,2], objective='total'))
+
+    assert_arrays(np.sum(polished, axis=1), [2, 2])
+    assert np.all(np.sum(polished, axis=0) <= [1,2,1,2])
+    # the forced pair stays, the conflicted pair is never used.
+    assert polished[0, 1] == 1
+    assert polished[1, 2] == 0
+    assert np.sum(polished * scores) > np.sum(flow_matrix * scores)
+    assert np.min(np.sum(polished * scores, axis=1)) >= np.min(np.sum(flow_matrix * scores, axis=1))
+
+def test_polish_random_instance():
+    '''Polishing keeps the solution valid and never lowers the lowest paper score'''
+    rng = np.random.RandomState(4)
+    scores = rng.rand(40, 12) ** 3
+    constraint_matrix = np.where(rng.rand(40, 12) < 0.1, -1, 0)
+    demands = [3] * 40
+    minimums, maximums = [5] * 12, [15] * 12
+
+    # a valid but poor assignment: reviewers in order, skipping conflicts.
+    flow_matrix = np.zeros(np.shape(scores))
+    loads = np.zeros(12, dtype=int)
+    for paper in range(40):
+        for reviewer in np.argsort(loads, kind='stable'):
+            if np.sum(flow_matrix[paper]) < 3 and constraint_matrix[paper, reviewer] == 0:
+                flow_matrix[paper, reviewer] = 1
+                loads[reviewer] += 1
+
+    for objective in ['min', 'total']:
+        polished = np.asarray(polish(
+            flow_matrix, scores, constraint_matrix, minimums, maximums, demands, objective=objective))
+        assert_arrays(np.sum(polished, axis=1), demands)
+        assert np.all(np.sum(polished, axis=0) <= maximums)
+        assert np.all(np.sum(polished, axis=0) >= minimums)
+        assert not np.any((constraint_matrix == -1) & (polished > 0))
+
+        before = np.sum(flow_matrix * scores, axis=1)
+        after = np.sum(polished * scores, axis=1)
+        assert np.min(after) >= np.min(before)
+        if objective == 'min':
+            assert np.min(after) > np.min(before)
+        else:
+            assert np.sum(after) > np.sum(before)
+
+    with pytest.raises(ValueError):
+        polish(flow_matrix, scores, constraint_matrix, minimums, maximums, demands, objective='mean')
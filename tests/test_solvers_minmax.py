@@ -465,3 +465,75 @@ def test_solver_respects_two_minimum():
                 reviewer_count_reviews += 1
         assert reviewer_count_reviews >= 1
 
+
+def test_solver_minimums_globally_optimal():
+    '''
+    2 papers, 2 reviewers. Reviewer 0 must review exactly 1 paper, reviewer 1 up to 2.
+    Reviewer 0's cheapest paper is paper 0, but giving paper 0 to reviewer 1 and
+    paper 1 to reviewer 0 is cheaper overall:
+        reviewer 0 -> paper 0, reviewer 1 -> paper 1: cost -5 + -1 = -6
+        reviewer 0 -> paper 1, reviewer 1 -> paper 0: cost -4 + -10 = -14
+    Purpose: minimums and maximums are solved jointly, not one after the other
+    '''
+    cost_matrix = np.transpose(np.array([
+        [-5, -4],
+        [-10, -1]
+    ]))
+    constraint_matrix = np.zeros(np.shape(cost_matrix))
+    solver = MinMaxSolver(
+        [1,0],
+        [1,2],
+        [1,1],
+        encoder(cost_matrix, constraint_matrix)
+    )
+    res = solver.solve()
+    assert solver.solved
+    assert np.array_equal(np.asarray(res), [[0, 1], [1, 0]])
+    check_solution(solver, -14)
+
+def test_solvers_minmax_seeded_tie_breaking():
+    '''When costs are all zero and a seed is given, assignments are reproducible'''
+    cost_matrix = np.zeros((6, 5))
+    constraint_matrix = np.zeros(np.shape(cost_matrix))
+
+    def solve(seed):
+        solver = MinMaxSolver(
+            [1,1,1,1,1],
+            [3,3,3,3,3],
+            [2,2,2,2,2,2],
+            encoder(cost_matrix, constraint_matrix),
+            tie_break_seed=seed
+        )
+        res = solver.solve()
+        assert solver.solved
+        # no dense random cost matrix is created
+        assert solver.cost_matrix is cost_matrix
+        assert np.all(np.sum(res, axis=1) == 2)
+        return np.asarray(res)
+
+    assert np.array_equal(solve(7), solve(7))
+    assert any(not np.array_equal(solve(7), solve(seed)) for seed in range(8, 12))
+
+def test_solvers_minmax_seeded_tie_breaking_forced_pairs():
+    '''Forced pairs (a constraint of 1) are assigned when tie-breaking perturbs the costs'''
+    random_state = np.random.RandomState(0)
+    num_papers, num_reviewers = 8, 6
+    cost_matrix = np.zeros((num_papers, num_reviewers))
+
+    for seed in range(10):
+        # force one reviewer onto each of the first papers, within the reviewer maximums.
+        constraint_matrix = np.zeros((num_papers, num_reviewers))
+        forced_papers = np.arange(4)
+        forced_reviewers = random_state.choice(num_reviewers, size=4, replace=False)
+        constraint_matrix[forced_papers, forced_reviewers] = 1
+
+        solver = MinMaxSolver(
+            [0] * num_reviewers,
+            [4] * num_reviewers,
+            [2] * num_papers,
+            encoder(cost_matrix, constraint_matrix),
+            tie_break_seed=seed
+        )
+        res = np.asarray(solver.solve())
+        assert solver.solved
+        assert np.all(res[forced_papers, forced_reviewers] == 1)
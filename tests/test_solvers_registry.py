@@ -0,0 +1,54 @@
+import subprocess
+import sys
+import importlib.metadata
+import pytest
+from matcher.solvers import registry, FairFlow, MinMaxSolver
+
+@pytest.fixture
+def solver_map(monkeypatch):
+    '''A copy of the registry that is restored after the test'''
+    solver_map = dict(registry.SOLVER_MAP)
+    monkeypatch.setattr(registry, 'SOLVER_MAP', solver_map)
+    monkeypatch.setattr(registry, '_entry_points_loaded', False)
+    return solver_map
+
+def test_registry_imports_solvers_lazily():
+    '''Importing the matcher and listing the solvers doesn't import any solver module'''
+    code = '; '.join([
+        'import sys',
+        'from matcher import Matcher',
+        'from matcher.core import available_solvers',
+        'assert available_solvers()[:3] == ["MinMax", "FairFlow", "SparseFairFlow"]',
+        'assert "matcher.solvers.fairflow" not in sys.modules',
+        'assert "ortools" not in sys.modules',
+        'from matcher.solvers import FairFlow',
+        'assert "matcher.solvers.fairflow" in sys.modules'
+    ])
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+def test_registry_register_solver(solver_map):
+    '''Solvers can be registered as classes or as paths, which are imported on first use'''
+    registry.register_solver('Custom', 'matcher.solvers.fairflow:FairFlow')
+    assert solver_map['Custom'] == 'matcher.solvers.fairflow:FairFlow'
+    assert 'Custom' in registry.available_solvers()
+    assert registry.get_solver('Custom') is FairFlow
+    assert solver_map['Custom'] is FairFlow
+
+    registry.register_solver('Other', MinMaxSolver)
+    assert registry.get_solver('Other') is MinMaxSolver
+    with pytest.raises(KeyError):
+        registry.get_solver('Unknown')
+
+def test_registry_entry_points(solver_map, monkeypatch):
+    '''Solvers of installed entry points are registered, but don't replace registered names'''
+    entry_points = [
+        importlib.metadata.EntryPoint(
+            name='ThirdParty', value='matcher.solvers.minmax_solver:MinMaxSolver', group=registry.ENTRY_POINT_GROUP),
+        importlib.metadata.EntryPoint(
+            name='FairFlow', value='matcher.solvers.minmax_solver:MinMaxSolver', group=registry.ENTRY_POINT_GROUP)
+    ]
+    monkeypatch.setattr(importlib.metadata, 'entry_points', lambda **kwargs: entry_points)
+
+    assert registry.available_solvers() == ['MinMax', 'FairFlow', 'SparseFairFlow', 'ThirdParty']
+    assert registry.get_solver('ThirdParty') is MinMaxSolver
+    assert registry.get_solver('FairFlow') is FairFlow
@@ -0,0 +1,76 @@
+'''
+Unit test suite for `matcher/solvers/sparse_fairflow.py`
+'''
+from collections import namedtuple
+import pytest
+import numpy as np
+from matcher.solvers import SolverException, FairFlow, SparseFairFlow
+from conftest import assert_arrays
+
+encoder = namedtuple('Encoder', ['aggregate_score_matrix', 'constraint_matrix'])
+
+def _random_instance(num_papers, num_reviewers, seed):
+    rng = np.random.RandomState(seed)
+    aggregate_score_matrix = rng.rand(num_papers, num_reviewers)
+    constraint_matrix = np.where(rng.rand(num_papers, num_reviewers) < 0.1, -1, 0)
+    return aggregate_score_matrix, constraint_matrix
+
+def _check_valid(res, constraint_matrix, demands, minimums, maximums):
+    res = np.asarray(res)
+    assert_arrays(np.sum(res, axis=1), demands)
+    assert np.all(np.sum(res, axis=0) <= maximums)
+    assert np.all(np.sum(res, axis=0) >= minimums)
+    assert not np.any((constraint_matrix != 0) & (res > 0))
+
+def test_sparse_fairflow_matches_dense():
+    '''Without pruning, the sparse variant solves the same problem as FairFlow'''
+    aggregate_score_matrix, constraint_matrix = _random_instance(30, 15, 0)
+    demands = [2] * 30
+    minimums = [1] * 15
+    maximums = [6] * 15
+
+    dense = FairFlow(minimums, maximums, demands, encoder(aggregate_score_matrix, constraint_matrix))
+    res_dense = dense.solve()
+    sparse = SparseFairFlow(minimums, maximums, demands, encoder(aggregate_score_matrix, constraint_matrix))
+    res_sparse = sparse.solve()
+
+    _check_valid(res_sparse, constraint_matrix, demands, minimums, maximums)
+    assert np.size(sparse.pair_papers) == np.sum(constraint_matrix == 0)
+    assert np.isclose(sparse.objective_val(), np.sum(np.asarray(res_sparse) * aggregate_score_matrix))
+    assert np.array_equal(sparse.sol_as_mat(), np.asarray(res_sparse).transpose())
+
+    worst_dense = np.min(np.sum(np.asarray(res_dense) * aggregate_score_matrix, axis=1))
+    worst_sparse = np.min(np.sum(np.asarray(res_sparse) * aggregate_score_matrix, axis=1))
+    assert np.isclose(worst_sparse, worst_dense, atol=0.1)
+
+def test_sparse_fairflow_top_k():
+    '''With top_k, only candidate pairs are stored and assigned'''
+    aggregate_score_matrix, constraint_matrix = _random_instance(40, 20, 1)
+    demands = [3] * 40
+    minimums = [1] * 20
+    maximums = [8] * 20
+
+    solver = SparseFairFlow(
+        minimums, maximums, demands, encoder(aggregate_score_matrix, constraint_matrix), top_k=5)
+    res = solver.solve()
+
+    _check_valid(res, constraint_matrix, demands, minimums, maximums)
+    assert np.size(solver.pair_papers) < np.sum(constraint_matrix == 0)
+    candidates = np.zeros(aggregate_score_matrix.shape, dtype=bool)
+    candidates[solver.pair_papers, solver.pair_reviewers] = True
+    assert np.all(candidates[np.asarray(res) > 0])
+    assert not hasattr(solver, 'affinity_matrix')
+
+def test_sparse_fairflow_non_candidate_pairs():
+    '''Looking up a pair that isn't a candidate raises, even outside of debug mode'''
+    aggregate_score_matrix, _ = _random_instance(4, 3, 3)
+    constraint_matrix = np.zeros(np.shape(aggregate_score_matrix))
+    constraint_matrix[1, 2] = -1
+    solver = SparseFairFlow(
+        [0] * 3, [3] * 3, [1] * 4, encoder(aggregate_score_matrix, constraint_matrix), debug=False)
+
+    with pytest.raises(SolverException):
+        solver._pair_affinities([2], [1])
+    with pytest.raises(SolverException):
+        solver._load_assignment([0, 2], [0, 1])
+    assert not np.any(solver._is_assigned([2, 0], [1, 0]))
@@ -0,0 +1,80 @@
+import itertools
+import numpy as np
+import pytest
+from matcher import Matcher
+from matcher.encoder import Encoder
+from matcher.sweep import sweep, format_table, COLUMNS
+
+reviewers = ['reviewer1', 'reviewer2', 'reviewer3', 'reviewer4']
+papers = ['paper1', 'paper2', 'paper3']
+
+def _scores(seed):
+    rng = np.random.RandomState(seed)
+    return [
+        (paper, reviewer, float(rng.rand())) \
+        for paper, reviewer in itertools.product(papers, reviewers)
+    ]
+
+def _datasource():
+    return {
+        'reviewers': reviewers,
+        'papers': papers,
+        'scores_by_type': {'affinity': {'edges': _scores(0)}, 'bid': {'edges': _scores(1)}},
+        'weight_by_type': {'affinity': 1, 'bid': 1},
+        'minimums': [0, 0, 0, 0],
+        'maximums': [2, 2, 2, 2],
+        'demands': [2, 2, 2],
+        'num_alternates': 1
+    }
+
+def test_encoder_with_weights():
+    '''Reweighting an Encoder shares its score matrices and matches a new encoding'''
+    data = _datasource()
+    encoder = Encoder(
+        reviewers, papers, [], data['scores_by_type'], data['weight_by_type'])
+    reweighted = encoder.with_weights({'affinity': 0.5, 'bid': 2})
+    expected = Encoder(
+        reviewers, papers, [], data['scores_by_type'], {'affinity': 0.5, 'bid': 2})
+
+    assert reweighted.score_matrices is encoder.score_matrices
+    assert np.allclose(reweighted.aggregate_score_matrix, expected.aggregate_score_matrix)
+    assert np.allclose(reweighted.cost_matrix, expected.cost_matrix)
+    assert np.allclose(encoder.aggregate_score_matrix, encoder.score_matrices['affinity'] + encoder.score_matrices['bid'])
+
+@pytest.mark.parametrize('workers', [None, 2])
+def test_matcher_sweep(workers):
+    '''Each variant is solved with the shared encoder and compared in a table'''
+    test_matcher = Matcher(_datasource(), solver_class='MinMax')
+    rows = test_matcher.sweep([
+        {'name': 'base'},
+        {'name': 'affinity only', 'weight_by_type': {'affinity': 1, 'bid': 0}},
+        {'name': 'fairflow', 'solver': 'FairFlow'},
+        {'name': 'one each', 'demands': 1, 'maximums': 1},
+        {'demands': 3, 'maximums': 1}
+    ], workers=workers)
+
+    assert [row['name'] for row in rows] == ['base', 'affinity only', 'fairflow', 'one each', '4']
+    assert [row['status'] for row in rows] == ['Complete'] * 4 + ['No Solution']
+    assert rows[4]['objective'] is None and rows[4]['message']
+    assert rows[3]['max_load'] == 1 and rows[3]['reviewers_used'] == 3
+    assert rows[0]['mean_load'] == 1.5 and rows[0]['max_load'] == 2
+
+    # the aggregate of the second variant only counts affinities.
+    affinities = dict(((paper, reviewer), score) for paper, reviewer, score in _scores(0))
+    assert rows[1]['objective'] <= sum(sorted(affinities.values())[-6:]) + 1e-9
+    assert rows[0]['worst_paper_score'] <= rows[0]['mean_paper_score']
+    assert test_matcher.get_status() == 'Initialized'
+
+    table = format_table(rows).splitlines()
+    assert table[0].split() == COLUMNS
+    assert len(table) == 6
+
+def test_matcher_sweep_unknown_solver(monkeypatch):
+    '''A variant with an unknown solver is reported by name before any variant is solved'''
+    test_matcher = Matcher(_datasource(), solver_class='MinMax')
+    solved = []
+    monkeypatch.setattr('matcher.sweep.solve_variant', lambda *args, **kwargs: solved.append(args))
+
+    with pytest.raises(ValueError, match='"typo".*"FairFlw"'):
+        test_matcher.sweep([{'name': 'base'}, {'name': 'typo', 'solver': 'FairFlw'}])
+    assert solved == []